@@ -7,6 +7,78 @@ class Settings(BaseSettings):
     ollama_model:str
     ncm_csv_path:str
     top_k:int
+    embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2"
+    ncm_index_dir: str = "data/ncm_index"
+    # Pré-filtro hierárquico do NCM (0 = desativado): capítulos / posições mais próximos da consulta
+    ncm_prefilter_chapters: int = 0
+    ncm_prefilter_headings: int = 0
+    # Busca NCM: "dense" (embeddings), "lexical" (BM25) ou "hybrid" (BM25 gera candidatos, embeddings reordenam)
+    ncm_retrieval_mode: str = "dense"
+    ncm_lexical_candidates: int = 200
+    # Armazenamento dos embeddings em memória: "float32", "float16" ou "int8" (escala por linha)
+    ncm_embedding_dtype: str = "float32"
+    # Pula o LLM na escolha do NCM quando o retrieval está confiante (scores de cosseno)
+    ncm_fast_path_enabled: bool = False
+    ncm_fast_path_min_score: float = 0.75
+    ncm_fast_path_margin: float = 0.10
+    # Cache LRU de embeddings e top-k por consulta limpa (0 = desativado)
+    ncm_cache_size: int = 2048
+
+    # Cliente HTTP do Ollama
+    ollama_connect_timeout: float = 5.0
+    ollama_read_timeout: float = 120.0
+    ollama_keep_alive: str = "30m"
+    ollama_max_connections: int = 10
+    # Lê a resposta em streaming e encerra a geração assim que a resposta útil chega
+    ollama_stream: bool = True
+    # Descrições por chamada na normalização em lote (1 = uma chamada por item)
+    ollama_normalize_chunk_size: int = 1
+    # Cache persistente das respostas do LLM (tabela cache_llm)
+    llm_cache_enabled: bool = True
+    llm_cache_max_entries: int = 50000
+
+    # Upload de PDF: limite de tamanho em MB (413 acima dele; 0 = sem limite)
+    max_upload_mb: int = 50
+    # Motor de extração de texto do PDF: pdfplumber ou pdfium (pypdfium2, mais rápido)
+    pdf_extract_engine: str = "pdfplumber"
+    # Layout das linhas de item do pedido (services/layout_service.LAYOUTS); vazio = detecta pela 1ª página
+    pdf_layout: str = ""
+    # Extração de PDF em paralelo (processos) a partir de N páginas; 1 = desativado
+    pdf_extract_workers: int = 1
+    pdf_parallel_min_pages: int = 20
+
+    # Jobs de classificação em segundo plano (tabela jobs como fila)
+    job_workers: int = 1
+    job_poll_seconds: float = 2.0
+    job_stale_seconds: float = 300.0
+    job_max_attempts: int = 3
+
+    # Warm-up no startup (RAG, embeddings e modelo do Ollama)
+    warmup_enabled: bool = True
+    warmup_require_ollama: bool = False
+
+    # Pool de buscas web (DuckDuckGo): taxa, timeout, retentativas e circuit breaker
+    search_rate_per_second: float = 1.0
+    search_burst: int = 3
+    search_timeout_seconds: float = 15.0
+    search_retries: int = 2
+    search_backoff_seconds: float = 1.0
+    search_breaker_threshold: int = 5
+    search_breaker_cooldown_seconds: float = 60.0
+
+    # Cache persistente das buscas web (fabricante / localização)
+    scraper_cache_ttl_hours: int = 720
+    scraper_cache_negative_ttl_hours: int = 24
+
+    # Pipeline de classificação (/process_items)
+    pipeline_concurrent: bool = True
+    # Itens por lote do pipeline (buscas, normalização e RAG em lote; 0 = pedido inteiro)
+    pipeline_batch_size: int = 10
+    # Stream de /process_items: evento 'progress' quando nenhum item sai em N segundos (0 = desativado)
+    stream_keepalive_seconds: float = 15.0
+    scrape_concurrency: int = 4
+    llm_concurrency: int = 2
+    embedding_concurrency: int = 1
 
     secret_key: str  
     algorithm: str = "HS256"
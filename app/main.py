@@ -1,18 +1,35 @@
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routes import pdf_routes, test_routes, user_routes, auth_routes
+from routes import pdf_routes, test_routes, user_routes, auth_routes, health_routes, admin_routes, job_routes
 from contextlib import asynccontextmanager
 from models import models
 from database.database import engine
+from app.core.config import settings
+from services import warmup_service, search_service, ollama_client, job_service, extract_service
+from services.upload_service import UploadLimitMiddleware
+from services.rag_service import get_or_create_rag_for_app
 
 
 @asynccontextmanager
 async def lifespan(app:FastAPI):
     models.Base.metadata.create_all(bind=engine)
+    app.state.warmup = warmup_service.new_warmup_state()
+    if settings.warmup_enabled:
+        # roda em segundo plano: o servidor sobe e o /ready avisa quando terminar
+        app.state.warmup_task = asyncio.create_task(asyncio.to_thread(warmup_service.run_warmup, app))
+    if settings.job_workers > 0:
+        job_service.start_job_workers(lambda: get_or_create_rag_for_app(app, settings.ncm_csv_path))
     yield
+    await job_service.close_job_workers()
+    await search_service.close_search_pool()
+    await ollama_client.close_ollama_client()
+    extract_service.shutdown_extract_pool()
     
 app = FastAPI(lifespan=lifespan)
 
+# adicionado antes do CORS para que o 413 também leve os cabeçalhos de CORS
+app.add_middleware(UploadLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -24,4 +41,7 @@ app.add_middleware(
 app.include_router(user_routes.router, prefix="/api", tags=["Usuários"])
 app.include_router(auth_routes.router, prefix="/api", tags=["Autenticação"])
 app.include_router(pdf_routes.router, prefix="/api")
-app.include_router(test_routes.router, prefix="/api", tags=["TESTE"])
\ No newline at end of file
+app.include_router(job_routes.router, prefix="/api", tags=["Jobs"])
+app.include_router(test_routes.router, prefix="/api", tags=["TESTE"])
+app.include_router(admin_routes.router, prefix="/api", tags=["Administração"])
+app.include_router(health_routes.router, tags=["Saúde"])
\ No newline at end of file
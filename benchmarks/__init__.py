@@ -0,0 +1,9 @@
+import os
+
+# Mesma configuração mínima dos testes, para importar app.core.config sem um .env.
+os.environ.setdefault("DB_URL", "sqlite:///./test.db")
+os.environ.setdefault("OLLAMA_URL", "http://localhost:11434/api/generate")
+os.environ.setdefault("OLLAMA_MODEL", "qwen3:1.7b")
+os.environ.setdefault("NCM_CSV_PATH", "ncm.csv")
+os.environ.setdefault("TOP_K", "5")
+os.environ.setdefault("SECRET_KEY", "test")
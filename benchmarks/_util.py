@@ -0,0 +1,14 @@
+import statistics
+import time
+from typing import Callable
+
+
+def medir(fn: Callable[[], object], repeticoes: int = 5) -> float:
+    """Mediana, em segundos, de `repeticoes` execuções de fn (depois de uma de aquecimento)."""
+    fn()
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        fn()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos)
@@ -0,0 +1,41 @@
+"""
+Contagem de fabricantes em textos de resultado de busca: loop original (um
+re.search por variação de fabricantes.txt) x FabricanteMatcher (Aho-Corasick,
+uma passada pelo texto), com conferência de que as contagens são iguais.
+
+    python -m benchmarks.bench_fabricante_matcher [n_textos]
+"""
+import sys
+import time
+from services.scraper_service import FabricanteMatcher, carregar_fabricantes_com_variacoes, FABRICANTES_TXT_PATH
+from tests.referencias import contar_fabricantes_original
+from tests.test_fabricante_matcher import textos_de_busca
+
+
+def main(n_textos: int):
+    fabricantes = carregar_fabricantes_com_variacoes(FABRICANTES_TXT_PATH)
+    n_variacoes = sum(len(v) for v in fabricantes.values())
+    textos = textos_de_busca(fabricantes, n_textos)
+    tamanho_medio = sum(map(len, textos)) / len(textos)
+    print(f"{len(fabricantes)} fabricantes, {n_variacoes} variações; {n_textos} textos de ~{tamanho_medio:.0f} caracteres")
+
+    inicio = time.perf_counter()
+    matcher = FabricanteMatcher(fabricantes)
+    print(f"construção do matcher: {(time.perf_counter() - inicio) * 1000:.1f} ms (uma vez por processo)")
+
+    inicio = time.perf_counter()
+    originais = [contar_fabricantes_original(t, fabricantes) for t in textos]
+    t_original = (time.perf_counter() - inicio) / n_textos
+
+    inicio = time.perf_counter()
+    atuais = [matcher.contar(t) for t in textos]
+    t_atual = (time.perf_counter() - inicio) / n_textos
+
+    divergentes = sum(1 for a, b in zip(originais, atuais) if a != b or a.most_common(1) != b.most_common(1))
+    print(f"{'loop de regex':<22}{t_original * 1000:>10.3f} ms/texto")
+    print(f"{'FabricanteMatcher':<22}{t_atual * 1000:>10.3f} ms/texto{t_original / t_atual:>10.0f}x")
+    print(f"contagens divergentes: {divergentes}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 300)
@@ -0,0 +1,40 @@
+"""
+Vazão do parse de linhas de item em conjuntos sintéticos de linhas: caminho
+original (regex de item + format_many, padrões em string a cada linha) x
+registro de layouts (uma regex pré-compilada por layout), e custo da detecção
+de layout, que roda uma vez por documento sobre a primeira página.
+
+    python -m benchmarks.bench_layouts [n_linhas]
+"""
+import sys
+from services.layout_service import LAYOUTS, detect_layout
+from tests.referencias import parse_pagina_original
+from tests.sample_pos import linhas_padrao, linhas_pn_primeiro
+from tests.test_layouts import texto_de
+from benchmarks._util import medir
+
+
+def _linha(nome: str, n_linhas: int, tempo: float, base: float = None):
+    ganho = f"{base / tempo:>7.1f}x" if base else ""
+    print(f"{nome:<28}{tempo * 1000:>10.2f}{n_linhas / tempo / 1000:>14.0f}{ganho}")
+
+
+def main(n_linhas: int):
+    padrao = texto_de(linhas_padrao(n_linhas))
+    pn_primeiro = texto_de(linhas_pn_primeiro(n_linhas))
+    assert [{k: it[k] for k in ("partnumber", "descricao_raw")} for it in LAYOUTS["padrao"].parse_page(padrao)] \
+        == parse_pagina_original(padrao), "layout 'padrao' diverge do original"
+
+    print(f"{n_linhas} linhas por conjunto")
+    print(f"{'':<28}{'tempo (ms)':>10}{'mil linhas/s':>14}{'ganho':>8}")
+    base = medir(lambda: parse_pagina_original(padrao))
+    _linha("original (padrao)", n_linhas, base)
+    _linha("LineParser padrao", n_linhas, medir(lambda: LAYOUTS["padrao"].parse_page(padrao)), base)
+    _linha("LineParser pn_primeiro", n_linhas, medir(lambda: LAYOUTS["pn_primeiro"].parse_page(pn_primeiro)))
+
+    primeira_pagina = texto_de(linhas_padrao(50))
+    _linha("detect_layout (1a página)", 50, medir(lambda: detect_layout(primeira_pagina)))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,70 @@
+"""
+limpar_texto original (unidecode + re.sub por chamada) x atual (tabela de
+tradução para ASCII, memoização e limpeza em lote), nas descrições da tabela NCM
+(NCM_CSV_PATH) ou, sem o CSV, em descrições sintéticas do mesmo tamanho.
+
+    python -m benchmarks.bench_limpar_texto
+"""
+import os
+import random
+import pandas as pd
+from app.core.config import settings
+from services.normalize_service import limpar_texto, limpar_textos, _limpar_texto_cached
+from tests.referencias import limpar_texto_original
+from benchmarks._util import medir
+
+_PALAVRAS = (
+    "capacitores elétricos fixos variáveis ajustáveis dielétrico papel plástico resistências reostatos "
+    "potenciômetros circuitos integrados eletrônicos processadores controladores memórias diodos "
+    "transistores semicondutores fios cabos coaxiais condutores isolados tensão frequência potência "
+    "de da do dos das com sem para ou e os as em por outros outras exceto incluídos"
+).split()
+
+
+def _descricoes() -> list:
+    if os.path.exists(settings.ncm_csv_path):
+        df = pd.read_csv(settings.ncm_csv_path, encoding="utf-8")
+        df.columns = [c.lower() for c in df.columns]
+        return df["descricao"].astype(str).tolist()
+    # ~10 mil linhas como a tabela NCM, com as repetições típicas ("-- Outros")
+    rnd = random.Random(0)
+    descricoes = []
+    for _ in range(10_500):
+        if rnd.random() < 0.2:
+            descricoes.append(rnd.choice(["-- Outros", "- Outros", "--- Outras"]))
+        else:
+            texto = " ".join(rnd.choice(_PALAVRAS) for _ in range(rnd.randint(3, 14)))
+            descricoes.append(f"-- {texto.capitalize()}{rnd.choice(['', ';', ',', ' (exceto os da posição 85.41)'])}")
+    return descricoes
+
+
+def main():
+    descricoes = _descricoes()
+    origem = settings.ncm_csv_path if os.path.exists(settings.ncm_csv_path) else "sintéticas"
+    print(f"{len(descricoes)} descrições ({origem}), {len(set(descricoes))} distintas")
+
+    esperado = [limpar_texto_original(d) for d in descricoes]
+    _limpar_texto_cached.cache_clear()
+    assert limpar_textos(descricoes) == esperado, "limpar_textos diverge da implementação original"
+
+    def sem_cache(fn):
+        def rodar():
+            _limpar_texto_cached.cache_clear()
+            fn()
+        return rodar
+
+    casos = [
+        ("original (por texto)", lambda: [limpar_texto_original(d) for d in descricoes]),
+        ("limpar_texto (cache frio)", sem_cache(lambda: [limpar_texto(d) for d in descricoes])),
+        ("limpar_textos (cache frio)", sem_cache(lambda: limpar_textos(descricoes))),
+        ("limpar_textos (cache quente)", lambda: limpar_textos(descricoes)),
+    ]
+    base = None
+    for nome, fn in casos:
+        tempo = medir(fn)
+        base = base or tempo
+        print(f"{nome:<30}{tempo * 1000:>10.1f} ms{base / tempo:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Vazão da normalização de descrições por tamanho de lote
+(OLLAMA_NORMALIZE_CHUNK_SIZE), contra um Ollama falso local com latência de
+LATENCIA_FIXA por chamada mais LATENCIA_POR_LINHA por linha gerada, e o limite
+de chamadas simultâneas do cliente (LLM_CONCURRENCY).
+
+    python -m benchmarks.bench_normalizacao_lote [n_itens]
+"""
+import asyncio
+import sys
+import time
+from app.core.config import settings
+from services import ollama_client
+from services.llm_cache import llm_cache
+from services.normalize_service import normalizar_lote_com_ollama_async
+from tests.stub_ollama import StubOllama
+
+LATENCIA_FIXA = 0.25
+LATENCIA_POR_LINHA = 0.03
+CHUNK_SIZES = (1, 5, 10, 20)
+
+
+async def _rodar(servidor: StubOllama, textos: list, chunk_size: int) -> float:
+    ollama_client._client = ollama_client.OllamaClient(url=servidor.url)
+    try:
+        inicio = time.perf_counter()
+        resultados = await normalizar_lote_com_ollama_async(textos, chunk_size=chunk_size)
+        tempo = time.perf_counter() - inicio
+    finally:
+        await ollama_client.close_ollama_client()
+    erros = sum(1 for r in resultados if isinstance(r, BaseException))
+    assert not erros, f"{erros} itens com erro"
+    return tempo
+
+
+def main(n_itens: int):
+    llm_cache.enabled = False
+    settings.ollama_stream = False
+    textos = [f"CAP CER {n}UF {n % 50}V X5R 0603" for n in range(n_itens)]
+    print(f"{n_itens} itens; Ollama falso: {LATENCIA_FIXA * 1000:.0f} ms/chamada + "
+          f"{LATENCIA_POR_LINHA * 1000:.0f} ms/linha; LLM_CONCURRENCY={settings.llm_concurrency}")
+    print(f"{'chunk':>6}{'chamadas':>10}{'tempo (s)':>11}{'itens/s':>10}{'ganho':>8}")
+    base = None
+    with StubOllama(LATENCIA_FIXA, LATENCIA_POR_LINHA) as servidor:
+        for chunk_size in CHUNK_SIZES:
+            chamadas_antes = servidor.chamadas
+            tempo = asyncio.run(_rodar(servidor, textos, chunk_size))
+            base = base or tempo
+            print(f"{chunk_size:>6}{servidor.chamadas - chamadas_antes:>10}{tempo:>11.2f}{n_itens / tempo:>10.1f}{base / tempo:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,43 @@
+"""
+Tempo de extração por motor (pdfplumber x pdfium) em pedidos sintéticos, com
+conferência de que os dois extraem os mesmos itens.
+
+    python -m benchmarks.bench_pdf_engines [n_paginas]
+"""
+import io
+import sys
+from app.core.config import settings
+from services.extract_service import iter_items
+from services.pdf_engines import ENGINES
+from tests.sample_pos import gerar_pdf, linhas_padrao, linhas_pn_primeiro
+from benchmarks._util import medir
+
+LINHAS_POR_PAGINA = 50
+
+
+def _itens(pdf: bytes, engine: str) -> list:
+    return [item for pagina in iter_items(io.BytesIO(pdf), engine=engine) for item in pagina]
+
+
+def main(n_paginas: int):
+    settings.pdf_extract_workers = 1
+    print(f"{n_paginas} páginas, {LINHAS_POR_PAGINA} linhas por página")
+    print(f"{'layout':<14}{'ordem':<10}{'motor':<12}{'tempo (s)':>10}{'páginas/s':>12}{'itens':>8}")
+    for gerar in (linhas_padrao, linhas_pn_primeiro):
+        for por_coluna in (False, True):
+            pdf = gerar_pdf(gerar(n_paginas * LINHAS_POR_PAGINA), LINHAS_POR_PAGINA, por_coluna=por_coluna)
+            referencia = None
+            for engine in ENGINES:
+                itens = _itens(pdf, engine)
+                if referencia is None:
+                    referencia = itens
+                elif itens != referencia:
+                    print(f"  !! {engine} extraiu itens diferentes do pdfplumber")
+                tempo = medir(lambda: _itens(pdf, engine), repeticoes=3)
+                layout = gerar.__name__.replace("linhas_", "")
+                ordem = "coluna" if por_coluna else "linha"
+                print(f"{layout:<14}{ordem:<10}{engine:<12}{tempo:>10.3f}{n_paginas / tempo:>12.1f}{len(itens):>8}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
@@ -0,0 +1,55 @@
+"""
+Extração sequencial x paralela (PDF_EXTRACT_WORKERS processos) de pedidos
+sintéticos de 1, 20 e 200 páginas, com conferência de que os itens são iguais.
+A partida do pool (spawn) é medida à parte: acontece uma vez por processo da API.
+
+    python -m benchmarks.bench_pdf_extract [motor] [workers]
+"""
+import io
+import os
+import sys
+import time
+from app.core.config import settings
+from services import extract_service
+from services.extract_service import iter_items
+from tests.sample_pos import gerar_pdf, linhas_padrao
+from benchmarks._util import medir
+
+LINHAS_POR_PAGINA = 50
+PAGINAS = (1, 20, 200)
+
+
+def _itens(pdf: bytes, engine: str) -> list:
+    return [item for pagina in iter_items(io.BytesIO(pdf), engine=engine) for item in pagina]
+
+
+def main(engine: str, workers: int):
+    settings.pdf_parallel_min_pages = 2
+    print(f"motor {engine}, {workers} workers, {os.cpu_count()} CPUs, {LINHAS_POR_PAGINA} linhas por página")
+
+    settings.pdf_extract_workers = workers
+    inicio = time.perf_counter()
+    extract_service._get_pool().submit(int).result()
+    print(f"partida do pool: {time.perf_counter() - inicio:.2f} s")
+
+    print(f"{'páginas':>8}{'sequencial (s)':>16}{'paralelo (s)':>14}{'ganho':>8}")
+    try:
+        for n_paginas in PAGINAS:
+            pdf = gerar_pdf(linhas_padrao(n_paginas * LINHAS_POR_PAGINA - 2), LINHAS_POR_PAGINA)
+            repeticoes = 1 if n_paginas >= 200 else 3
+
+            settings.pdf_extract_workers = 1
+            sequencial = _itens(pdf, engine)
+            t_seq = medir(lambda: _itens(pdf, engine), repeticoes)
+
+            settings.pdf_extract_workers = workers
+            assert _itens(pdf, engine) == sequencial, "extração paralela diverge da sequencial"
+            t_par = medir(lambda: _itens(pdf, engine), repeticoes)
+            print(f"{n_paginas:>8}{t_seq:>16.2f}{t_par:>14.2f}{t_seq / t_par:>7.1f}x")
+    finally:
+        extract_service.shutdown_extract_pool()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else "pdfplumber",
+         int(sys.argv[2]) if len(sys.argv) > 2 else max(2, os.cpu_count() or 1))
@@ -0,0 +1,70 @@
+"""
+Memória e recall@k dos embeddings NCM compactos (float16, int8 com escala por
+linha) contra o float32, em uma tabela sintética agrupada como a NCM (capítulo ->
+posição -> item, vizinhos próximos entre si). As consultas não são linhas da
+tabela: itens novos dos mesmos ramos (held-out) e linhas perturbadas com ruído,
+como descrições escritas de outro jeito.
+
+    python -m benchmarks.bench_quantizacao [linhas] [dimensao]
+"""
+import sys
+import numpy as np
+import pandas as pd
+from services.rag_service import RAGService, _l2_normalize, _top_k_indices
+from benchmarks._util import medir
+
+TOP_K = 5
+N_CONSULTAS = 1000
+CAPITULOS = 96
+POSICOES_POR_CAPITULO = 12
+
+
+def _tabela(rng, linhas: int, dimensao: int):
+    """Embeddings agrupados e, para cada linha, a posição (ramo) de onde ela veio."""
+    capitulos = rng.standard_normal((CAPITULOS, dimensao))
+    posicoes = np.repeat(capitulos, POSICOES_POR_CAPITULO, axis=0) + 0.8 * rng.standard_normal((CAPITULOS * POSICOES_POR_CAPITULO, dimensao))
+    posicao_da_linha = rng.integers(0, len(posicoes), linhas)
+    return posicoes, posicao_da_linha, _l2_normalize(posicoes[posicao_da_linha] + 0.9 * rng.standard_normal((linhas, dimensao)))
+
+
+def _recall(exatos: np.ndarray, aproximados: np.ndarray) -> float:
+    return float(np.mean([len(set(e) & set(a)) / len(e) for e, a in zip(exatos, aproximados)]))
+
+
+def main(linhas: int, dimensao: int):
+    rng = np.random.default_rng(0)
+    posicoes, posicao_da_linha, base = _tabela(rng, linhas, dimensao)
+    consultas = {
+        "held-out (itens novos)": _l2_normalize(
+            posicoes[rng.integers(0, len(posicoes), N_CONSULTAS)] + 0.9 * rng.standard_normal((N_CONSULTAS, dimensao))
+        ),
+        "perturbadas (ruído 0.5)": _l2_normalize(
+            base[rng.choice(linhas, N_CONSULTAS, replace=False)] + 0.5 / np.sqrt(dimensao) * rng.standard_normal((N_CONSULTAS, dimensao))
+        ),
+    }
+    exatos = {nome: _top_k_indices(q @ base.T, TOP_K) for nome, q in consultas.items()}
+    similaridade = {nome: float(np.mean(np.sort(q @ base.T, axis=1)[:, -1])) for nome, q in consultas.items()}
+
+    print(f"tabela {linhas} x {dimensao}, {N_CONSULTAS} consultas por conjunto, top_k={TOP_K}")
+    for nome, sim in similaridade.items():
+        print(f"  {nome}: similaridade média do top-1 = {sim:.2f}")
+    print(f"{'dtype':<9}{'embeddings (MB)':>16}{'ms/consulta':>13}" + "".join(f"{f'recall@{TOP_K} ' + nome.split()[0]:>22}" for nome in consultas))
+
+    for dtype in ("float32", "float16", "int8"):
+        rag = RAGService.__new__(RAGService)
+        rag.embedding_dtype = dtype
+        rag.embeddings = base.copy()
+        rag.embedding_scales = None
+        rag.df_ncm = pd.DataFrame({"ncm": np.arange(linhas).astype(str), "descricao_clean": ""})
+        if dtype != "float32":
+            rag._quantize()
+        mb = (rag.embeddings.nbytes + (rag.embedding_scales.nbytes if rag.embedding_scales is not None else 0)) / 2**20
+
+        q = consultas["held-out (itens novos)"][:32]
+        tempo = medir(lambda: _top_k_indices(rag._scores(q), TOP_K), repeticoes=5) / len(q)
+        recalls = [_recall(exatos[nome], _top_k_indices(rag._scores(qs), TOP_K)) for nome, qs in consultas.items()]
+        print(f"{dtype:<9}{mb:>16.1f}{tempo * 1000:>13.3f}" + "".join(f"{r:>22.4f}" for r in recalls))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_500, int(sys.argv[2]) if len(sys.argv) > 2 else 384)
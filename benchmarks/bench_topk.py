@@ -0,0 +1,50 @@
+"""
+Latência por consulta da busca dos top_k NCM no tamanho da tabela NCM:
+antes (cosine_similarity do sklearn + argsort completo) x depois (embeddings
+pré-normalizados, produto escalar + argpartition).
+
+    python -m benchmarks.bench_topk [linhas] [dimensao]
+"""
+import sys
+import numpy as np
+from services.rag_service import _l2_normalize, _top_k_indices
+from tests.referencias import top_k_original
+from benchmarks._util import medir
+
+TOP_K = 5
+
+
+def main(linhas: int, dimensao: int):
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((linhas, dimensao)).astype(np.float32)
+    normalizados = _l2_normalize(embeddings)
+    print(f"tabela {linhas} x {dimensao} (float32), top_k={TOP_K}")
+    print(f"{'consultas':>10}{'variante':>32}{'ms/consulta':>14}{'ganho':>8}")
+
+    for n_consultas in (1, 8, 32):
+        q_vecs = rng.standard_normal((n_consultas, dimensao)).astype(np.float32)
+        q_norm = _l2_normalize(q_vecs)
+        assert np.array_equal(top_k_original(q_vecs, embeddings, TOP_K), _top_k_indices(q_norm @ normalizados.T, TOP_K))
+
+        # busca completa e, sobre as similaridades já calculadas, só a seleção dos top_k
+        sims = q_norm @ normalizados.T
+        grupos = [
+            [
+                ("cosine_similarity + argsort", lambda: top_k_original(q_vecs, embeddings, TOP_K)),
+                ("produto escalar + argsort", lambda: np.argsort(q_norm @ normalizados.T, axis=1)[:, -TOP_K:][:, ::-1]),
+                ("produto escalar + argpartition", lambda: _top_k_indices(q_norm @ normalizados.T, TOP_K)),
+            ],
+            [
+                ("só seleção: argsort", lambda: np.argsort(sims, axis=1)[:, -TOP_K:][:, ::-1]),
+                ("só seleção: argpartition", lambda: _top_k_indices(sims, TOP_K)),
+            ],
+        ]
+        for variantes in grupos:
+            base = None
+            for nome, fn in variantes:
+                tempo = medir(fn, repeticoes=20) / n_consultas
+                base = base or tempo
+                print(f"{n_consultas:>10}{nome:>32}{tempo * 1000:>14.3f}{base / tempo:>8.1f}x")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_500, int(sys.argv[2]) if len(sys.argv) > 2 else 384)
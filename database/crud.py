@@ -1,3 +1,5 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import and_, or_, func
 from sqlalchemy.orm import Session, joinedload
 from models import models
 from services.password_utils import get_password_hash
@@ -117,4 +119,170 @@ def link_item_to_transacao(db: Session, transacao_id: int, item_partnumber: str,
         db.rollback()
         print(f"Erro ao linkar item {item_partnumber} à transação {transacao_id}: {e}")
         raise
-    return db_link
\ No newline at end of file
+    return db_link
+
+
+# --- Funções de Cache de Buscas ---
+
+def get_cache_busca(db: Session, tipo: str, chave: str) -> models.CacheBusca | None:
+    return db.query(models.CacheBusca).filter(
+        models.CacheBusca.tipo == tipo,
+        models.CacheBusca.chave == chave,
+        models.CacheBusca.expira_em > datetime.now(timezone.utc)
+    ).first()
+
+def set_cache_busca(db: Session, tipo: str, chave: str, valor: str | None, ttl: timedelta) -> models.CacheBusca:
+    db_cache = db.query(models.CacheBusca).filter(
+        models.CacheBusca.tipo == tipo,
+        models.CacheBusca.chave == chave
+    ).first()
+    expira_em = datetime.now(timezone.utc) + ttl
+    if db_cache:
+        db_cache.valor = valor
+        db_cache.expira_em = expira_em
+    else:
+        db_cache = models.CacheBusca(tipo=tipo, chave=chave, valor=valor, expira_em=expira_em)
+        db.add(db_cache)
+    try:
+        db.commit()
+        db.refresh(db_cache)
+    except Exception:
+        db.rollback()
+        raise
+    return db_cache
+
+def delete_cache_buscas(db: Session, tipo: str | None = None, chave: str | None = None) -> int:
+    query = db.query(models.CacheBusca)
+    if tipo:
+        query = query.filter(models.CacheBusca.tipo == tipo)
+    if chave:
+        query = query.filter(models.CacheBusca.chave == chave)
+    removidos = query.delete(synchronize_session=False)
+    db.commit()
+    return removidos
+
+
+# --- Funções de Cache do LLM ---
+
+def get_cache_llm(db: Session, chaves: list[str]) -> list[models.CacheLLM]:
+    if not chaves:
+        return []
+    entradas = db.query(models.CacheLLM).filter(models.CacheLLM.chave.in_(chaves)).all()
+    if entradas:
+        agora = datetime.now(timezone.utc)
+        for entrada in entradas:
+            entrada.hits = (entrada.hits or 0) + 1
+            entrada.last_used_at = agora
+        db.commit()
+    return entradas
+
+def set_cache_llm(db: Session, registros: list[dict], max_entries: int) -> None:
+    """
+    Grava (ou atualiza) respostas do LLM e remove as menos usadas recentemente
+    quando a tabela passa de max_entries.
+    """
+    if not registros:
+        return
+    agora = datetime.now(timezone.utc)
+    try:
+        for registro in registros:
+            db.merge(models.CacheLLM(**registro, hits=0, last_used_at=agora))
+        db.commit()
+
+        excesso = db.query(models.CacheLLM).count() - max_entries
+        if max_entries > 0 and excesso > 0:
+            antigas = db.query(models.CacheLLM.chave)\
+                .order_by(models.CacheLLM.last_used_at.asc())\
+                .limit(excesso)\
+                .subquery()
+            db.query(models.CacheLLM).filter(models.CacheLLM.chave.in_(antigas.select()))\
+                .delete(synchronize_session=False)
+            db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+def delete_cache_llm(db: Session, tipo: str | None = None) -> int:
+    query = db.query(models.CacheLLM)
+    if tipo:
+        query = query.filter(models.CacheLLM.tipo == tipo)
+    removidos = query.delete(synchronize_session=False)
+    db.commit()
+    return removidos
+
+
+# --- Funções de Jobs ---
+
+def create_job(db: Session, transacao_id: int, usuario_id: int, itens_json: str, total: int) -> models.Job:
+    db_job = models.Job(transacao_id=transacao_id, usuario_id=usuario_id, itens=itens_json, total=total, status="queued")
+    db.add(db_job)
+    db.commit()
+    db.refresh(db_job)
+    return db_job
+
+def get_job(db: Session, job_id: int, usuario_id: int | None = None) -> models.Job | None:
+    query = db.query(models.Job).filter(models.Job.id == job_id)
+    if usuario_id is not None:
+        query = query.filter(models.Job.usuario_id == usuario_id)
+    return query.first()
+
+def claim_next_job(db: Session, worker_id: str, stale_before: datetime, max_attempts: int) -> models.Job | None:
+    """
+    Reserva o próximo job da fila para worker_id: um 'queued' ou um 'running' cujo
+    heartbeat parou antes de stale_before (worker caiu). O UPDATE condicional garante
+    que só um worker, mesmo em outro processo, fique com o job.
+    """
+    candidatos = db.query(models.Job.id, models.Job.status, models.Job.heartbeat_at).filter(
+        or_(
+            models.Job.status == "queued",
+            and_(models.Job.status == "running", models.Job.heartbeat_at < stale_before)
+        ),
+        models.Job.tentativas < max_attempts
+    ).order_by(models.Job.id.asc()).limit(10).all()
+
+    agora = datetime.now(timezone.utc)
+    for job_id, job_status, heartbeat_at in candidatos:
+        reservados = db.query(models.Job).filter(
+            models.Job.id == job_id,
+            models.Job.status == job_status,
+            models.Job.heartbeat_at.is_(None) if heartbeat_at is None else models.Job.heartbeat_at == heartbeat_at
+        ).update({
+            models.Job.status: "running",
+            models.Job.worker_id: worker_id,
+            models.Job.heartbeat_at: agora,
+            models.Job.started_at: func.coalesce(models.Job.started_at, agora),
+            models.Job.tentativas: models.Job.tentativas + 1,
+        }, synchronize_session=False)
+        db.commit()
+        if reservados == 1:
+            return get_job(db, job_id)
+    return None
+
+def fail_exhausted_jobs(db: Session, stale_before: datetime, max_attempts: int) -> int:
+    """
+    Marca como 'failed' os jobs parados que já esgotaram as tentativas.
+    """
+    falhos = db.query(models.Job).filter(
+        models.Job.status.in_(("queued", "running")),
+        or_(models.Job.heartbeat_at.is_(None), models.Job.heartbeat_at < stale_before),
+        models.Job.tentativas >= max_attempts
+    ).update({
+        models.Job.status: "failed",
+        models.Job.erro: "Número máximo de tentativas atingido.",
+        models.Job.finished_at: datetime.now(timezone.utc),
+    }, synchronize_session=False)
+    db.commit()
+    return falhos
+
+def update_job(db: Session, job_id: int, worker_id: str, **campos) -> bool:
+    """
+    Atualiza o job (progresso, heartbeat, conclusão) só se ele ainda pertence a
+    worker_id. False indica que o job foi retomado por outro worker.
+    """
+    atualizados = db.query(models.Job).filter(
+        models.Job.id == job_id,
+        models.Job.worker_id == worker_id
+    ).update({getattr(models.Job, k): v for k, v in campos.items()}, synchronize_session=False)
+    db.commit()
+    return atualizados == 1
+
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, LargeBinary, func, Float
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, LargeBinary, func, Float, UniqueConstraint
 from sqlalchemy.orm import relationship
 from database.database import Base
 
@@ -101,4 +101,75 @@ class TransacaoItem(Base):
     data_extracao = Column(DateTime(timezone=True), server_default=func.now())
 
     transacao = relationship("Transacao", back_populates="itens", lazy="selectin")
-    item = relationship("Item", back_populates="transacoes", lazy="selectin")
\ No newline at end of file
+    item = relationship("Item", back_populates="transacoes", lazy="selectin")
+
+
+# -----------------------------
+# Estatísticas do pipeline por transação (tabela própria: o create_all a cria em
+# bancos existentes, o que não acontece com colunas novas em 'transacoes')
+# -----------------------------
+class TransacaoEstatistica(Base):
+    __tablename__ = "transacao_estatisticas"
+
+    transacao_id = Column(Integer, ForeignKey("transacoes.id", ondelete="CASCADE"), primary_key=True)
+    # Itens classificados direto pelo retrieval (sem LLM) e pelo LLM, para calibrar o limiar
+    itens_fast_path = Column(Integer, default=0, nullable=False)
+    itens_llm = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+# -----------------------------
+# Cache das buscas web (fabricante por PN, localização por fabricante)
+# -----------------------------
+class CacheBusca(Base):
+    __tablename__ = "cache_buscas"
+    __table_args__ = (UniqueConstraint("tipo", "chave", name="uq_cache_buscas_tipo_chave"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    tipo = Column(String(20), nullable=False, index=True)
+    chave = Column(String(200), nullable=False)
+    valor = Column(Text, nullable=True)  # None = busca sem resultado (cache negativo)
+    expira_em = Column(DateTime(timezone=True), nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+
+
+# -----------------------------
+# Cache persistente das respostas do LLM (endereçado por conteúdo)
+# -----------------------------
+class CacheLLM(Base):
+    __tablename__ = "cache_llm"
+
+    chave = Column(String(64), primary_key=True)  # sha256(modelo, versão do prompt, entrada)
+    tipo = Column(String(30), nullable=False, index=True)
+    modelo = Column(String(100), nullable=False)
+    valor = Column(Text, nullable=False)
+    hits = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    last_used_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+
+
+
+# -----------------------------
+# Jobs de classificação em segundo plano (a própria tabela é a fila)
+# -----------------------------
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    transacao_id = Column(Integer, ForeignKey("transacoes.id", ondelete="CASCADE"), nullable=False, index=True)
+    usuario_id = Column(Integer, ForeignKey("usuarios.id", ondelete="CASCADE"), nullable=False, index=True)
+    status = Column(String(20), nullable=False, default="queued", index=True)  # queued, running, done, failed
+    itens = Column(Text, nullable=False)  # JSON: [{"partnumber", "descricao_raw"}, ...]
+    total = Column(Integer, nullable=False, default=0)
+    processados = Column(Integer, nullable=False, default=0)
+    erros = Column(Integer, nullable=False, default=0)
+    tentativas = Column(Integer, nullable=False, default=0)
+    resultado = Column(Text, nullable=True)  # JSON: lista de FinalItem, na ordem de 'itens'
+    erro = Column(Text, nullable=True)
+    worker_id = Column(String(100), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
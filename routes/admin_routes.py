@@ -0,0 +1,60 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.orm import Session
+from database import crud, database
+from models import models
+from services.auth_service import get_current_user
+from services.scraper_service import CACHE_FABRICANTE, CACHE_LOCALIZACAO
+from services import singleflight, search_service
+from services.ollama_client import get_ollama_client
+from services.llm_cache import llm_cache, CACHE_NORMALIZACAO, CACHE_ESCOLHA_NCM
+
+router = APIRouter()
+
+
+@router.delete("/admin/cache/buscas", status_code=status.HTTP_200_OK)
+async def invalidate_search_cache(
+    tipo: Optional[str] = None,
+    chave: Optional[str] = None,
+    db: Session = Depends(database.get_db),
+    current_user: models.Usuario = Depends(get_current_user)
+):
+    """
+    Remove entradas do cache de buscas. Sem filtros, limpa tudo.
+    tipo: 'fabricante' (chave = partnumber) ou 'localizacao' (chave = nome do fabricante).
+    """
+    if tipo and tipo not in (CACHE_FABRICANTE, CACHE_LOCALIZACAO):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Tipo de cache inválido: {tipo}")
+    removidos = crud.delete_cache_buscas(db, tipo=tipo, chave=chave)
+    return {"removidos": removidos}
+
+
+
+@router.delete("/admin/cache/llm", status_code=status.HTTP_200_OK)
+async def invalidate_llm_cache(
+    tipo: Optional[str] = None,
+    db: Session = Depends(database.get_db),
+    current_user: models.Usuario = Depends(get_current_user)
+):
+    """
+    Remove respostas do LLM em cache. tipo: 'normalizacao' ou 'escolha_ncm'; sem filtro, limpa tudo.
+    """
+    if tipo and tipo not in (CACHE_NORMALIZACAO, CACHE_ESCOLHA_NCM):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Tipo de cache inválido: {tipo}")
+    removidos = crud.delete_cache_llm(db, tipo=tipo)
+    return {"removidos": removidos}
+
+
+@router.get("/admin/stats", status_code=status.HTTP_200_OK)
+async def get_stats(request: Request, current_user: models.Usuario = Depends(get_current_user)):
+    """
+    Contadores de deduplicação (single-flight) e dos caches em memória.
+    """
+    rag = getattr(request.app.state, "rag_service", None)
+    return {
+        "singleflight": singleflight.all_stats(),
+        "rag_cache": rag.cache_stats() if rag else None,
+        "search_pool": search_service.get_search_pool().stats(),
+        "llm_cache": llm_cache.stats(),
+        "ollama": get_ollama_client().stats(),
+    }
@@ -0,0 +1,15 @@
+from fastapi import APIRouter, Request, status
+from fastapi.responses import JSONResponse
+from services.warmup_service import is_ready
+
+router = APIRouter()
+
+
+@router.get("/ready")
+async def ready(request: Request):
+    """
+    Readiness para o load balancer: 200 quando o warm-up terminou, 503 enquanto carrega.
+    """
+    state = request.app.state.warmup
+    code = status.HTTP_200_OK if is_ready(state) else status.HTTP_503_SERVICE_UNAVAILABLE
+    return JSONResponse(status_code=code, content={"ready": code == status.HTTP_200_OK, **state})
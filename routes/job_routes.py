@@ -0,0 +1,103 @@
+import json
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+from database import crud, database
+from models import models
+from routes.pdf_routes import ProcessRequest, FinalItem
+from services.auth_service import get_current_user
+from services import job_service
+
+router = APIRouter()
+
+
+class JobResponse(BaseModel):
+    job_id: int
+    transacao_id: int
+    status: str
+    total: int
+    processados: int
+    erros: int
+    progresso: float
+    tentativas: int
+    erro: Optional[str] = None
+    created_at: Optional[str] = None
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+
+
+class JobResultResponse(BaseModel):
+    job_id: int
+    transacao_id: int
+    items: List[FinalItem]
+
+
+def _get_job_do_usuario(db: Session, job_id: int, usuario_id: int) -> models.Job:
+    db_job = crud.get_job(db, job_id, usuario_id=usuario_id)
+    if not db_job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job não encontrado ou não pertence ao usuário.")
+    return db_job
+
+
+@router.post("/transacao/{transacao_id}/jobs", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def submit_job(
+    transacao_id: int,
+    data: Optional[ProcessRequest] = None,
+    db: Session = Depends(database.get_db),
+    current_user: models.Usuario = Depends(get_current_user)
+):
+    """
+    Enfileira a classificação da transação e retorna o job na hora. Sem corpo,
+    usa os itens pendentes da transação (salvos pelo /extract_from_pdf).
+    """
+    db_transacao = db.query(models.Transacao).filter(
+        models.Transacao.id == transacao_id,
+        models.Transacao.usuario_id == current_user.id
+    ).first()
+    if not db_transacao:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Transação não encontrada ou não pertence ao usuário.")
+
+    if data and data.items:
+        itens = [item.model_dump() for item in data.items]
+    else:
+        itens = job_service.pending_items(db_transacao)
+    if not itens:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Nenhum item pendente para processar.")
+
+    db_job = job_service.submit_job(db, transacao_id=transacao_id, usuario_id=current_user.id, itens=itens)
+    return job_service.job_status(db_job)
+
+
+@router.get("/jobs/{job_id}", response_model=JobResponse, status_code=status.HTTP_200_OK)
+async def get_job_status(
+    job_id: int,
+    db: Session = Depends(database.get_db),
+    current_user: models.Usuario = Depends(get_current_user)
+):
+    """
+    Status e progresso (itens processados / total) do job.
+    """
+    return job_service.job_status(_get_job_do_usuario(db, job_id, current_user.id))
+
+
+@router.get("/jobs/{job_id}/result", response_model=JobResultResponse, status_code=status.HTTP_200_OK)
+async def get_job_result(
+    job_id: int,
+    db: Session = Depends(database.get_db),
+    current_user: models.Usuario = Depends(get_current_user)
+):
+    """
+    Itens classificados, na ordem enviada. 409 enquanto o job não terminou.
+    """
+    db_job = _get_job_do_usuario(db, job_id, current_user.id)
+    if db_job.status == "failed":
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"O job falhou: {db_job.erro}")
+    if db_job.status != "done":
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"O job ainda não terminou (status: {db_job.status}).")
+    # linhas antigas do cache podem ter sido gravadas sem endereço/descrição
+    items = [
+        {**row, "localizacao": row.get("localizacao") or "Não encontrada", "descricao": row.get("descricao") or ""}
+        for row in json.loads(db_job.resultado or "[]")
+    ]
+    return JobResultResponse(job_id=db_job.id, transacao_id=db_job.transacao_id, items=items)
@@ -1,4 +1,6 @@
 import io
+import json
+import asyncio
 import logging
 from typing import List, Optional
 from datetime import datetime 
@@ -8,11 +10,13 @@ import pandas as pd
 from pydantic import BaseModel
 from sqlalchemy.orm import Session, joinedload 
 from app.core.config import settings
-from services.extract_service import extract_lines_from_pdf_bytes
-from services.format_service import format_many
-from services.normalize_service import normalizar_com_ollama, choose_best_ncm
-from services.rag_service import RAGService, _get_or_create_rag 
-from services.scraper_service import find_manufacturer_and_location
+from services.extract_service import iter_items
+from services.pdf_engines import ENGINES
+from services.layout_service import LAYOUTS
+from services.upload_service import open_upload, UploadTooLargeError
+from services.pipeline_service import iter_classified_items
+from services.rag_service import _get_or_create_rag 
+from services.persistence_service import cached_row, persist_result, record_fast_path_counts, is_error_row
 from services.auth_service import get_current_user 
 from services import auth_service
 from database import crud, database
@@ -25,6 +29,8 @@ logger = logging.getLogger(__name__)
 class ExtractedItem(BaseModel):
     partnumber: str
     descricao_raw: str
+    quantidade: Optional[float] = None
+    preco: Optional[float] = None
 
 class ExtractionResponse(BaseModel):
     transacao_id: int
@@ -60,60 +66,95 @@ class TransacaoDetailResponse(BaseModel):
     pending_items: List[ExtractedItem]
 
 
+def _save_extracted_items(db: Session, transacao_id: int, itens_formatados: List[dict]):
+    """
+    Grava os itens extraídos (ainda sem NCM) e os vincula à transação.
+    """
+    try:
+        for item in itens_formatados:
+            item_data = {
+                "partnumber": item["partnumber"],
+                "descricao_raw": item["descricao_raw"]
+            }
+            saved_item = crud.upsert_item(db, item_data=item_data, fabricante_id=None)
+            if saved_item:
+                crud.link_item_to_transacao(
+                    db=db, 
+                    transacao_id=transacao_id, 
+                    item_partnumber=saved_item.partnumber,
+                    quantidade=1.0 if item.get("quantidade") is None else item["quantidade"],
+                    preco=item.get("preco")
+                )
+    except Exception as e:
+        logger.error(f"Erro ao salvar itens parciais: {e}")
+
+
 @router.post("/extract_from_pdf", response_model=ExtractionResponse, status_code=status.HTTP_200_OK)
 async def extract_from_pdf(
     file: UploadFile = File(...), 
+    engine: Optional[str] = None,
+    layout: Optional[str] = None,
     current_user: models.Usuario = Depends(get_current_user),
     db: Session = Depends(database.get_db)
 ):
     if not file.filename or not file.filename.lower().endswith(".pdf"):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Envie um arquivo PDF válido com nome.")
-
-    file_bytes = await file.read()
-    if not file_bytes:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Arquivo vazio.")
+    if engine and engine not in ENGINES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Motor de extração inválido. Opções: {', '.join(ENGINES)}")
+    if layout and layout not in LAYOUTS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Layout inválido. Opções: {', '.join(LAYOUTS)}")
 
     try:
-        db_transacao = crud.create_transacao(db=db, usuario_id=current_user.id)
-        db_transacao.nome = file.filename
-        db.commit()
-        db.refresh(db_transacao)
-    except Exception as e:
-        db.rollback()
-        logger.exception("Erro ao criar transação no banco")
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Erro ao iniciar transação: {e}")
+        pdf_file = open_upload(file)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
     try:
-        itens_raw: List[str] = extract_lines_from_pdf_bytes(file_bytes)
-    except Exception as e:
-        logger.exception("Erro extraindo PDF")
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Erro durante a extração do PDF: {e}")
+        try:
+            db_transacao = crud.create_transacao(db=db, usuario_id=current_user.id)
+            db_transacao.nome = file.filename
+            db.commit()
+            db.refresh(db_transacao)
+        except Exception as e:
+            db.rollback()
+            logger.exception("Erro ao criar transação no banco")
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Erro ao iniciar transação: {e}")
 
-    if not itens_raw:
+        # grava página a página, enquanto as páginas seguintes são extraídas
+        itens_formatados = []
+        paginas = iter_items(pdf_file, engine=engine, layout=layout)
+        try:
+            while (itens_pagina := await asyncio.to_thread(next, paginas, None)) is not None:
+                if not itens_pagina:
+                    continue
+                _save_extracted_items(db, db_transacao.id, itens_pagina)
+                itens_formatados.extend(itens_pagina)
+        except Exception as e:
+            logger.exception("Erro extraindo PDF")
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Erro durante a extração do PDF: {e}")
+        finally:
+            await asyncio.to_thread(paginas.close)
+    finally:
+        pdf_file.close()
+
+    if not itens_formatados:
         logger.info(f"Nenhum item extraído do PDF: {file.filename}")
-        return ExtractionResponse(transacao_id=db_transacao.id, items=[])
 
-    itens_formatados = format_many(itens_raw)
-    
-    try:
-        for item in itens_formatados:
-            item_data = {
-                "partnumber": item["partnumber"],
-                "descricao_raw": item["descricao_raw"]
-            }
-            saved_item = crud.upsert_item(db, item_data=item_data, fabricante_id=None)
-            if saved_item:
-                crud.link_item_to_transacao(
-                    db=db, 
-                    transacao_id=db_transacao.id, 
-                    item_partnumber=saved_item.partnumber
-                )
-    except Exception as e:
-        logger.error(f"Erro ao salvar itens parciais: {e}")
-    
     return ExtractionResponse(transacao_id=db_transacao.id, items=itens_formatados)
 
 
+def _get_transacao_do_usuario(db: Session, transacao_id: int, usuario_id: int) -> models.Transacao:
+    db_transacao = db.query(models.Transacao).filter(
+        models.Transacao.id == transacao_id, 
+        models.Transacao.usuario_id == usuario_id
+    ).first()
+    if not db_transacao:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Transação não encontrada ou não pertence ao usuário.")
+    return db_transacao
+
+
 @router.post("/process_items/{transacao_id}", response_model=List[FinalItem], status_code=status.HTTP_200_OK)
 async def process_items(
     transacao_id: int, 
@@ -126,116 +167,152 @@ async def process_items(
     if not itens_validados:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Lista de itens para processar está vazia.")
     
-    db_transacao = db.query(models.Transacao).filter(
-        models.Transacao.id == transacao_id, 
-        models.Transacao.usuario_id == current_user.id
-    ).first()
-    if not db_transacao:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Transação não encontrada ou não pertence ao usuário.")
+    _get_transacao_do_usuario(db, transacao_id, current_user.id)
 
     rag_service = _get_or_create_rag(request, settings.ncm_csv_path)
-    known_manufacturers = {"texas instruments", "samsung electro-mechanics", "intel"}
 
-    processed_rows = []
-    for item in itens_validados:
-        pn = item.partnumber
-        desc_raw = item.descricao_raw
-        db_item = crud.get_item_by_partnumber(db, pn)
-        
-        if db_item and db_item.ncm and db_item.fabricante: 
-            logger.info(f"Cache HIT para PN {pn}. Usando dados do DB.")
-            processed_rows.append({
-                "partnumber": db_item.partnumber,
-                "fabricante": db_item.fabricante.razao_soc,
-                "localizacao": db_item.fabricante.endereco,
-                "ncm": db_item.ncm,
-                "descricao": db_item.descricao,
-                "is_new_manufacturer": False 
-            })
-            existing_link = db.query(models.TransacaoItem).filter(
-                models.TransacaoItem.transacao_id == transacao_id,
-                models.TransacaoItem.item_partnumber == db_item.partnumber
-            ).first()
-            if not existing_link:
-                crud.link_item_to_transacao(db=db, transacao_id=transacao_id, item_partnumber=db_item.partnumber)
-            continue 
-        
-        logger.info(f"Cache MISS para PN {pn}. Processando...")
-        try:
-            scraper_info = find_manufacturer_and_location(pn)
-            fabricante = scraper_info.get("fabricante", "Não identificado")
-            localizacao = scraper_info.get("localizacao", "Não encontrada")
-            is_new = fabricante != "Não identificado" and fabricante.lower() not in known_manufacturers
+    processed_rows: List[Optional[dict]] = [None] * len(itens_validados)
+    pendentes = []
+    for idx, item in enumerate(itens_validados):
+        processed_rows[idx] = cached_row(db, transacao_id, item.partnumber)
+        if processed_rows[idx] is None:
+            pendentes.append(idx)
+
+    # persiste cada item assim que termina: uma queda no meio do pedido não perde
+    # o que já foi classificado, e a nova tentativa o reaproveita do banco
+    fast_path_count = llm_count = 0
+    resultados = iter_classified_items(
+        [(itens_validados[idx].partnumber, itens_validados[idx].descricao_raw) for idx in pendentes],
+        rag_service
+    )
+    async for pos, item_dict in resultados:
+        if item_dict["fast_path"] is True:
+            fast_path_count += 1
+        elif item_dict["fast_path"] is False:
+            llm_count += 1
+        processed_rows[pendentes[pos]] = persist_result(db, transacao_id, item_dict)
 
-            try:
-                desc_norm = normalizar_com_ollama(desc_raw)
-            except Exception as e:
-                logger.warning(f"Fallback na normalização para PN {pn}: {e}")
-                desc_norm = desc_raw
+    record_fast_path_counts(db, transacao_id, fast_path_count, llm_count)
+
+    return JSONResponse(content=processed_rows)
+
+
+def _stream_event(evento: str, dados: dict, formato: str) -> str:
+    if formato == "sse":
+        return f"event: {evento}\ndata: {json.dumps(dados, ensure_ascii=False)}\n\n"
+    return json.dumps({"event": evento, **dados}, ensure_ascii=False) + "\n"
 
+
+async def _com_keepalive(eventos, intervalo: float):
+    """
+    Repassa os valores de um iterador assíncrono, gerando None sempre que nenhum
+    chega em `intervalo` segundos (sem cancelar a espera pelo próximo).
+    """
+    if intervalo <= 0:
+        async for valor in eventos:
+            yield valor
+        return
+    proximo = None
+    try:
+        while True:
+            if proximo is None:
+                proximo = asyncio.ensure_future(eventos.__anext__())
+            prontos, _ = await asyncio.wait({proximo}, timeout=intervalo)
+            if not prontos:
+                yield None
+                continue
             try:
-                top_candidates = rag_service.find_top_ncm(desc_norm, top_k=settings.top_k)
-                if not top_candidates:
-                    raise ValueError("Nenhum candidato NCM encontrado pelo RAG.")
-            except Exception as e:
-                logger.warning(f"Erro RAG para PN {pn} ({desc_norm}): {e}")
-                processed_rows.append({
-                    "partnumber": pn, "fabricante": fabricante, "localizacao": localizacao,
-                    "ncm": "Erro RAG", "descricao": desc_raw, "is_new_manufacturer": is_new
-                })
+                valor = proximo.result()
+            except StopAsyncIteration:
+                return
+            proximo = None
+            yield valor
+    finally:
+        if proximo is not None:
+            proximo.cancel()
+            await asyncio.wait({proximo})
+        await eventos.aclose()
+
+
+async def _process_items_events(transacao_id: int, usuario_id: int, itens: List[ExtractedItem], rag_service, formato: str):
+    """
+    Gera os eventos do stream: um 'item' por FinalItem (na ordem em que ficam prontos,
+    com o índice original) e um 'summary' no final. Cada item é persistido antes de
+    ser enviado, então uma conexão derrubada não perde o que já terminou. Enquanto
+    nenhum item sai (buscas do primeiro lote), envia 'progress' a cada
+    STREAM_KEEPALIVE_SECONDS para o proxy e o cliente não derrubarem a conexão.
+    """
+    # Sessão própria: o stream continua depois que o endpoint retorna.
+    db = database.SessionLocal()
+    try:
+        _get_transacao_do_usuario(db, transacao_id, usuario_id)
+        resumo = {"total": len(itens), "cache": 0, "processados": 0, "erros": 0, "fast_path": 0, "llm": 0}
+
+        pendentes = []
+        for idx, item in enumerate(itens):
+            row = cached_row(db, transacao_id, item.partnumber)
+            if row is None:
+                pendentes.append(idx)
                 continue
+            resumo["cache"] += 1
+            yield _stream_event("item", {"index": idx, "item": row}, formato)
 
-            try:
-                ncm_final = choose_best_ncm(desc_norm, top_candidates)
-            except Exception as e:
-                logger.warning(f"Erro escolha LLM para PN {pn}, usando top candidate: {e}")
-                ncm_final = top_candidates[0]["ncm"]
-
-            descricao_final = next(
-                (c.get("descricao_longa") or c.get("descricao", "")
-                for c in top_candidates if c.get("ncm") == ncm_final),
-                desc_norm
-            )
-            
-            item_dict = {
-                "partnumber": pn, 
-                "fabricante": fabricante, 
-                "localizacao": localizacao,
-                "ncm": ncm_final, 
-                "descricao": descricao_final, 
-                "descricao_raw": desc_raw, 
-                "is_new_manufacturer": is_new
-            }
+        resultados = iter_classified_items(
+            [(itens[idx].partnumber, itens[idx].descricao_raw) for idx in pendentes], rag_service
+        )
+        async for resultado in _com_keepalive(resultados, settings.stream_keepalive_seconds):
+            if resultado is None:
+                yield _stream_event("progress", {k: resumo[k] for k in ("total", "cache", "processados")}, formato)
+                continue
+            pos, item_dict = resultado
+            if item_dict["fast_path"] is True:
+                resumo["fast_path"] += 1
+            elif item_dict["fast_path"] is False:
+                resumo["llm"] += 1
+            row = persist_result(db, transacao_id, item_dict)
+            resumo["processados"] += 1
+            if is_error_row(row):
+                resumo["erros"] += 1
+            yield _stream_event("item", {"index": pendentes[pos], "item": row}, formato)
+
+        record_fast_path_counts(db, transacao_id, resumo["fast_path"], resumo["llm"])
+        yield _stream_event("summary", resumo, formato)
+    except Exception as e:
+        logger.exception(f"Erro no stream de processamento da transação {transacao_id}")
+        yield _stream_event("error", {"detail": str(e)}, formato)
+    finally:
+        db.close()
 
-            db_fabricante = crud.get_or_create_fabricante(db, nome=fabricante, localizacao=localizacao)
-            db_item_salvo = crud.upsert_item(db, item_data=item_dict, fabricante_id=db_fabricante.id)
-            
-            if db_item_salvo: 
-                existing_link = db.query(models.TransacaoItem).filter(
-                    models.TransacaoItem.transacao_id == transacao_id,
-                    models.TransacaoItem.item_partnumber == db_item_salvo.partnumber
-                ).first()
-                if not existing_link:
-                    crud.link_item_to_transacao(db, transacao_id=transacao_id, item_partnumber=db_item_salvo.partnumber)
-
-            processed_rows.append({
-                "partnumber": pn, 
-                "fabricante": fabricante, 
-                "localizacao": localizacao,
-                "ncm": ncm_final, 
-                "descricao": descricao_final, 
-                "is_new_manufacturer": is_new
-            })
 
-        except Exception as e:
-            logger.exception(f"Erro inesperado processando item PN {pn}")
-            processed_rows.append({
-                "partnumber": pn, "fabricante": "Erro Processamento", "localizacao": "",
-                "ncm": "Erro", "descricao": desc_raw, "is_new_manufacturer": False
-            })
-            continue
+@router.post("/process_items/{transacao_id}/stream", status_code=status.HTTP_200_OK)
+async def process_items_stream(
+    transacao_id: int, 
+    data: ProcessRequest, 
+    request: Request, 
+    formato: str = "ndjson",
+    db: Session = Depends(database.get_db),
+    current_user: models.Usuario = Depends(get_current_user)
+):
+    """
+    Variante de /process_items que envia cada FinalItem assim que fica pronto.
+    formato: 'ndjson' (uma linha JSON por evento) ou 'sse' (Server-Sent Events).
+    Eventos: 'item' ({index, item}), 'progress' (contagens parciais, enquanto
+    nenhum item sai), 'summary' (contagens finais) e 'error'.
+    """
+    if formato not in ("ndjson", "sse"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Formato inválido. Use 'ndjson' ou 'sse'.")
+    if not data.items:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Lista de itens para processar está vazia.")
+    _get_transacao_do_usuario(db, transacao_id, current_user.id)
 
-    return JSONResponse(content=processed_rows)
+    rag_service = _get_or_create_rag(request, settings.ncm_csv_path)
+    media_type = "text/event-stream" if formato == "sse" else "application/x-ndjson"
+    return StreamingResponse(
+        _process_items_events(transacao_id, current_user.id, data.items, rag_service, formato),
+        media_type=media_type,
+        # desativa o buffer de proxies (nginx) para os eventos chegarem na hora
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @router.post("/generate_excel", status_code=status.HTTP_200_OK)
 async def generate_excel(data: ExcelRequest, current_user: models.Usuario = Depends(get_current_user)):
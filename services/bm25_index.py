@@ -0,0 +1,56 @@
+import math
+from collections import defaultdict
+from typing import List, Tuple
+import numpy as np
+
+
+class BM25Index:
+    """
+    Índice invertido BM25 sobre textos já limpos (tokens separados por espaço).
+    Os pesos de cada posting são pré-calculados na construção, então a consulta
+    é só somar os pesos dos termos presentes.
+    """
+
+    def __init__(self, docs: List[str], k1: float = 1.5, b: float = 0.75):
+        self.n_docs = len(docs)
+        tokenized = [doc.split() for doc in docs]
+        lengths = np.array([len(tokens) for tokens in tokenized], dtype=np.float32)
+        avgdl = float(lengths.mean()) if self.n_docs else 0.0
+        norm = k1 * (1 - b + b * lengths / max(avgdl, 1e-9))
+
+        term_freqs: dict[str, dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        for doc_id, tokens in enumerate(tokenized):
+            for token in tokens:
+                term_freqs[token][doc_id] += 1
+
+        self.postings: dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        for token, freqs in term_freqs.items():
+            doc_ids = np.fromiter(freqs.keys(), dtype=np.int32, count=len(freqs))
+            tf = np.fromiter(freqs.values(), dtype=np.float32, count=len(freqs))
+            df = len(freqs)
+            idf = math.log(1 + (self.n_docs - df + 0.5) / (df + 0.5))
+            weights = idf * tf * (k1 + 1) / (tf + norm[doc_ids])
+            self.postings[token] = (doc_ids, weights.astype(np.float32))
+
+    def scores(self, query: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Retorna (doc_ids, scores) dos documentos que contêm algum termo da consulta.
+        """
+        acc = np.zeros(self.n_docs, dtype=np.float32)
+        for token in set(query.split()):
+            posting = self.postings.get(token)
+            if posting is not None:
+                acc[posting[0]] += posting[1]
+        doc_ids = np.flatnonzero(acc)
+        return doc_ids, acc[doc_ids]
+
+    def top_k(self, query: str, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Os k documentos de maior score BM25, em ordem decrescente.
+        """
+        doc_ids, scores = self.scores(query)
+        if len(doc_ids) > k:
+            part = np.argpartition(-scores, k - 1)[:k]
+            doc_ids, scores = doc_ids[part], scores[part]
+        order = np.argsort(-scores, kind="stable")
+        return doc_ids[order], scores[order]
@@ -1,27 +1,125 @@
-import pdfplumber
-import io
-import re
-from typing import List
+import os
+import logging
+import atexit
+import shutil
+import tempfile
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait
+from typing import IO, Dict, Iterator, List, Optional, Union
+from services.pdf_engines import get_engine
+from services.layout_service import LineParser, detect_layout, get_layout
+from app.core.config import settings
 
-def extract_lines_from_pdf_bytes(pdf_bytes: bytes) -> List[str]:
+
+logger = logging.getLogger(__name__)
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def _extract_page_range(source: Union[bytes, str], start: int, stop: int, engine_name: str, layout_name: str) -> List[Dict]:
     """
-    Recebe bytes de um PDF e retorna as linhas de itens extraídas.
+    Itens das páginas [start, stop). Roda no processo do pool;
+    source são os bytes do PDF ou o caminho de um arquivo temporário.
     """
+    parser = get_layout(layout_name)
     itens = []
-    pdf_buffer = io.BytesIO(pdf_bytes) 
-
-    with pdfplumber.open(pdf_buffer) as pdf:
-        for page in pdf.pages:
-            texto = page.extract_text()
-            if not texto:
-                continue
-            # Regex para capturar apenas a descrição do item
-            pattern_itens = r'^\d{2}\s+\d{6,}\s*-\s*(.*?)(?:\s\d{3,4}\s\d{2}/\d{2}/\d{2,4}\s[\d.,]+\s[\d.,]+\s[\d.,]+)?$'
-            for linha in texto.splitlines():
-                match = re.match(pattern_itens, linha.strip())
-                if match:
-                    itens.append(match.group(1).strip())
-
-    for item in itens:
-        print(item)
-    return itens
\ No newline at end of file
+    for texto in get_engine(engine_name).page_texts(source, start, stop):
+        itens.extend(parser.parse_page(texto))
+    return itens
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: o processo da API tem threads (uvicorn, torch) e fork não é seguro
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.pdf_extract_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+
+def shutdown_extract_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+atexit.register(shutdown_extract_pool)
+
+
+def _page_ranges(start: int, stop: int, n_parts: int) -> List[tuple]:
+    tamanho = max(1, -(-(stop - start) // n_parts))
+    return [(i, min(i + tamanho, stop)) for i in range(start, stop, tamanho)]
+
+
+def _usa_paralelo(n_pages: int) -> bool:
+    return settings.pdf_extract_workers > 1 and n_pages >= settings.pdf_parallel_min_pages
+
+
+def _copy_to_named_file(pdf_file) -> str:
+    """
+    Copia o PDF em blocos para um arquivo temporário com caminho, que os processos
+    do pool conseguem abrir (o spool do upload não tem nome no sistema de arquivos).
+    """
+    pdf_file.seek(0)
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+        shutil.copyfileobj(pdf_file, tmp)
+    return tmp.name
+
+
+def _layout_do_documento(primeira_pagina: str, layout: Optional[str]) -> LineParser:
+    layout = layout or settings.pdf_layout
+    if layout:
+        return get_layout(layout)
+    parser = detect_layout(primeira_pagina)
+    logger.info(f"Layout do pedido detectado: {parser.name}")
+    return parser
+
+
+def iter_items(pdf_file: IO[bytes], engine: Optional[str] = None, layout: Optional[str] = None) -> Iterator[List[Dict]]:
+    """
+    Gera os itens ({partnumber, descricao_raw, quantidade, preco}) de um PDF aberto
+    (arquivo ou spool de upload) página a página, para o chamador gravar enquanto
+    as páginas seguintes são lidas. O layout é detectado uma vez, pela primeira
+    página, a menos que seja informado. engine: motor de extração (PDF_EXTRACT_ENGINE
+    por padrão). No modo paralelo (PDF_EXTRACT_WORKERS) a primeira página é lida
+    aqui (e usada na detecção) e as demais, por faixa de páginas nos processos do
+    pool; os itens saem na ordem das páginas.
+    Bloqueante (CPU): consumir em thread a partir de código assíncrono.
+    """
+    engine_name = engine or settings.pdf_extract_engine
+    motor = get_engine(engine_name)
+    n_pages = motor.page_count(pdf_file)
+    if not _usa_paralelo(n_pages):
+        parser = None
+        for texto in motor.page_texts(pdf_file):
+            if parser is None:
+                parser = _layout_do_documento(texto, layout)
+            yield parser.parse_page(texto)
+        return
+
+    primeira = next(motor.page_texts(pdf_file, 0, 1), "")
+    parser = _layout_do_documento(primeira, layout)
+    pool = _get_pool()
+    caminho = _copy_to_named_file(pdf_file)
+    futures = []
+    try:
+        futures = [
+            pool.submit(_extract_page_range, caminho, start, stop, engine_name, parser.name)
+            for start, stop in _page_ranges(1, n_pages, settings.pdf_extract_workers)
+        ]
+        yield parser.parse_page(primeira)
+        for future in futures:
+            yield future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+        # só apaga depois que nenhum processo do pool está lendo o arquivo
+        wait(futures)
+        os.remove(caminho)
+
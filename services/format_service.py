@@ -1,32 +1,28 @@
 import re
-from typing import List, Dict
+from typing import Tuple
 
-def format_many(itens: List[str]) -> List[Dict[str, str]]:
+_PN_RE = re.compile(r'\bPN:\s*([^\s]+)', flags=re.IGNORECASE)
+# caso não haja "PN:", assume que o PN é a primeira palavra que não seja só número/medida
+#Provisório -> tem que trocar caso outro PDF não siga essa lógica
+_PRIMEIRA_PALAVRA_RE = re.compile(r'^([A-Z0-9\.\-]+)\s+(.*)$', flags=re.IGNORECASE)
+
+
+def split_partnumber(texto: str) -> Tuple[str, str]:
     """
-    Recebe uma lista de strings e separa em partnumber e descricao_raw.
-    Retorna lista de dicts com chaves: 'partnumber', 'descricao_raw'.
-    
+    Separa (partnumber, descricao) de uma descrição de item.
     Prioriza 'PN:'; só usa a primeira palavra se 'PN:' não existir.
     """
-    resultado = []
-
-    for item in itens:
-        pn = ""
-        desc = item.strip()
-
-        match_pn = re.search(r'\bPN:\s*([^\s]+)', desc, flags=re.IGNORECASE)
-        if match_pn:
-            pn = match_pn.group(1).strip()
-            desc = re.sub(r'\bPN:\s*[^\s]+', '', desc, flags=re.IGNORECASE).strip()
-        else:
-            # caso não haja "PN:", assume que o PN é a primeira palavra que não seja só número/medida
-            #Provisório -> tem que trocar caso outro PDF não siga essa lógica
-            match_inicio = re.match(r'^([A-Z0-9\.\-]+)\s+(.*)$', desc, flags=re.IGNORECASE)
-            if match_inicio:
-                pn = match_inicio.group(1).strip()
-                desc = match_inicio.group(2).strip()
+    pn = ""
+    desc = texto.strip()
 
-        resultado.append({"partnumber": pn, "descricao_raw": desc})
+    match_pn = _PN_RE.search(desc)
+    if match_pn:
+        pn = match_pn.group(1).strip()
+        desc = _PN_RE.sub('', desc).strip()
+    else:
+        match_inicio = _PRIMEIRA_PALAVRA_RE.match(desc)
+        if match_inicio:
+            pn = match_inicio.group(1).strip()
+            desc = match_inicio.group(2).strip()
+    return pn, desc
 
-    print(resultado)
-    return resultado
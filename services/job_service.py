@@ -0,0 +1,291 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List, Optional
+from sqlalchemy.orm import Session
+from database import crud
+from database.database import SessionLocal, engine
+from models import models
+from services.persistence_service import cached_row, persist_result, record_fast_path_counts, is_error_row
+from services.pipeline_service import iter_classified_items
+from services.rag_service import RAGService
+from app.core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+JOB_STATUSES = ("queued", "running", "done", "failed")
+
+
+def _agora() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def submit_job(db: Session, transacao_id: int, usuario_id: int, itens: List[dict]) -> models.Job:
+    """
+    Enfileira a classificação de itens ({partnumber, descricao_raw}) de uma transação.
+    """
+    itens_json = json.dumps(
+        [{"partnumber": it["partnumber"], "descricao_raw": it["descricao_raw"]} for it in itens],
+        ensure_ascii=False
+    )
+    db_job = crud.create_job(db, transacao_id=transacao_id, usuario_id=usuario_id, itens_json=itens_json, total=len(itens))
+    if _pool is not None:
+        _pool.notify()
+    return db_job
+
+
+def pending_items(db_transacao: models.Transacao) -> List[dict]:
+    """
+    Itens da transação que ainda não têm NCM/fabricante (os mesmos de 'pending_items' do detalhe).
+    """
+    return [
+        {"partnumber": ti.item.partnumber, "descricao_raw": ti.item.descricao_curta or ti.item.descricao or ""}
+        for ti in db_transacao.itens
+        if ti.item and not (ti.item.fabricante and ti.item.ncm)
+    ]
+
+
+def job_status(db_job: models.Job) -> dict:
+    return {
+        "job_id": db_job.id,
+        "transacao_id": db_job.transacao_id,
+        "status": db_job.status,
+        "total": db_job.total,
+        "processados": db_job.processados,
+        "erros": db_job.erros,
+        "progresso": db_job.processados / db_job.total if db_job.total else 1.0,
+        "tentativas": db_job.tentativas,
+        "erro": db_job.erro,
+        "created_at": db_job.created_at.isoformat() if db_job.created_at else None,
+        "started_at": db_job.started_at.isoformat() if db_job.started_at else None,
+        "finished_at": db_job.finished_at.isoformat() if db_job.finished_at else None,
+    }
+
+
+class JobOwnershipLost(RuntimeError):
+    """O job foi retomado por outro worker (este ficou sem heartbeat)."""
+
+
+async def _heartbeat(job_id: int, worker_id: str, interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        with SessionLocal() as db:
+            if not await asyncio.to_thread(crud.update_job, db, job_id, worker_id, heartbeat_at=_agora()):
+                return
+
+
+async def run_job(job_id: int, worker_id: str, rag_service: RAGService) -> None:
+    """
+    Classifica os itens do job, persistindo e atualizando o progresso item a item.
+    Itens que já estão classificados no banco (de uma execução anterior que caiu)
+    não voltam ao pipeline: é assim que o job é retomado.
+    """
+    db = SessionLocal()
+    heartbeat = asyncio.create_task(_heartbeat(job_id, worker_id, max(1.0, settings.job_stale_seconds / 3)))
+    try:
+        # as chamadas ao banco são bloqueantes: rodam em thread para não parar o
+        # event loop da API quando os workers estão no mesmo processo
+        itens, transacao_id, rows, pendentes = await asyncio.to_thread(_carregar_job, db, job_id)
+        processados = len(itens) - len(pendentes)
+        erros = 0
+        if pendentes and processados:
+            logger.info(f"Job {job_id}: retomando, {processados} de {len(itens)} itens já estavam no banco.")
+        await asyncio.to_thread(crud.update_job, db, job_id, worker_id, processados=processados, erros=0, heartbeat_at=_agora())
+
+        fast_path_count = llm_count = 0
+        resultados = iter_classified_items(
+            [(itens[idx]["partnumber"], itens[idx]["descricao_raw"]) for idx in pendentes], rag_service
+        )
+        async for pos, item_dict in resultados:
+            if item_dict["fast_path"] is True:
+                fast_path_count += 1
+            elif item_dict["fast_path"] is False:
+                llm_count += 1
+            row = await asyncio.to_thread(persist_result, db, transacao_id, item_dict)
+            rows[pendentes[pos]] = row
+            processados += 1
+            erros += is_error_row(row)
+            if not await asyncio.to_thread(
+                crud.update_job, db, job_id, worker_id, processados=processados, erros=erros, heartbeat_at=_agora()
+            ):
+                await resultados.aclose()
+                raise JobOwnershipLost(f"Job {job_id} foi retomado por outro worker.")
+
+        await asyncio.to_thread(record_fast_path_counts, db, transacao_id, fast_path_count, llm_count)
+        await asyncio.to_thread(
+            crud.update_job, db, job_id, worker_id, status="done", resultado=json.dumps(rows, ensure_ascii=False),
+            finished_at=_agora(), heartbeat_at=_agora()
+        )
+        logger.info(f"Job {job_id} concluído: {processados} itens, {erros} com erro.")
+    except JobOwnershipLost as e:
+        logger.warning(str(e))
+    except Exception as e:
+        logger.exception(f"Erro no job {job_id}")
+        await asyncio.to_thread(_marcar_falha, job_id, worker_id, str(e))
+    finally:
+        heartbeat.cancel()
+        db.close()
+
+
+def _carregar_job(db: Session, job_id: int):
+    """
+    Itens do job, transação, linhas já classificadas no banco (None nas que faltam)
+    e os índices dos itens pendentes.
+    """
+    db_job = crud.get_job(db, job_id)
+    itens = json.loads(db_job.itens)
+    rows: List[Optional[dict]] = [cached_row(db, db_job.transacao_id, item["partnumber"]) for item in itens]
+    pendentes = [idx for idx, row in enumerate(rows) if row is None]
+    return itens, db_job.transacao_id, rows, pendentes
+
+
+def _marcar_falha(job_id: int, worker_id: str, erro: str) -> None:
+    """
+    Marca o job como 'failed' em uma sessão nova (a do job pode estar inválida).
+    Erros do banco aqui só são logados: o job fica sem heartbeat e é retomado
+    (ou esgota as tentativas) pela reserva normal.
+    """
+    try:
+        with SessionLocal() as db:
+            crud.update_job(db, job_id, worker_id, status="failed", erro=erro, finished_at=_agora())
+    except Exception:
+        logger.exception(f"Não foi possível marcar o job {job_id} como falho")
+
+
+def _claim(worker_id: str) -> Optional[int]:
+    stale_before = _agora() - timedelta(seconds=settings.job_stale_seconds)
+    with SessionLocal() as db:
+        crud.fail_exhausted_jobs(db, stale_before, settings.job_max_attempts)
+        db_job = crud.claim_next_job(db, worker_id, stale_before, settings.job_max_attempts)
+        return db_job.id if db_job else None
+
+
+class JobWorkerPool:
+    """
+    Workers que consomem a tabela 'jobs'. Podem rodar dentro da API (JOB_WORKERS > 0)
+    ou em um processo separado (python -m services.job_service); os dois modos podem
+    coexistir, pois a reserva de cada job é atômica no banco.
+    """
+
+    def __init__(self, rag_provider: Callable[[], RAGService], workers: int = settings.job_workers,
+                 poll_seconds: float = settings.job_poll_seconds):
+        self.rag_provider = rag_provider
+        self.n_workers = max(1, workers)
+        self.poll_seconds = poll_seconds
+        self.prefix = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._wakeup: asyncio.Event | None = None
+        self._loop = None
+        self._workers: list[asyncio.Task] = []
+        self._closing = False
+        self.running: dict[str, int] = {}
+        self.completed = 0
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._workers = [self._loop.create_task(self._worker(f"{self.prefix}:{n}")) for n in range(self.n_workers)]
+        logger.info(f"{self.n_workers} worker(s) de jobs iniciados ({self.prefix}).")
+
+    def notify(self):
+        """
+        Acorda os workers ociosos (chamado ao enfileirar, inclusive de outra thread).
+        """
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _worker(self, worker_id: str):
+        while True:
+            try:
+                job_id = await asyncio.to_thread(_claim, worker_id)
+            except Exception:
+                logger.exception("Erro ao buscar job na fila")
+                job_id = None
+
+            if job_id is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            logger.info(f"Worker {worker_id} iniciou o job {job_id}.")
+            self.running[worker_id] = job_id
+            try:
+                rag_service = await asyncio.to_thread(self.rag_provider)
+                await run_job(job_id, worker_id, rag_service)
+                self.completed += 1
+            except asyncio.CancelledError:
+                # só o close() encerra o worker; um cancelamento vindo de dentro do
+                # job (ex.: chamada compartilhada cancelada) derruba só aquele job
+                if self._closing:
+                    raise
+                logger.error(f"Job {job_id} cancelado durante a execução.")
+                await asyncio.to_thread(_marcar_falha, job_id, worker_id, "Execução cancelada.")
+            except Exception as e:
+                logger.exception(f"Erro no job {job_id}")
+                await asyncio.to_thread(_marcar_falha, job_id, worker_id, str(e))
+            finally:
+                self.running.pop(worker_id, None)
+
+    async def close(self):
+        self._closing = True
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def stats(self) -> dict:
+        return {"workers": len(self._workers), "running": dict(self.running), "completed": self.completed}
+
+
+_pool: JobWorkerPool | None = None
+
+
+def start_job_workers(rag_provider: Callable[[], RAGService], workers: int = settings.job_workers) -> JobWorkerPool:
+    global _pool
+    _pool = JobWorkerPool(rag_provider, workers=workers)
+    _pool.start()
+    return _pool
+
+
+def get_job_pool() -> JobWorkerPool | None:
+    return _pool
+
+
+async def close_job_workers():
+    if _pool is not None:
+        await _pool.close()
+
+
+async def _run_standalone(workers: int):
+    rag: list[RAGService] = []
+
+    def rag_provider() -> RAGService:
+        if not rag:
+            rag.append(RAGService(settings.ncm_csv_path))
+        return rag[0]
+
+    from services import search_service, ollama_client
+
+    models.Base.metadata.create_all(bind=engine)
+    pool = start_job_workers(rag_provider, workers=workers)
+    try:
+        await asyncio.gather(*pool._workers)
+    finally:
+        await pool.close()
+        await search_service.close_search_pool()
+        await ollama_client.close_ollama_client()
+
+
+if __name__ == "__main__":
+    # Worker separado da API, usando o banco como fila:
+    #   python -m services.job_service [n_workers]
+    import sys
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_run_standalone(int(sys.argv[1]) if len(sys.argv) > 1 else max(1, settings.job_workers)))
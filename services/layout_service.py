@@ -0,0 +1,106 @@
+import re
+from typing import Dict, List, Optional
+from services.format_service import split_partnumber
+
+_MILHAR_RE = re.compile(r"\d{1,3}\.\d{3}")
+
+
+def parse_numero(valor: Optional[str]) -> Optional[float]:
+    """
+    Converte números no formato brasileiro ('1.234,56') ou simples ('12.5', '10').
+    """
+    if not valor:
+        return None
+    valor = valor.strip()
+    if "," in valor:
+        valor = valor.replace(".", "").replace(",", ".")
+    elif valor.count(".") > 1 or _MILHAR_RE.fullmatch(valor):
+        valor = valor.replace(".", "")
+    try:
+        return float(valor)
+    except ValueError:
+        return None
+
+
+class LineParser:
+    """
+    Parser de linhas de item de um layout de pedido de compra. Uma única regex
+    pré-compilada por layout extrai, na mesma passada, os grupos 'desc' e,
+    quando o layout tem, 'pn', 'qtd' e 'preco'. Sem 'pn', o partnumber sai da
+    descrição (format_service.split_partnumber).
+    """
+
+    def __init__(self, name: str, pattern: str, flags: int = 0):
+        self.name = name
+        self.line_re = re.compile(pattern, flags)
+
+    def parse_line(self, linha: str) -> Optional[Dict]:
+        match = self.line_re.match(linha.strip())
+        if not match:
+            return None
+        grupos = match.groupdict()
+        if grupos.get("pn"):
+            pn, desc = grupos["pn"], grupos["desc"].strip()
+        else:
+            pn, desc = split_partnumber(grupos["desc"])
+        return {
+            "partnumber": pn,
+            "descricao_raw": desc,
+            "quantidade": parse_numero(grupos.get("qtd")),
+            "preco": parse_numero(grupos.get("preco")),
+        }
+
+    def parse_page(self, texto: str) -> List[Dict]:
+        itens = []
+        for linha in texto.splitlines():
+            item = self.parse_line(linha)
+            if item is not None:
+                itens.append(item)
+        return itens
+
+    def score(self, texto: str) -> int:
+        """
+        Quantas linhas do texto este layout reconhece (usado na detecção).
+        """
+        return sum(1 for linha in texto.splitlines() if self.line_re.match(linha.strip()))
+
+
+_NUM_BR = r'\d{1,3}(?:\.\d{3})*,\d{2,4}'
+
+# Ordem importa: em empate na detecção, vence o primeiro (o layout original).
+LAYOUTS: Dict[str, LineParser] = {p.name: p for p in (
+    # Layout original: "01 123456 - <descrição> [cód data qtd preço total]"
+    LineParser(
+        "padrao",
+        r'^\d{2}\s+\d{6,}\s*-\s*(?P<desc>.*?)'
+        r'(?:\s\d{3,4}\s\d{2}/\d{2}/\d{2,4}\s(?P<qtd>[\d.,]+)\s(?P<preco>[\d.,]+)\s[\d.,]+)?$'
+    ),
+    # Tabela com PN na primeira coluna: "[item] <PN> <descrição> <qtd> [unid] <preço> <total>"
+    LineParser(
+        "pn_primeiro",
+        r'^(?:\d{1,4}\s+)?(?P<pn>(?=[A-Z\-./]*\d)[A-Z0-9][A-Z0-9.\-/]{3,})\s+(?P<desc>.+?)\s+'
+        r'(?P<qtd>\d+(?:,\d+)?)\s+(?:[A-Z]{1,4}\s+)?(?P<preco>' + _NUM_BR + r')\s+' + _NUM_BR + r'$'
+    ),
+)}
+
+DEFAULT_LAYOUT = "padrao"
+
+
+def get_layout(name: str) -> LineParser:
+    parser = LAYOUTS.get(name)
+    if parser is None:
+        raise ValueError(f"Layout desconhecido: {name}. Opções: {', '.join(LAYOUTS)}")
+    return parser
+
+
+def detect_layout(primeira_pagina: str) -> LineParser:
+    """
+    Escolhe o layout que reconhece mais linhas do texto da primeira página.
+    Roda uma vez por documento; sem nenhuma linha reconhecida, usa o padrão.
+    """
+    melhor, melhor_score = LAYOUTS[DEFAULT_LAYOUT], 0
+    for parser in LAYOUTS.values():
+        score = parser.score(primeira_pagina)
+        if score > melhor_score:
+            melhor, melhor_score = parser, score
+    return melhor
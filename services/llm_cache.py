@@ -0,0 +1,92 @@
+import hashlib
+import json
+import threading
+from typing import Any, Iterable
+from app.core.config import settings
+from database import crud
+from database.database import SessionLocal
+
+CACHE_NORMALIZACAO = "normalizacao"
+CACHE_ESCOLHA_NCM = "escolha_ncm"
+
+
+class LLMCache:
+    """
+    Cache persistente (tabela cache_llm) das respostas do LLM, endereçado pelo
+    conteúdo: sha256 do modelo, da versão do template do prompt e da entrada.
+    Limitado a max_entries (remove as menos usadas recentemente) e com
+    contadores de hit/miss por tipo. Falhas do banco nunca quebram a chamada.
+    """
+
+    def __init__(self, model: str = settings.ollama_model, enabled: bool = settings.llm_cache_enabled,
+                 max_entries: int = settings.llm_cache_max_entries):
+        self.model = model
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._counters: dict[str, dict[str, int]] = {}
+
+    def key(self, tipo: str, versao: int, entrada: Any) -> str:
+        conteudo = json.dumps(
+            {"model": self.model, "tipo": tipo, "prompt_version": versao, "input": entrada},
+            sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+    def _count(self, tipo: str, hits: int, misses: int):
+        with self._lock:
+            c = self._counters.setdefault(tipo, {"hits": 0, "misses": 0})
+            c["hits"] += hits
+            c["misses"] += misses
+
+    def get_many(self, tipo: str, versao: int, entradas: Iterable[Any]) -> dict[str, str]:
+        """
+        Retorna {chave: valor} das entradas encontradas no cache.
+        """
+        if not self.enabled:
+            return {}
+        chaves = list(dict.fromkeys(self.key(tipo, versao, e) for e in entradas))
+        db = SessionLocal()
+        try:
+            encontrados = {c.chave: c.valor for c in crud.get_cache_llm(db, chaves)}
+        except Exception as e:
+            print(f"[ERRO Cache LLM] Falha ao ler: {e}")
+            encontrados = {}
+        finally:
+            db.close()
+        self._count(tipo, len(encontrados), len(chaves) - len(encontrados))
+        return encontrados
+
+    def get(self, tipo: str, versao: int, entrada: Any) -> str | None:
+        return self.get_many(tipo, versao, [entrada]).get(self.key(tipo, versao, entrada))
+
+    def put_many(self, tipo: str, versao: int, itens: Iterable[tuple[Any, str]]) -> None:
+        if not self.enabled:
+            return
+        registros = [
+            {"chave": self.key(tipo, versao, entrada), "tipo": tipo, "modelo": self.model, "valor": valor}
+            for entrada, valor in itens if valor
+        ]
+        if not registros:
+            return
+        db = SessionLocal()
+        try:
+            crud.set_cache_llm(db, registros, self.max_entries)
+        except Exception as e:
+            print(f"[ERRO Cache LLM] Falha ao gravar: {e}")
+        finally:
+            db.close()
+
+    def put(self, tipo: str, versao: int, entrada: Any, valor: str) -> None:
+        self.put_many(tipo, versao, [(entrada, valor)])
+
+    def stats(self) -> dict:
+        with self._lock:
+            resultado = {}
+            for tipo, c in self._counters.items():
+                total = c["hits"] + c["misses"]
+                resultado[tipo] = {**c, "hit_rate": c["hits"] / total if total else 0.0}
+            return resultado
+
+
+llm_cache = LLMCache()
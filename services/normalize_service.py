@@ -1,21 +1,73 @@
+import asyncio
+import json
 import re
 import unidecode
 import requests
+from functools import lru_cache
+from typing import Iterable, List
 from nltk.corpus import stopwords
 from app.core.config import settings
+from services.singleflight import get_group
+from services.ollama_client import get_ollama_client
+from services.llm_cache import llm_cache, CACHE_NORMALIZACAO, CACHE_ESCOLHA_NCM
 
 STOPWORDS_PT = set(stopwords.words("portuguese"))
 
 OLLAMA_URL = settings.ollama_url
 OLLAMA_MODEL = settings.ollama_model
 
-def limpar_texto(text: str) -> str:
-    text = str(text).lower()
-    text = unidecode.unidecode(text)
-    text = re.sub(r"[^\w\s]", " ", text)
+# Incrementar sempre que limpar_texto mudar de comportamento (invalida o índice NCM em disco).
+CLEANING_VERSION = 1
+
+# Versões dos templates de prompt: incrementar ao mudar um prompt invalida o cache do LLM.
+# A de normalização vale para o prompt por item e para o prompt em lote.
+NORMALIZACAO_PROMPT_VERSION = 1
+ESCOLHA_NCM_PROMPT_VERSION = 2
+
+_NON_WORD_RE = re.compile(r"[^\w\s]")
+# Mesma substituição do regex acima, para texto ASCII (saída do unidecode), via str.translate.
+_NON_WORD_ASCII_TABLE = str.maketrans({chr(c): " " for c in range(128) if _NON_WORD_RE.match(chr(c))})
+
+class _TabelaUnidecode(dict):
+    """
+    Transliteração do unidecode por code point, calculada na primeira vez que o
+    caractere aparece, para uso com str.translate (o unidecode é caractere a caractere).
+    """
+    def __missing__(self, codepoint: int) -> str:
+        valor = self[codepoint] = unidecode.unidecode(chr(codepoint))
+        return valor
+
+_UNIDECODE_TABLE = _TabelaUnidecode()
+
+@lru_cache(maxsize=65536)
+def _limpar_texto_cached(text: str) -> str:
+    text = text.lower()
+    if not text.isascii():
+        text = text.translate(_UNIDECODE_TABLE)
+    if text.isascii():
+        text = text.translate(_NON_WORD_ASCII_TABLE)
+    else:
+        text = _NON_WORD_RE.sub(" ", text)
     tokens = [w for w in text.split() if w not in STOPWORDS_PT]
     return " ".join(tokens).strip()
 
+def limpar_texto(text: str) -> str:
+    return _limpar_texto_cached(str(text))
+
+def limpar_textos(textos: Iterable) -> List[str]:
+    """
+    Versão em lote de limpar_texto para listas ou Series: cada texto distinto
+    é limpo uma única vez (e memoizado entre chamadas).
+    """
+    vistos = {}
+    resultado = []
+    for text in map(str, textos):
+        limpo = vistos.get(text)
+        if limpo is None:
+            limpo = vistos[text] = _limpar_texto_cached(text)
+        resultado.append(limpo)
+    return resultado
+
 def _parse_ollama_response(resp):
     try:
         j = resp.json()
@@ -31,7 +83,21 @@ def _first_line(text: str) -> str:
     lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
     return lines[0] if lines else ""
 
-def normalizar_com_ollama(texto: str) -> str:
+_OLLAMA_TIMEOUT = (settings.ollama_connect_timeout, settings.ollama_read_timeout)
+
+def ping_ollama(timeout: float = 120) -> None:
+    """
+    Carrega o modelo no Ollama (prompt vazio apenas carrega o modelo na memória).
+    """
+    payload = {"model": OLLAMA_MODEL, "prompt": "", "stream": False, "keep_alive": settings.ollama_keep_alive}
+    resp = requests.post(OLLAMA_URL, json=payload, timeout=timeout)
+    resp.raise_for_status()
+
+def _options(num_predict: int) -> dict:
+    # O Ollama ignora 'max_tokens'/'temperature' no topo do payload; o limite é options.num_predict.
+    return {"temperature": 0.0, "num_predict": num_predict}
+
+def _payload_normalizacao(texto: str) -> dict:
     prompt = (
         "Normalize a descrição de um componente eletrônico em UMA linha.\n"
         "- Expanda abreviações (ex: CAP->capacitor).\n"
@@ -39,20 +105,16 @@ def normalizar_com_ollama(texto: str) -> str:
         "- Retorne apenas a linha normalizada.\n\n"
         f"Input: {texto}\n\nResposta:"
     )
-    payload = {
+    return {
         "model": OLLAMA_MODEL,
         "prompt": prompt,
-        "temperature": 0.0,
-        "max_tokens": 150,
+        "options": _options(150),
         "stream": False,
-        "think": False
+        "think": False,
+        "keep_alive": settings.ollama_keep_alive
     }
-    resp = requests.post(OLLAMA_URL, json=payload, timeout=None)
-    resp.raise_for_status()
-    raw = _parse_ollama_response(resp)
-    return _first_line(raw)
 
-def choose_best_ncm(item_desc: str, top_candidates: list) -> str:
+def _payload_escolha_ncm(item_desc: str, top_candidates: list) -> dict:
     prompt = (
         "Você recebe a descrição de um item e alguns candidatos NCM (cada NCM tem 8 dígitos).\n"
         "RETORNE APENAS o código NCM (8 dígitos) mais adequado.\n\n"
@@ -61,21 +123,261 @@ def choose_best_ncm(item_desc: str, top_candidates: list) -> str:
     for c in top_candidates:
         prompt += f"NCM: {c['ncm']} | Descricao: {c['descricao_longa']}\n"
 
-    payload = {
+    return {
         "model": OLLAMA_MODEL,
         "prompt": prompt,
-        "temperature": 0.0,
-        "max_tokens": 32,
+        "options": _options(32),
         "stream": False,
-        "think": False
+        "think": False,
+        "keep_alive": settings.ollama_keep_alive
     }
+
+def _payload_normalizacao_lote(textos: List[str]) -> dict:
+    entradas = "\n".join(f"{i}: {texto}" for i, texto in enumerate(textos))
+    prompt = (
+        "Normalize cada descrição de componente eletrônico abaixo em UMA linha.\n"
+        "- Expanda abreviações (ex: CAP->capacitor).\n"
+        "- Mantenha unidades (10UF, 100V, etc).\n"
+        "- Responda SOMENTE com um objeto JSON com uma chave por índice, no formato "
+        '{"0": "linha normalizada", "1": "linha normalizada"}.\n\n'
+        f"Entradas:\n{entradas}\n"
+    )
+    return {
+        "model": OLLAMA_MODEL,
+        "prompt": prompt,
+        "options": _options(150 * len(textos)),
+        "stream": False,
+        "think": False,
+        "format": "json",
+        "keep_alive": settings.ollama_keep_alive
+    }
+
+def _parse_lote(raw: str, total: int) -> dict[int, str]:
+    """
+    Extrai as linhas válidas da resposta JSON do lote; índices ausentes,
+    vazios ou com tipo errado ficam de fora (e serão refeitos item a item).
+    """
     try:
-        resp = requests.post(OLLAMA_URL, json=payload, timeout=None)
-        resp.raise_for_status()
-        raw = _parse_ollama_response(resp)
-        m = re.search(r'\b(\d{8})\b', raw)
-        if m:
+        data = json.loads(raw)
+    except (TypeError, ValueError):
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    validos = {}
+    for i in range(total):
+        valor = data.get(str(i))
+        if isinstance(valor, str) and _first_line(valor):
+            validos[i] = _first_line(valor)
+    return validos
+
+_NCM_RE = re.compile(r'(?<!\d)(\d{8})(?!\d)')
+
+def _ncm_candidato(raw: str, top_candidates: list, completo: bool = True) -> str | None:
+    """
+    Primeiro NCM da resposta que esteja entre os candidatos. Com completo=False
+    (texto ainda chegando), ignora um número colado ao fim do texto, que pode crescer.
+    """
+    candidatos = {c["ncm"] for c in top_candidates}
+    for m in _NCM_RE.finditer(raw):
+        if not completo and m.end() == len(raw):
+            break
+        if m.group(1) in candidatos:
             return m.group(1)
+    return None
+
+def _ncm_da_resposta(raw: str, top_candidates: list) -> str:
+    ncm = _ncm_candidato(raw, top_candidates)
+    if ncm:
+        return ncm
+    m = _NCM_RE.search(raw)
+    if m:
+        return m.group(1)
+    return top_candidates[0]["ncm"]
+
+def _tem_linha_completa(texto: str) -> bool:
+    return "\n" in texto.lstrip()
+
+def _gerar_sync(payload: dict, stop=None) -> str:
+    """
+    Chamada síncrona ao Ollama. Com OLLAMA_STREAM, lê em streaming e fecha a
+    conexão (interrompendo a geração) assim que stop(texto_parcial) for verdadeiro.
+    """
+    if not settings.ollama_stream or stop is None:
+        resp = requests.post(OLLAMA_URL, json=payload, timeout=_OLLAMA_TIMEOUT)
+        resp.raise_for_status()
+        return _parse_ollama_response(resp)
+    texto = ""
+    with requests.post(OLLAMA_URL, json={**payload, "stream": True}, timeout=_OLLAMA_TIMEOUT, stream=True) as resp:
+        resp.raise_for_status()
+        for linha in resp.iter_lines():
+            if not linha:
+                continue
+            parte = json.loads(linha)
+            if "error" in parte:
+                raise RuntimeError(f"Erro do Ollama: {parte['error']}")
+            texto += parte.get("response", "")
+            if parte.get("done") or stop(texto):
+                break
+    return texto
+
+async def _gerar_async(payload: dict, stop=None) -> str:
+    client = get_ollama_client()
+    if not settings.ollama_stream or stop is None:
+        return _parse_ollama_response(await client.generate(payload))
+    return await client.stream_generate(payload, stop)
+
+def _entrada_escolha(item_desc: str, top_candidates: list) -> dict:
+    return {"item": item_desc, "candidatos": [[c["ncm"], c.get("descricao_longa")] for c in top_candidates]}
+
+def _normalizar_com_ollama(texto: str) -> str:
+    cached = llm_cache.get(CACHE_NORMALIZACAO, NORMALIZACAO_PROMPT_VERSION, texto)
+    if cached is not None:
+        return cached
+    raw = _gerar_sync(_payload_normalizacao(texto), _tem_linha_completa)
+    resultado = _first_line(raw)
+    llm_cache.put(CACHE_NORMALIZACAO, NORMALIZACAO_PROMPT_VERSION, texto, resultado)
+    return resultado
+
+def _choose_best_ncm(item_desc: str, top_candidates: list) -> str:
+    entrada = _entrada_escolha(item_desc, top_candidates)
+    cached = llm_cache.get(CACHE_ESCOLHA_NCM, ESCOLHA_NCM_PROMPT_VERSION, entrada)
+    if cached is not None:
+        return cached
+    try:
+        raw = _gerar_sync(
+            _payload_escolha_ncm(item_desc, top_candidates),
+            lambda parcial: _ncm_candidato(parcial, top_candidates, completo=False) is not None
+        )
+        ncm = _ncm_da_resposta(raw, top_candidates)
+        llm_cache.put(CACHE_ESCOLHA_NCM, ESCOLHA_NCM_PROMPT_VERSION, entrada, ncm)
+        return ncm
     except Exception as e:
         print(f"Erro no LLM: {e}")
     return top_candidates[0]["ncm"]
+
+async def _normalizar_com_ollama_async(texto: str) -> str:
+    cached = await asyncio.to_thread(llm_cache.get, CACHE_NORMALIZACAO, NORMALIZACAO_PROMPT_VERSION, texto)
+    if cached is not None:
+        return cached
+    raw = await _gerar_async(_payload_normalizacao(texto), _tem_linha_completa)
+    resultado = _first_line(raw)
+    await asyncio.to_thread(llm_cache.put, CACHE_NORMALIZACAO, NORMALIZACAO_PROMPT_VERSION, texto, resultado)
+    return resultado
+
+async def _choose_best_ncm_async(item_desc: str, top_candidates: list) -> str:
+    entrada = _entrada_escolha(item_desc, top_candidates)
+    cached = await asyncio.to_thread(llm_cache.get, CACHE_ESCOLHA_NCM, ESCOLHA_NCM_PROMPT_VERSION, entrada)
+    if cached is not None:
+        return cached
+    try:
+        raw = await _gerar_async(
+            _payload_escolha_ncm(item_desc, top_candidates),
+            lambda parcial: _ncm_candidato(parcial, top_candidates, completo=False) is not None
+        )
+        ncm = _ncm_da_resposta(raw, top_candidates)
+        await asyncio.to_thread(llm_cache.put, CACHE_ESCOLHA_NCM, ESCOLHA_NCM_PROMPT_VERSION, entrada, ncm)
+        return ncm
+    except Exception as e:
+        print(f"Erro no LLM: {e}")
+    return top_candidates[0]["ncm"]
+
+# Chamadas simultâneas com a mesma entrada (mesmo lote ou usuários diferentes)
+# compartilham uma única ida ao Ollama.
+_normalizar_flight = get_group("normalizar_com_ollama")
+_choose_flight = get_group("choose_best_ncm")
+
+def _choose_key(item_desc: str, top_candidates: list) -> tuple:
+    return (item_desc, tuple(c["ncm"] for c in top_candidates))
+
+def normalizar_com_ollama(texto: str) -> str:
+    """
+    Normaliza uma descrição via Ollama (versão síncrona, para scripts e threads).
+    """
+    return _normalizar_flight.do(texto, _normalizar_com_ollama, texto)
+
+def choose_best_ncm(item_desc: str, top_candidates: list) -> str:
+    """
+    Escolhe o NCM entre os candidatos via Ollama (versão síncrona); em caso de erro, fica com o primeiro candidato.
+    """
+    return _choose_flight.do(_choose_key(item_desc, top_candidates), _choose_best_ncm, item_desc, top_candidates)
+
+async def normalizar_com_ollama_async(texto: str) -> str:
+    """
+    Versão assíncrona de normalizar_com_ollama (cliente HTTP compartilhado, sem bloquear o event loop).
+    """
+    return await _normalizar_flight.do_async(texto, _normalizar_com_ollama_async, texto)
+
+async def choose_best_ncm_async(item_desc: str, top_candidates: list) -> str:
+    """
+    Versão assíncrona de choose_best_ncm (cliente HTTP compartilhado, sem bloquear o event loop).
+    """
+    return await _choose_flight.do_async(
+        _choose_key(item_desc, top_candidates), _choose_best_ncm_async, item_desc, top_candidates
+    )
+
+async def _executar(coros: list, return_exceptions: bool = True) -> list:
+    """
+    Executa as corrotinas em paralelo ou uma a uma (PIPELINE_CONCURRENT), na ordem.
+    Com return_exceptions, a exceção de cada uma fica no lugar do resultado.
+    """
+    if settings.pipeline_concurrent:
+        return list(await asyncio.gather(*coros, return_exceptions=return_exceptions))
+    resultados = []
+    for coro in coros:
+        try:
+            resultados.append(await coro)
+        except Exception as e:
+            if not return_exceptions:
+                for restante in coros[len(resultados) + 1:]:
+                    restante.close()
+                raise
+            resultados.append(e)
+    return resultados
+
+async def _normalizar_chunk_async(textos: List[str]) -> list:
+    validos: dict[int, str] = {}
+    try:
+        resp = await get_ollama_client().generate(_payload_normalizacao_lote(textos))
+        validos = _parse_lote(_parse_ollama_response(resp), len(textos))
+    except Exception as e:
+        print(f"Erro na normalização em lote, refazendo item a item: {e}")
+    if validos:
+        await asyncio.to_thread(
+            llm_cache.put_many, CACHE_NORMALIZACAO, NORMALIZACAO_PROMPT_VERSION,
+            [(textos[i], linha) for i, linha in validos.items()]
+        )
+
+    faltando = [i for i in range(len(textos)) if i not in validos]
+    if faltando:
+        refeitos = await _executar([normalizar_com_ollama_async(textos[i]) for i in faltando])
+        validos.update(zip(faltando, refeitos))
+    return [validos[i] for i in range(len(textos))]
+
+async def normalizar_lote_com_ollama_async(textos: List[str], chunk_size: int = settings.ollama_normalize_chunk_size) -> list:
+    """
+    Normaliza várias descrições enviando blocos de chunk_size por chamada ao Ollama
+    (resposta JSON indexada). Entradas ausentes ou inválidas na resposta são refeitas
+    uma a uma. Com PIPELINE_CONCURRENT=false, as chamadas ao Ollama são feitas uma
+    de cada vez. Retorna, na ordem, a linha normalizada ou a exceção daquele item.
+    """
+    unicos = list(dict.fromkeys(textos))
+    if chunk_size <= 1:
+        resultados = await _executar([normalizar_com_ollama_async(t) for t in unicos])
+        por_texto = dict(zip(unicos, resultados))
+        return [por_texto[t] for t in textos]
+
+    # só vai ao LLM o que ainda não está no cache
+    cached = await asyncio.to_thread(llm_cache.get_many, CACHE_NORMALIZACAO, NORMALIZACAO_PROMPT_VERSION, unicos)
+    por_texto = {}
+    pendentes = []
+    for t in unicos:
+        valor = cached.get(llm_cache.key(CACHE_NORMALIZACAO, NORMALIZACAO_PROMPT_VERSION, t))
+        if valor is not None:
+            por_texto[t] = valor
+        else:
+            pendentes.append(t)
+
+    blocos = [pendentes[i:i + chunk_size] for i in range(0, len(pendentes), chunk_size)]
+    por_bloco = await _executar([_normalizar_chunk_async(b) for b in blocos], return_exceptions=False)
+    por_texto.update(zip(pendentes, (r for bloco in por_bloco for r in bloco)))
+    return [por_texto[t] for t in textos]
@@ -0,0 +1,101 @@
+import asyncio
+import json
+from typing import Callable
+import httpx
+from app.core.config import settings
+
+
+class OllamaClient:
+    """
+    Cliente HTTP assíncrono compartilhado para o Ollama: conexões reaproveitadas
+    (keep-alive), timeouts de conexão/leitura, limite de chamadas simultâneas e
+    'keep_alive' do modelo para que ele não seja descarregado entre pedidos.
+    """
+
+    def __init__(self, url: str = settings.ollama_url, model: str = settings.ollama_model,
+                 connect_timeout: float = settings.ollama_connect_timeout,
+                 read_timeout: float = settings.ollama_read_timeout,
+                 max_concurrency: int = settings.llm_concurrency,
+                 max_connections: int = settings.ollama_max_connections,
+                 keep_alive: str = settings.ollama_keep_alive):
+        self.url = url
+        self.model = model
+        self.keep_alive = keep_alive
+        self._timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self._limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._max_concurrency = max(1, max_concurrency)
+        self._client: httpx.AsyncClient | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+        self._loop = None
+        self.streams = 0
+        self.early_stops = 0
+
+    def _ensure_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._loop = loop
+            self._client = httpx.AsyncClient(timeout=self._timeout, limits=self._limits)
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+        return self._client
+
+    def _with_defaults(self, payload: dict) -> dict:
+        return {"model": self.model, "keep_alive": self.keep_alive, **payload}
+
+    async def generate(self, payload: dict) -> httpx.Response:
+        """
+        POST em /api/generate (sem streaming). Levanta erro para status HTTP >= 400.
+        """
+        client = self._ensure_client()
+        async with self._semaphore:
+            resp = await client.post(self.url, json=self._with_defaults(payload))
+        resp.raise_for_status()
+        return resp
+
+    async def stream_generate(self, payload: dict, stop: Callable[[str], bool] | None = None) -> str:
+        """
+        POST em /api/generate com streaming: junta os tokens à medida que chegam e
+        devolve o texto. Se stop(texto_parcial) for verdadeiro, fecha a conexão na
+        hora, o que faz o Ollama interromper a geração.
+        """
+        client = self._ensure_client()
+        texto = ""
+        async with self._semaphore:
+            self.streams += 1
+            async with client.stream("POST", self.url, json=self._with_defaults({**payload, "stream": True})) as resp:
+                resp.raise_for_status()
+                async for linha in resp.aiter_lines():
+                    if not linha:
+                        continue
+                    parte = json.loads(linha)
+                    if "error" in parte:
+                        raise RuntimeError(f"Erro do Ollama: {parte['error']}")
+                    texto += parte.get("response", "")
+                    if parte.get("done"):
+                        break
+                    if stop is not None and stop(texto):
+                        self.early_stops += 1
+                        break
+        return texto
+
+    def stats(self) -> dict:
+        return {"streams": self.streams, "early_stops": self.early_stops}
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+_client: OllamaClient | None = None
+
+
+def get_ollama_client() -> OllamaClient:
+    global _client
+    if _client is None:
+        _client = OllamaClient()
+    return _client
+
+
+async def close_ollama_client():
+    if _client is not None:
+        await _client.aclose()
@@ -0,0 +1,141 @@
+import io
+import threading
+from typing import IO, Iterator, Protocol, Union
+import pdfplumber
+import pypdfium2 as pdfium
+
+PdfSource = Union[bytes, str, IO[bytes]]
+
+
+class ExtractionEngine(Protocol):
+    """
+    Motor de extração de texto: só precisa devolver o texto de cada página,
+    com as linhas separadas por quebra de linha (o parsing dos itens é feito depois).
+    """
+    name: str
+
+    def page_count(self, source: PdfSource) -> int: ...
+
+    def page_texts(self, source: PdfSource, start: int = 0, stop: int | None = None) -> Iterator[str]: ...
+
+
+def _rewind(source: PdfSource) -> PdfSource:
+    if isinstance(source, bytes):
+        return io.BytesIO(source)
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return source
+
+
+class PdfplumberEngine:
+    """Motor original: pdfplumber, com análise de layout completa."""
+    name = "pdfplumber"
+
+    def page_count(self, source: PdfSource) -> int:
+        with pdfplumber.open(_rewind(source)) as pdf:
+            return len(pdf.pages)
+
+    def page_texts(self, source: PdfSource, start: int = 0, stop: int | None = None) -> Iterator[str]:
+        with pdfplumber.open(_rewind(source)) as pdf:
+            for page in pdf.pages[start:stop]:
+                texto = page.extract_text()
+                # libera o cache de objetos da página: a memória não cresce com o número de páginas
+                page.close()
+                yield texto or ""
+
+
+# O pdfium não é thread-safe: toda chamada dentro do mesmo processo passa por este lock.
+_pdfium_lock = threading.Lock()
+
+# Distância horizontal (pt) a partir da qual dois trechos da mesma linha ganham um
+# espaço entre eles; mesmo valor padrão do x_tolerance do pdfplumber.
+_X_TOLERANCE = 3.0
+
+
+def _linhas_por_posicao(trechos: list[tuple[float, float, float, float, str]]) -> str:
+    """
+    Remonta as linhas da página a partir dos trechos de texto (left, bottom, right,
+    top, texto): trechos cujo centro vertical cai na faixa da linha atual ficam na
+    mesma linha, ordenados por x. Independe da ordem do texto no content stream.
+    """
+    linhas = []
+    atual, base, topo = [], 0.0, 0.0
+    for trecho in sorted(trechos, key=lambda t: -t[3]):
+        centro = (trecho[1] + trecho[3]) / 2
+        if atual and base <= centro <= topo:
+            atual.append(trecho)
+            continue
+        if atual:
+            linhas.append(atual)
+        atual, base, topo = [trecho], trecho[1], trecho[3]
+    if atual:
+        linhas.append(atual)
+
+    saida = []
+    for linha in linhas:
+        texto, fim = "", None
+        for left, _, right, _, parte in sorted(linha):
+            if fim is not None and left - fim > _X_TOLERANCE:
+                texto += " "
+            texto += parte
+            fim = right
+        saida.append(texto)
+    return "\n".join(saida)
+
+
+class PdfiumEngine:
+    """
+    Motor rápido: texto do pdfium (pypdfium2), sem a análise de layout do
+    pdfplumber. As linhas são remontadas pela posição dos trechos de texto.
+    """
+    name = "pdfium"
+
+    def _open(self, source: PdfSource):
+        if not isinstance(source, (bytes, str)):
+            source = _rewind(source)
+        with _pdfium_lock:
+            return pdfium.PdfDocument(source)
+
+    def page_count(self, source: PdfSource) -> int:
+        pdf = self._open(source)
+        try:
+            with _pdfium_lock:
+                return len(pdf)
+        finally:
+            with _pdfium_lock:
+                pdf.close()
+
+    def page_texts(self, source: PdfSource, start: int = 0, stop: int | None = None) -> Iterator[str]:
+        pdf = self._open(source)
+        try:
+            with _pdfium_lock:
+                total = len(pdf)
+            for i in range(start, total if stop is None else min(stop, total)):
+                with _pdfium_lock:
+                    page = pdf[i]
+                    textpage = page.get_textpage()
+                    trechos = []
+                    for n in range(textpage.count_rects()):
+                        rect = textpage.get_rect(n)
+                        parte = textpage.get_text_bounded(*rect).strip()
+                        if parte:
+                            trechos.append((*rect, parte))
+                    textpage.close()
+                    page.close()
+                yield _linhas_por_posicao(trechos)
+        finally:
+            with _pdfium_lock:
+                pdf.close()
+
+
+ENGINES: dict[str, ExtractionEngine] = {
+    PdfplumberEngine.name: PdfplumberEngine(),
+    PdfiumEngine.name: PdfiumEngine(),
+}
+
+
+def get_engine(name: str) -> ExtractionEngine:
+    engine = ENGINES.get(name)
+    if engine is None:
+        raise ValueError(f"Motor de extração desconhecido: {name}. Opções: {', '.join(ENGINES)}")
+    return engine
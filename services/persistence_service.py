@@ -0,0 +1,91 @@
+import logging
+from typing import Optional
+from sqlalchemy.orm import Session
+from database import crud
+from models import models
+
+
+logger = logging.getLogger(__name__)
+
+_FINAL_ITEM_ERRO = {"fabricante": "Erro Processamento", "localizacao": "", "ncm": "Erro", "is_new_manufacturer": False}
+
+
+def _link_if_missing(db: Session, transacao_id: int, partnumber: str):
+    existing_link = db.query(models.TransacaoItem).filter(
+        models.TransacaoItem.transacao_id == transacao_id,
+        models.TransacaoItem.item_partnumber == partnumber
+    ).first()
+    if not existing_link:
+        crud.link_item_to_transacao(db=db, transacao_id=transacao_id, item_partnumber=partnumber)
+
+
+def persist_processed_item(db: Session, transacao_id: int, item_dict: dict):
+    db_fabricante = crud.get_or_create_fabricante(db, nome=item_dict["fabricante"], localizacao=item_dict["localizacao"])
+    db_item_salvo = crud.upsert_item(db, item_data=item_dict, fabricante_id=db_fabricante.id)
+    if db_item_salvo:
+        _link_if_missing(db, transacao_id, db_item_salvo.partnumber)
+
+
+def cached_row(db: Session, transacao_id: int, partnumber: str) -> Optional[dict]:
+    """
+    Linha de FinalItem já classificada no banco para o PN (garantindo o vínculo
+    com a transação), ou None se o item ainda precisa ser processado.
+    """
+    db_item = crud.get_item_by_partnumber(db, partnumber)
+    if not (db_item and db_item.ncm and db_item.fabricante):
+        logger.info(f"Cache MISS para PN {partnumber}. Processando...")
+        return None
+
+    logger.info(f"Cache HIT para PN {partnumber}. Usando dados do DB.")
+    _link_if_missing(db, transacao_id, db_item.partnumber)
+    return {
+        "partnumber": db_item.partnumber,
+        "fabricante": db_item.fabricante.razao_soc,
+        "localizacao": db_item.fabricante.endereco or "Não encontrada",
+        "ncm": db_item.ncm,
+        "descricao": db_item.descricao or "",
+        "is_new_manufacturer": False
+    }
+
+
+def persist_result(db: Session, transacao_id: int, item_dict: dict) -> dict:
+    """
+    Persiste um resultado do pipeline (se for o caso) e devolve a linha de FinalItem.
+    """
+    persistir = item_dict.pop("persistir")
+    desc_raw = item_dict.pop("descricao_raw")
+    item_dict.pop("fast_path")
+    if persistir:
+        try:
+            persist_processed_item(db, transacao_id, {**item_dict, "descricao_raw": desc_raw})
+        except Exception:
+            db.rollback()
+            logger.exception(f"Erro inesperado processando item PN {item_dict['partnumber']}")
+            item_dict = {"partnumber": item_dict["partnumber"], **_FINAL_ITEM_ERRO, "descricao": desc_raw}
+    return item_dict
+
+
+def is_error_row(row: dict) -> bool:
+    return row["ncm"] in ("Erro", "Erro RAG")
+
+
+def record_fast_path_counts(db: Session, transacao_id: int, fast_path_count: int, llm_count: int):
+    """
+    Soma os contadores da transação em transacao_estatisticas (incremento no
+    próprio UPDATE, seguro com vários jobs da mesma transação).
+    """
+    if not (fast_path_count or llm_count):
+        return
+    logger.info(f"Transação {transacao_id}: {fast_path_count} itens pelo fast path, {llm_count} pelo LLM.")
+    estatistica = models.TransacaoEstatistica
+    try:
+        atualizados = db.query(estatistica).filter(estatistica.transacao_id == transacao_id).update({
+            estatistica.itens_fast_path: estatistica.itens_fast_path + fast_path_count,
+            estatistica.itens_llm: estatistica.itens_llm + llm_count,
+        }, synchronize_session=False)
+        if not atualizados:
+            db.add(estatistica(transacao_id=transacao_id, itens_fast_path=fast_path_count, itens_llm=llm_count))
+        db.commit()
+    except Exception:
+        db.rollback()
+        logger.exception(f"Erro ao registrar contadores de fast path da transação {transacao_id}")
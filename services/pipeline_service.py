@@ -0,0 +1,237 @@
+import asyncio
+import logging
+from typing import AsyncIterator, List, Tuple
+from services.normalize_service import normalizar_lote_com_ollama_async, choose_best_ncm_async
+from services.rag_service import RAGService
+from services.scraper_service import find_manufacturer_and_location_async
+from app.core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+KNOWN_MANUFACTURERS = {"texas instruments", "samsung electro-mechanics", "intel"}
+
+# Limite do trabalho de embeddings. A busca web é limitada pelo pool de
+# services/search_service (SCRAPE_CONCURRENCY) e o LLM pelo cliente de
+# services/ollama_client (LLM_CONCURRENCY).
+_embedding_semaphore = asyncio.Semaphore(max(1, settings.embedding_concurrency))
+
+
+async def _run_limited(semaphore: asyncio.Semaphore, fn, *args):
+    """
+    Executa uma função bloqueante em thread, respeitando o limite do semáforo.
+    """
+    async with semaphore:
+        return await asyncio.to_thread(fn, *args)
+
+
+async def _run_all(coros):
+    """
+    Executa as corrotinas em paralelo ou uma a uma (PIPELINE_CONCURRENT),
+    mantendo a ordem dos resultados.
+    """
+    if settings.pipeline_concurrent:
+        return list(await asyncio.gather(*coros))
+    return [await c for c in coros]
+
+
+def _error_row(pn: str, desc_raw: str) -> dict:
+    return {
+        "partnumber": pn, "fabricante": "Erro Processamento", "localizacao": "",
+        "ncm": "Erro", "descricao": desc_raw, "descricao_raw": desc_raw,
+        "is_new_manufacturer": False, "persistir": False, "fast_path": None
+    }
+
+
+def retrieval_is_confident(top_candidates: list) -> bool:
+    """
+    True quando o primeiro candidato tem similaridade >= NCM_FAST_PATH_MIN_SCORE e
+    está pelo menos NCM_FAST_PATH_MARGIN à frente do segundo: o LLM é dispensado.
+    Só vale para scores de cosseno (modos dense/hybrid) e com pelo menos 2
+    candidatos (sem segundo candidato não há margem a medir).
+    """
+    if not settings.ncm_fast_path_enabled or len(top_candidates) < 2:
+        return False
+    top1 = top_candidates[0].get("score")
+    top2 = top_candidates[1].get("score")
+    if top1 is None or top2 is None:
+        return False
+    return top1 >= settings.ncm_fast_path_min_score and top1 - top2 >= settings.ncm_fast_path_margin
+
+
+async def _collect_scraper_info(pn: str) -> dict | None:
+    """
+    Etapa 1a: fabricante/localização de um item. None se o item falhou (vira linha de erro).
+    """
+    try:
+        return await find_manufacturer_and_location_async(pn)
+    except Exception:
+        logger.exception(f"Erro inesperado processando item PN {pn}")
+        return None
+
+
+async def _collect_item_infos(itens: List[Tuple[str, str]]) -> List[dict | None]:
+    """
+    Etapa 1: buscas web por item e normalização das descrições (em lotes, se
+    OLLAMA_NORMALIZE_CHUNK_SIZE > 1), as duas correndo ao mesmo tempo
+    (uma depois da outra com PIPELINE_CONCURRENT=false).
+    """
+    scrapes, normalizadas = await _run_all([
+        _run_all([_collect_scraper_info(pn) for pn, _ in itens]),
+        normalizar_lote_com_ollama_async([desc_raw for _, desc_raw in itens]),
+    ])
+
+    infos: List[dict | None] = []
+    for (pn, desc_raw), scraper_info, desc_norm in zip(itens, scrapes, normalizadas):
+        if scraper_info is None:
+            infos.append(None)
+            continue
+        fabricante = scraper_info.get("fabricante", "Não identificado")
+        if isinstance(desc_norm, BaseException):
+            logger.warning(f"Fallback na normalização para PN {pn}: {desc_norm}")
+            desc_norm = desc_raw
+        infos.append({
+            "fabricante": fabricante,
+            "localizacao": scraper_info.get("localizacao", "Não encontrada"),
+            "is_new_manufacturer": fabricante != "Não identificado" and fabricante.lower() not in KNOWN_MANUFACTURERS,
+            "desc_norm": desc_norm,
+        })
+    return infos
+
+
+async def _retrieve_candidates(descs: List[str], rag_service: RAGService) -> List[list | Exception]:
+    """
+    Etapa 2: candidatos NCM de todos os itens em um único lote de embeddings.
+    Se o lote falhar, refaz item a item para que a falha fique isolada.
+    """
+    if not descs:
+        return []
+    try:
+        return await _run_limited(_embedding_semaphore, rag_service.find_top_ncm_many, descs, settings.top_k)
+    except Exception as e:
+        logger.warning(f"Erro RAG em lote, buscando item a item: {e}")
+
+    resultados: List[list | Exception] = []
+    for desc in descs:
+        try:
+            resultados.append(await _run_limited(_embedding_semaphore, rag_service.find_top_ncm, desc, settings.top_k))
+        except Exception as e:
+            resultados.append(e)
+    return resultados
+
+
+async def _finalize_item(pn: str, desc_raw: str, info: dict, top_candidates) -> dict:
+    """
+    Etapa 3: escolha do NCM final pelo LLM entre os candidatos do RAG.
+    """
+    desc_norm = info["desc_norm"]
+    base = {
+        "partnumber": pn,
+        "fabricante": info["fabricante"],
+        "localizacao": info["localizacao"],
+        "descricao_raw": desc_raw,
+        "is_new_manufacturer": info["is_new_manufacturer"],
+    }
+    try:
+        if isinstance(top_candidates, Exception):
+            raise top_candidates
+        if not top_candidates:
+            raise ValueError("Nenhum candidato NCM encontrado pelo RAG.")
+    except Exception as e:
+        logger.warning(f"Erro RAG para PN {pn} ({desc_norm}): {e}")
+        return {**base, "ncm": "Erro RAG", "descricao": desc_raw, "persistir": False, "fast_path": None}
+
+    fast_path = retrieval_is_confident(top_candidates)
+    if fast_path:
+        logger.info(f"Retrieval confiante para PN {pn}, LLM dispensado (score {top_candidates[0]['score']:.3f}).")
+        ncm_final = top_candidates[0]["ncm"]
+    else:
+        try:
+            ncm_final = await choose_best_ncm_async(desc_norm, top_candidates)
+        except Exception as e:
+            logger.warning(f"Erro escolha LLM para PN {pn}, usando top candidate: {e}")
+            ncm_final = top_candidates[0]["ncm"]
+
+    descricao_final = next(
+        (c.get("descricao_longa") or c.get("descricao", "")
+        for c in top_candidates if c.get("ncm") == ncm_final),
+        desc_norm
+    )
+    return {**base, "ncm": ncm_final, "descricao": descricao_final, "persistir": True, "fast_path": fast_path}
+
+
+async def _iter_lote(itens: List[Tuple[str, str]], infos: List[dict | None], rag_service: RAGService) -> AsyncIterator[Tuple[int, dict]]:
+    """
+    Etapas 2 e 3 de um lote cujas infos (etapa 1) já estão prontas.
+    """
+    ok_idx = []
+    for i, info in enumerate(infos):
+        if info is None:
+            yield i, _error_row(*itens[i])
+        else:
+            ok_idx.append(i)
+    if not ok_idx:
+        return
+
+    candidatos = await _retrieve_candidates([infos[i]["desc_norm"] for i in ok_idx], rag_service)
+
+    async def _finalize(i, top_candidates):
+        return i, await _finalize_item(itens[i][0], itens[i][1], infos[i], top_candidates)
+
+    if not settings.pipeline_concurrent:
+        for i, top_candidates in zip(ok_idx, candidatos):
+            yield await _finalize(i, top_candidates)
+        return
+
+    tasks = [asyncio.ensure_future(_finalize(i, c)) for i, c in zip(ok_idx, candidatos)]
+    try:
+        for proximo in asyncio.as_completed(tasks):
+            yield await proximo
+    finally:
+        # cliente desconectado no meio do stream: não deixa escolhas órfãs rodando
+        for task in tasks:
+            task.cancel()
+
+
+async def iter_classified_items(itens: List[Tuple[str, str]], rag_service: RAGService) -> AsyncIterator[Tuple[int, dict]]:
+    """
+    Igual a classify_items, mas entrega (índice, resultado) conforme cada item
+    termina. Os itens passam pelo pipeline em lotes de PIPELINE_BATCH_SIZE: os
+    primeiros chegam à escolha do NCM sem esperar as buscas do pedido inteiro, e
+    a etapa 1 do lote seguinte corre enquanto o atual termina (com
+    PIPELINE_CONCURRENT=true).
+    """
+    tamanho = settings.pipeline_batch_size if settings.pipeline_batch_size > 0 else max(1, len(itens))
+    lotes = [range(inicio, min(inicio + tamanho, len(itens))) for inicio in range(0, len(itens), tamanho)]
+
+    def _etapa1(lote: range):
+        return asyncio.ensure_future(_collect_item_infos([itens[i] for i in lote]))
+
+    proximo = _etapa1(lotes[0]) if lotes else None
+    try:
+        for n, lote in enumerate(lotes):
+            infos = await proximo
+            seguinte = lotes[n + 1] if n + 1 < len(lotes) else None
+            proximo = _etapa1(seguinte) if seguinte and settings.pipeline_concurrent else None
+            async for i, resultado in _iter_lote([itens[i] for i in lote], infos, rag_service):
+                yield lote[i], resultado
+            if seguinte and proximo is None:
+                proximo = _etapa1(seguinte)
+    finally:
+        if proximo is not None:
+            proximo.cancel()
+
+
+async def classify_items(itens: List[Tuple[str, str]], rag_service: RAGService) -> List[dict]:
+    """
+    Classifica uma lista de (partnumber, descricao_raw).
+
+    Retorna, na ordem de entrada, dicts com as chaves de FinalItem, além de
+    'descricao_raw', 'persistir' (False para linhas de erro, que não vão ao banco)
+    e 'fast_path' (True se o NCM veio direto do retrieval, sem LLM; None em erro).
+    Falhas ficam isoladas por item.
+    """
+    resultados: List[dict | None] = [None] * len(itens)
+    async for i, resultado in iter_classified_items(itens, rag_service):
+        resultados[i] = resultado
+    return resultados
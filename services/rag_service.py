@@ -1,44 +1,443 @@
 from fastapi import Request
+from typing import List, Tuple
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import numpy as np
 import pandas as pd
 import logging
 from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
-from .normalize_service import limpar_texto
+from .normalize_service import limpar_textos, CLEANING_VERSION
+from .bm25_index import BM25Index
+from .cache_utils import LRUCache
 from app.core.config import settings
 
 
 logger = logging.getLogger(__name__)
 
+# Incrementar quando o formato dos arquivos do índice mudar.
+INDEX_FORMAT_VERSION = 2
+
+RETRIEVAL_MODES = ("dense", "lexical", "hybrid")
+EMBEDDING_DTYPES = ("float32", "float16", "int8")
+
+# Linhas por bloco ao pontuar embeddings compactos (convertidos para float32 bloco a bloco).
+_SCORE_CHUNK_ROWS = 4096
+
+
+# Nome de um diretório de índice: os 16 dígitos hexadecimais de _index_key.
+_INDEX_NAME_RE = re.compile(r"[0-9a-f]{16}")
+
+
+def _file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _index_key(ncm_csv_path: str, model_name: str) -> Tuple[str, dict]:
+    """
+    Chave do índice em disco: muda se o conteúdo do CSV, o modelo
+    ou a versão da limpeza de texto mudarem.
+    """
+    meta = {
+        "csv_sha256": _file_sha256(ncm_csv_path),
+        "model": model_name,
+        "cleaning_version": CLEANING_VERSION,
+        "format_version": INDEX_FORMAT_VERSION,
+    }
+    key = hashlib.sha256(json.dumps(meta, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    return key, meta
+
+
+def _l2_normalize(vecs: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+    return (vecs / np.maximum(norms, 1e-12)).astype(np.float32)
+
+
+def _top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """
+    Índices dos top_k maiores scores de cada linha, em ordem decrescente.
+    Usa seleção parcial (argpartition) e só ordena os k escolhidos.
+    """
+    k = min(top_k, scores.shape[1])
+    if k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.intp)
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, part, axis=1), axis=1)
+    return np.take_along_axis(part, order, axis=1)
+
+
 class RAGService:
-    def __init__(self, ncm_csv_path: str):
+    def __init__(self, ncm_csv_path: str, model_name: str = settings.embedding_model, index_dir: str = settings.ncm_index_dir,
+                 retrieval_mode: str = settings.ncm_retrieval_mode, embedding_dtype: str = settings.ncm_embedding_dtype):
+        if retrieval_mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Modo de busca NCM inválido: {retrieval_mode} (use {', '.join(RETRIEVAL_MODES)})")
+        if embedding_dtype not in EMBEDDING_DTYPES:
+            raise ValueError(f"Tipo de embedding inválido: {embedding_dtype} (use {', '.join(EMBEDDING_DTYPES)})")
+        self.retrieval_mode = retrieval_mode
+        self.embedding_dtype = embedding_dtype
+        self.embedding_scales = None
+        self.quantization_report = None
+        self._embedding_cache = LRUCache(settings.ncm_cache_size)
+        self._results_cache = LRUCache(settings.ncm_cache_size)
+
+        # modelo embeddings
+        self.model = SentenceTransformer(model_name)
+        self.index_key, index_meta = _index_key(ncm_csv_path, model_name)
+        index_path = os.path.join(index_dir, self.index_key) if index_dir else None
+
+        if index_path and self._load_index(index_path):
+            logger.info(f"Índice NCM carregado do disco ({index_path}).")
+        else:
+            self.df_ncm = self._load_csv(ncm_csv_path)
+            logger.info("Gerando embeddings NCM... isso pode demorar alguns segundos...")
+            self.embeddings = self._encode(self.df_ncm["descricao_clean"].tolist())
+            if index_path:
+                self._save_index(index_path, index_meta)
+
+        self.prefilter_chapters = settings.ncm_prefilter_chapters
+        self.prefilter_headings = settings.ncm_prefilter_headings
+        # centróides só existem (e ocupam memória) com o pré-filtro ligado
+        if self._prefilter_enabled():
+            self._build_hierarchy()
+
+        self.lexical_candidates = settings.ncm_lexical_candidates
+        self.lexical_index = None
+        if self.retrieval_mode != "dense":
+            logger.info("Construindo índice léxico (BM25) sobre descricao_clean...")
+            self.lexical_index = BM25Index(self.df_ncm["descricao_clean"].astype(str).tolist())
+
+        if self.embedding_dtype != "float32":
+            self._quantize()
+
+        # resultados antigos não valem para um índice novo
+        self.clear_caches()
+
+    def _quantize(self):
+        """
+        Troca os embeddings float32 por float16 ou int8 (com escala por linha) e
+        descarta a coluna descricao_clean, que só é usada na construção dos índices.
+        Registra a memória economizada; o recall@k contra o float32 é medido à parte
+        (benchmarks/bench_quantizacao.py), não a cada startup.
+        """
+        baseline = np.asarray(self.embeddings, dtype=np.float32)
+        baseline_bytes = baseline.nbytes
+
+        if self.embedding_dtype == "float16":
+            self.embeddings = baseline.astype(np.float16)
+            self.embedding_scales = None
+            compact_bytes = self.embeddings.nbytes
+        else:
+            scales = np.abs(baseline).max(axis=1) / 127.0
+            scales = np.maximum(scales, 1e-12).astype(np.float32)
+            self.embeddings = np.round(baseline / scales[:, None]).astype(np.int8)
+            self.embedding_scales = scales
+            compact_bytes = self.embeddings.nbytes + scales.nbytes
+
+        df_bytes = int(self.df_ncm.memory_usage(deep=True).sum())
+        self.df_ncm = self.df_ncm.drop(columns=["descricao_clean"])
+        df_saved = df_bytes - int(self.df_ncm.memory_usage(deep=True).sum())
+
+        self.quantization_report = {
+            "dtype": self.embedding_dtype,
+            "embeddings_float32_bytes": int(baseline_bytes),
+            "embeddings_bytes": int(compact_bytes),
+            "embeddings_saved_bytes": int(baseline_bytes - compact_bytes),
+            "df_saved_bytes": df_saved,
+        }
+        logger.info(f"Embeddings NCM em {self.embedding_dtype}: {self.quantization_report}")
+
+    def _scores(self, q_vecs: np.ndarray, rows: np.ndarray | None = None) -> np.ndarray:
+        """
+        Similaridade (produto escalar) entre as consultas e as linhas da base.
+        Para float16/int8 a conversão para float32 é feita em blocos, sem
+        materializar a matriz inteira.
+        """
+        if self.embeddings.dtype == np.float32:
+            emb = self.embeddings if rows is None else self.embeddings[rows]
+            return q_vecs @ emb.T
+
+        n = self.embeddings.shape[0] if rows is None else len(rows)
+        out = np.empty((len(q_vecs), n), dtype=np.float32)
+        for start in range(0, n, _SCORE_CHUNK_ROWS):
+            end = min(start + _SCORE_CHUNK_ROWS, n)
+            idx = slice(start, end) if rows is None else rows[start:end]
+            out[:, start:end] = q_vecs @ self.embeddings[idx].astype(np.float32).T
+            if self.embedding_scales is not None:
+                out[:, start:end] *= self.embedding_scales[idx]
+        return out
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Embeddings já normalizados (L2) em float32: a similaridade de cosseno
+        vira um produto escalar simples.
+        """
+        vecs = self.model.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+        return np.ascontiguousarray(vecs, dtype=np.float32)
+
+    @staticmethod
+    def _load_csv(ncm_csv_path: str) -> pd.DataFrame:
         df = pd.read_csv(ncm_csv_path, encoding="utf-8")
         df.columns = [c.lower() for c in df.columns]
         if not all(c in df.columns for c in ["ncm", "descricao", "descricao_longa"]):
             raise ValueError("CSV precisa ter colunas: ncm, descricao, descricao_longa")
 
         df["ncm"] = df["ncm"].astype(str).str.replace(r"\D", "", regex=True).str.zfill(8)
-        df["descricao_clean"] = df["descricao"].astype(str).apply(limpar_texto)
-        self.df_ncm = df
+        df["descricao_clean"] = limpar_textos(df["descricao"].astype(str))
+        return df
 
-        # modelo embeddings
-        self.model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
-        logger.info("Gerando embeddings NCM... isso pode demorar alguns segundos...")
-        self.embeddings = self.model.encode(self.df_ncm["descricao_clean"].tolist(), convert_to_numpy=True)
+    def _load_index(self, index_path: str) -> bool:
+        """
+        Carrega tabela e embeddings de um índice já gerado (embeddings via memory-map).
+        """
+        emb_path = os.path.join(index_path, "embeddings.npy")
+        df_path = os.path.join(index_path, "ncm.pkl")
+        if not (os.path.exists(emb_path) and os.path.exists(df_path)):
+            return False
+        try:
+            self.df_ncm = pd.read_pickle(df_path)
+            self.embeddings = np.load(emb_path, mmap_mode="r")
+        except Exception as e:
+            logger.warning(f"Índice NCM em disco inválido ({index_path}), recriando: {e}")
+            return False
+        if len(self.df_ncm) != self.embeddings.shape[0]:
+            logger.warning(f"Índice NCM em disco inconsistente ({index_path}), recriando.")
+            return False
+        return True
+
+    def _save_index(self, index_path: str, index_meta: dict):
+        """
+        Grava o índice em um diretório temporário e o renomeia no final, para que
+        outro processo nunca leia um índice pela metade. Índices antigos são removidos.
+        """
+        parent = os.path.dirname(index_path) or "."
+        tmp_path = f"{index_path}.tmp-{os.getpid()}"
+        try:
+            os.makedirs(tmp_path, exist_ok=True)
+            np.save(os.path.join(tmp_path, "embeddings.npy"), self.embeddings)
+            self.df_ncm.to_pickle(os.path.join(tmp_path, "ncm.pkl"))
+            with open(os.path.join(tmp_path, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump({**index_meta, "rows": len(self.df_ncm)}, f, indent=2)
+            try:
+                os.rename(tmp_path, index_path)
+            except OSError:
+                # outro processo gravou o mesmo índice primeiro
+                shutil.rmtree(tmp_path, ignore_errors=True)
+        except Exception as e:
+            logger.warning(f"Não foi possível salvar o índice NCM em {index_path}: {e}")
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            return
+
+        logger.info(f"Índice NCM salvo em {index_path}.")
+        self._remove_old_indexes(parent)
+
+    def _remove_old_indexes(self, parent: str):
+        """
+        Remove de NCM_INDEX_DIR só o que segue o esquema de nomes do índice: índices
+        de outras chaves (com meta.json) e temporários deste processo. Outros
+        arquivos e os temporários de outros processos ficam intactos.
+        """
+        own_tmp = re.compile(rf"[0-9a-f]{{16}}\.tmp-{os.getpid()}")
+        for name in os.listdir(parent):
+            old_path = os.path.join(parent, name)
+            if name == self.index_key or not os.path.isdir(old_path):
+                continue
+            is_old_index = _INDEX_NAME_RE.fullmatch(name) and os.path.exists(os.path.join(old_path, "meta.json"))
+            if is_old_index or own_tmp.fullmatch(name):
+                shutil.rmtree(old_path, ignore_errors=True)
+
+    def _prefilter_enabled(self) -> bool:
+        return self.prefilter_chapters > 0 or self.prefilter_headings > 0
+
+    def _build_hierarchy(self):
+        """
+        Agrupa as linhas por posição (4 dígitos) e capítulo (2 dígitos) do NCM e
+        calcula o centróide normalizado de cada grupo, para o pré-filtro hierárquico.
+        """
+        ncm = self.df_ncm["ncm"].to_numpy(dtype=str)
+        self._heading_codes, heading_of_row = np.unique([c[:4] for c in ncm], return_inverse=True)
+        self._chapter_codes, chapter_of_heading = np.unique([h[:2] for h in self._heading_codes], return_inverse=True)
+
+        order = np.argsort(heading_of_row, kind="stable")
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(heading_of_row, minlength=len(self._heading_codes)))])
+        self._heading_rows = [order[bounds[i]:bounds[i + 1]] for i in range(len(self._heading_codes))]
+        self._chapter_headings = [np.flatnonzero(chapter_of_heading == c) for c in range(len(self._chapter_codes))]
+
+        heading_sums = np.stack([np.asarray(self.embeddings[rows], dtype=np.float32).sum(axis=0) for rows in self._heading_rows])
+        chapter_sums = np.stack([heading_sums[hs].sum(axis=0) for hs in self._chapter_headings])
+        self._heading_centroids = _l2_normalize(heading_sums)
+        self._chapter_centroids = _l2_normalize(chapter_sums)
+
+    def _prefilter_rows(self, q_vecs: np.ndarray) -> List[np.ndarray]:
+        """
+        Para cada consulta, as linhas que pertencem às melhores posições (e
+        capítulos) segundo os centróides. O custo por consulta passa a depender
+        do tamanho desses ramos, não da tabela inteira.
+        """
+        all_headings = np.arange(len(self._heading_codes))
+        if self.prefilter_chapters > 0:
+            top_chapters = _top_k_indices(q_vecs @ self._chapter_centroids.T, self.prefilter_chapters)
+            headings_per_query = [np.concatenate([self._chapter_headings[c] for c in chapters]) for chapters in top_chapters]
+        else:
+            headings_per_query = [all_headings] * len(q_vecs)
+
+        rows_per_query = []
+        for q, headings in zip(q_vecs, headings_per_query):
+            if self.prefilter_headings > 0:
+                scores = self._heading_centroids[headings] @ q
+                headings = headings[_top_k_indices(scores[None, :], self.prefilter_headings)[0]]
+            rows_per_query.append(np.concatenate([self._heading_rows[h] for h in headings]))
+        return rows_per_query
+
+    def _candidate_rows(self, cleaned: List[str], q_vecs: np.ndarray, top_k: int) -> List[np.ndarray | None]:
+        """
+        Linhas a pontuar com embeddings para cada consulta (None = tabela inteira).
+        No modo híbrido os candidatos vêm do BM25; com menos de top_k resultados
+        (poucos ou nenhum termo em comum), são somados às linhas do pré-filtro
+        hierárquico ou, sem pré-filtro, a consulta usa a tabela inteira.
+        """
+        if self._prefilter_enabled():
+            fallback = self._prefilter_rows(q_vecs)
+        else:
+            fallback = [None] * len(cleaned)
+
+        if self.retrieval_mode != "hybrid":
+            return fallback
+
+        rows_per_query = []
+        for text, rows in zip(cleaned, fallback):
+            lexical_rows, _ = self.lexical_index.top_k(text, self.lexical_candidates)
+            if len(lexical_rows) >= top_k:
+                rows_per_query.append(lexical_rows)
+            elif rows is not None:
+                rows_per_query.append(np.union1d(lexical_rows, rows))
+            else:
+                rows_per_query.append(None)
+        return rows_per_query
 
     def find_top_ncm(self, query_text: str, top_k=settings.top_k):
-        q_vec = self.model.encode([limpar_texto(query_text)], convert_to_numpy=True)
-        sims = cosine_similarity(q_vec, self.embeddings).flatten()
-        top_indices = sims.argsort()[-top_k:][::-1]
-        return self.df_ncm.iloc[top_indices].to_dict(orient="records")
-    
+        return self.find_top_ncm_many([query_text], top_k=top_k)[0]
 
+    def find_top_ncm_many(self, query_texts: List[str], top_k=settings.top_k) -> List[List[dict]]:
+        """
+        Busca os top_k candidatos NCM para várias descrições de uma vez:
+        um único encode em lote e um único produto de matrizes contra a base.
+        Consultas repetidas (mesmo texto limpo e top_k) saem do cache LRU.
+        """
+        if not query_texts:
+            return []
+        cleaned = limpar_textos(query_texts)
 
+        cached = {text: self._results_cache.get((text, top_k)) for text in dict.fromkeys(cleaned)}
+        pending = [text for text, records in cached.items() if records is None]
+        if pending:
+            for text, records in zip(pending, self._search(pending, top_k)):
+                self._results_cache.put((text, top_k), records)
+                cached[text] = records
+        return [[dict(r) for r in cached[text]] for text in cleaned]
 
-def _get_or_create_rag(request: Request, ncm_path:str) -> RAGService:
-        app_state = request.app.state
+    def _encode_queries(self, cleaned: List[str]) -> np.ndarray:
+        """
+        Encode das consultas limpas, reaproveitando vetores do cache LRU.
+        """
+        vecs = [self._embedding_cache.get(text) for text in cleaned]
+        missing = [i for i, v in enumerate(vecs) if v is None]
+        if missing:
+            for i, vec in zip(missing, self._encode([cleaned[i] for i in missing])):
+                self._embedding_cache.put(cleaned[i], vec)
+                vecs[i] = vec
+        return np.stack(vecs)
+
+    def _records(self, indices: np.ndarray, scores: np.ndarray, score_key: str = "score") -> List[dict]:
+        records = self.df_ncm.iloc[indices].to_dict(orient="records")
+        for record, score in zip(records, scores):
+            record[score_key] = float(score)
+        return records
+
+    def _search(self, cleaned: List[str], top_k: int) -> List[List[dict]]:
+        """
+        Candidatos com o score da busca: 'score' (similaridade de cosseno) nos modos
+        dense/hybrid e 'score_bm25' no modo lexical, que não é comparável ao cosseno.
+        """
+        if self.retrieval_mode == "lexical":
+            return self._search_lexical(cleaned, top_k)
+        return [self._records(indices, sims) for indices, sims in self._dense_top(cleaned, top_k)]
+
+    def _dense_top(self, cleaned: List[str], top_k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        (índices, similaridades) dos top_k de cada consulta pelos embeddings.
+        """
+        q_vecs = self._encode_queries(cleaned)
+        rows_per_query = self._candidate_rows(cleaned, q_vecs, top_k)
+
+        if all(rows is None for rows in rows_per_query):
+            sims = self._scores(q_vecs)
+            top_indices = _top_k_indices(sims, top_k)
+            return [(idx, row_sims[idx]) for idx, row_sims in zip(top_indices, sims)]
+
+        results = []
+        for q, rows in zip(q_vecs, rows_per_query):
+            sims = self._scores(q[None, :], rows)[0]
+            local = _top_k_indices(sims[None, :], top_k)[0]
+            indices = local if rows is None else rows[local]
+            results.append((indices, sims[local]))
+        return results
+
+    def _search_lexical(self, cleaned: List[str], top_k: int) -> List[List[dict]]:
+        """
+        Modo lexical: candidatos do BM25. Consultas com menos de top_k resultados
+        (nenhum ou poucos termos em comum com a tabela) são completadas pela busca
+        densa; esses candidatos trazem 'score' (cosseno) em vez de 'score_bm25'.
+        """
+        hits = [self.lexical_index.top_k(text, top_k) for text in cleaned]
+        esperado = min(top_k, len(self.df_ncm))
+        incompletas = [i for i, (indices, _) in enumerate(hits) if len(indices) < esperado]
+        densos = dict(zip(incompletas, self._dense_top([cleaned[i] for i in incompletas], top_k))) if incompletas else {}
+
+        results = []
+        for i, (indices, scores) in enumerate(hits):
+            records = self._records(indices, scores, score_key="score_bm25")
+            if i in densos:
+                dense_indices, dense_sims = densos[i]
+                novos = ~np.isin(dense_indices, indices)
+                records += self._records(dense_indices[novos], dense_sims[novos])[:top_k - len(records)]
+            results.append(records)
+        return results
+
+    def clear_caches(self):
+        self._embedding_cache.clear()
+        self._results_cache.clear()
+
+    def cache_stats(self) -> dict:
+        return {"embeddings": self._embedding_cache.stats(), "results": self._results_cache.stats()}
+
+
+_rag_lock = threading.Lock()
+
+
+def get_or_create_rag_for_app(app, ncm_path: str) -> RAGService:
+    """
+    Retorna o RAGService guardado em app.state, criando-o uma única vez
+    mesmo que o warm-up e uma requisição cheguem ao mesmo tempo.
+    """
+    app_state = app.state
+    rag = getattr(app_state, "rag_service", None)
+    if rag is not None:
+        return rag
+    with _rag_lock:
         rag = getattr(app_state, "rag_service", None)
         if rag is None:
             logger.info("Inicializando RAGService (carregando CSV e embeddings)...")
             rag = RAGService(ncm_path)
             setattr(app_state, "rag_service", rag)
-        return rag
+    return rag
+
+
+def _get_or_create_rag(request: Request, ncm_path:str) -> RAGService:
+    return get_or_create_rag_for_app(request.app, ncm_path)
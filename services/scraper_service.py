@@ -1,6 +1,13 @@
+import asyncio
 import re
-from collections import Counter
-from ddgs import DDGS
+from collections import Counter, deque
+from datetime import timedelta
+from functools import lru_cache
+from app.core.config import settings
+from database import crud
+from database.database import SessionLocal
+from services.singleflight import get_group
+from services.search_service import CircuitOpenError, DDGSBackend, get_search_pool
 
 # Certifique-se de que o arquivo 'fabricantes.txt' está na raiz do seu projeto (Back-API-SEMESTRE4/).
 FABRICANTES_TXT_PATH = "fabricantes.txt"
@@ -29,40 +36,120 @@ def carregar_fabricantes_com_variacoes(caminho_txt: str) -> dict[str, list[str]]
             
     return fabricantes_map
 
-def buscar_fabricante_com_pontuacao(part_number: str, fabricantes_map: dict[str, list[str]]) -> str | None:
+def _eh_palavra(c: str) -> bool:
+    return c.isalnum() or c == "_"
+
+def _eh_limite(texto: str, pos: int) -> bool:
+    """
+    Equivalente ao \\b do regex na posição pos.
+    """
+    antes = pos > 0 and _eh_palavra(texto[pos - 1])
+    depois = pos < len(texto) and _eh_palavra(texto[pos])
+    return antes != depois
+
+class FabricanteMatcher:
+    """
+    Autômato Aho-Corasick com todas as variações de fabricantes. Encontra todas as
+    menções (inclusive sobrepostas) em uma única passada pelo texto, respeitando
+    limites de palavra e ignorando maiúsculas/minúsculas.
+    """
+
+    def __init__(self, fabricantes_map: dict[str, list[str]]):
+        self._donos: list[str] = []
+        self._tamanhos: list[int] = []
+        self._goto: list[dict[str, int]] = [{}]
+        self._saidas: list[list[int]] = [[]]
+
+        for nome_principal, variacoes in fabricantes_map.items():
+            for variacao in variacoes:
+                padrao = variacao.lower()
+                if not padrao:
+                    continue
+                node = 0
+                for ch in padrao:
+                    proximo = self._goto[node].get(ch)
+                    if proximo is None:
+                        proximo = len(self._goto)
+                        self._goto[node][ch] = proximo
+                        self._goto.append({})
+                        self._saidas.append([])
+                    node = proximo
+                self._saidas[node].append(len(self._donos))
+                self._donos.append(nome_principal)
+                self._tamanhos.append(len(padrao))
+
+        # links de falha em largura; filhos da raiz falham para a raiz
+        self._falha = [0] * len(self._goto)
+        fila = deque(self._goto[0].values())
+        while fila:
+            node = fila.popleft()
+            for ch, filho in self._goto[node].items():
+                fila.append(filho)
+                f = self._falha[node]
+                while f and ch not in self._goto[f]:
+                    f = self._falha[f]
+                self._falha[filho] = self._goto[f].get(ch, 0)
+                self._saidas[filho] = self._saidas[filho] + self._saidas[self._falha[filho]]
+
+    def contar(self, texto: str) -> Counter:
+        """
+        Para cada fabricante, quantas de suas variações aparecem no texto.
+        """
+        texto = texto.lower()
+        encontrados = set()
+        node = 0
+        for i, ch in enumerate(texto):
+            while node and ch not in self._goto[node]:
+                node = self._falha[node]
+            node = self._goto[node].get(ch, 0)
+            for alias_id in self._saidas[node]:
+                if alias_id in encontrados:
+                    continue
+                inicio = i - self._tamanhos[alias_id] + 1
+                if _eh_limite(texto, inicio) and _eh_limite(texto, i + 1):
+                    encontrados.add(alias_id)
+        # ordem dos ids = ordem do arquivo, preservando o desempate do most_common
+        return Counter(self._donos[alias_id] for alias_id in sorted(encontrados))
+
+@lru_cache(maxsize=None)
+def get_fabricante_matcher(caminho_txt: str = FABRICANTES_TXT_PATH) -> FabricanteMatcher | None:
+    """
+    Carrega fabricantes.txt e monta o matcher uma única vez por processo.
+    """
+    fabricantes = carregar_fabricantes_com_variacoes(caminho_txt)
+    if not fabricantes:
+        return None
+    return FabricanteMatcher(fabricantes)
+
+def _fabricante_dos_resultados(resultados: list[dict], matcher: FabricanteMatcher) -> str | None:
+    if not resultados:
+        return None
+    texto_completo_busca = " ".join([r.get("title", "") + " " + r.get("body", "") for r in resultados])
+    ocorrencias = matcher.contar(texto_completo_busca)
+    if not ocorrencias:
+        return None
+    return ocorrencias.most_common(1)[0][0]
+
+# Backend das versões síncronas, que buscam direto (sem o pool, o limite de taxa e o circuit breaker)
+_sync_backend = DDGSBackend()
+
+def _buscar_fabricante(part_number: str, matcher: FabricanteMatcher) -> str | None:
+    resultados = _sync_backend.text(f'"{part_number}" manufacturer datasheet', max_results=10)
+    return _fabricante_dos_resultados(resultados, matcher)
+
+def buscar_fabricante_com_pontuacao(part_number: str, matcher: FabricanteMatcher) -> str | None:
     """
     Busca por um part number no DuckDuckGo e retorna o fabricante conhecido com a maior
     quantidade de menções nos resultados da busca.
     """
     if not part_number:
         return None
-        
-    query = f'"{part_number}" manufacturer datasheet'
-    ocorrencias = Counter()
-
     try:
-        with DDGS() as ddgs:
-            resultados = list(ddgs.text(query, max_results=10))
-            if not resultados:
-                return None
-
-            texto_completo_busca = " ".join([r.get("title", "") + " " + r.get("body", "") for r in resultados])
-
-            for nome_principal, variacoes in fabricantes_map.items():
-                for variacao in variacoes:
-                    padrao = r"\b" + re.escape(variacao) + r"\b"
-                    if re.search(padrao, texto_completo_busca, re.IGNORECASE):
-                        ocorrencias[nome_principal] += 1
-    
+        return _buscar_fabricante(part_number, matcher)
     except Exception as e:
         print(f"[ERRO DDGS - Fabricante] Falha ao buscar: {e}")
         return None
 
-    if not ocorrencias:
-        return None
-
-    return ocorrencias.most_common(1)[0][0]
-
 def extrair_cidade_pais(texto_endereco: str) -> str | None:
     """
     Usa RegEx para extrair o padrão 'Cidade, País' de um bloco de texto.
@@ -73,45 +160,176 @@ def extrair_cidade_pais(texto_endereco: str) -> str | None:
     matches = re.findall(padrao, texto_endereco)
     return matches[-1].strip() if matches else None
 
+def _localizacao_dos_resultados(resultados: list[dict]) -> str | None:
+    if not resultados:
+        return None
+    texto_enderecos = " ".join([r.get('body', '') for r in resultados])
+    return extrair_cidade_pais(texto_enderecos)
+
+def _buscar_cidade_pais(company_name: str) -> str | None:
+    resultados = _sync_backend.text(f"{company_name} headquarters address", max_results=5)
+    return _localizacao_dos_resultados(resultados)
+
 def buscar_cidade_pais_com_ddg(company_name: str) -> str | None:
     """
     Busca o endereço e extrai a cidade/país.
     """
     if not company_name:
         return None
-
-    query = f"{company_name} headquarters address"
-    
     try:
-        with DDGS() as ddgs:
-            resultados = list(ddgs.text(query, max_results=5))
-            if not resultados:
-                return None
-            
-            texto_enderecos = " ".join([r.get('body', '') for r in resultados])
-            return extrair_cidade_pais(texto_enderecos)
+        return _buscar_cidade_pais(company_name)
     except Exception as e:
         print(f"[ERRO DDGS - Endereço] Falha ao buscar: {e}")
         return None
 
-# --- Função Orquestradora para ser chamada pela Rota ---
+# --- Cache persistente das buscas ---
+CACHE_FABRICANTE = "fabricante"
+CACHE_LOCALIZACAO = "localizacao"
+
+def _ler_cache(tipo: str, chave: str):
+    """
+    Retorna a entrada válida do cache (valor None = resultado negativo) ou None se não houver.
+    """
+    db = SessionLocal()
+    try:
+        return crud.get_cache_busca(db, tipo, chave)
+    except Exception as e:
+        print(f"[ERRO Cache] Falha ao ler cache {tipo}/{chave}: {e}")
+        return None
+    finally:
+        db.close()
+
+def _gravar_cache(tipo: str, chave: str, valor: str | None):
+    horas = settings.scraper_cache_ttl_hours if valor else settings.scraper_cache_negative_ttl_hours
+    db = SessionLocal()
+    try:
+        crud.set_cache_busca(db, tipo, chave, valor, timedelta(hours=horas))
+    except Exception as e:
+        print(f"[ERRO Cache] Falha ao gravar cache {tipo}/{chave}: {e}")
+    finally:
+        db.close()
+
+# --- Orquestração (pool de buscas com limite de taxa e circuit breaker) ---
+_scraper_flight = get_group("find_manufacturer_and_location")
+# Buscas simultâneas pela mesma chave (ex.: a localização do mesmo fabricante para
+# vários PNs de um pedido) compartilham uma única leitura do cache e ida à web.
+_cache_flight = get_group("buscar_com_cache")
+
+def _buscar_com_cache(tipo: str, chave: str, buscar) -> str | None:
+    """
+    Versão síncrona de _buscar_com_cache_async (buscar é uma função comum).
+    """
+    return _cache_flight.do((tipo, chave), _buscar_com_cache_leader_sync, tipo, chave, buscar)
+
+def _buscar_com_cache_leader_sync(tipo: str, chave: str, buscar) -> str | None:
+    entrada = _ler_cache(tipo, chave)
+    if entrada is not None:
+        return entrada.valor
+    try:
+        valor = buscar()
+    except Exception as e:
+        print(f"[ERRO DDGS - {tipo}] Falha ao buscar: {e}")
+        return None
+    _gravar_cache(tipo, chave, valor)
+    return valor
+
+async def _buscar_com_cache_async(tipo: str, chave: str, buscar) -> str | None:
+    """
+    Consulta o cache antes de buscar na web. Resultados negativos ficam em cache
+    por menos tempo; erros de busca não são cacheados. CircuitOpenError é
+    propagado (e nada é cacheado) para o chamador cair direto no fallback.
+    """
+    return await _cache_flight.do_async((tipo, chave), _buscar_com_cache_leader, tipo, chave, buscar)
+
+async def _buscar_com_cache_leader(tipo: str, chave: str, buscar) -> str | None:
+    # o cache é lido dentro do flight: quem chega depois de uma busca concluída já o encontra preenchido
+    entrada = await asyncio.to_thread(_ler_cache, tipo, chave)
+    if entrada is not None:
+        return entrada.valor
+    try:
+        valor = await buscar()
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        print(f"[ERRO DDGS - {tipo}] Falha ao buscar: {e}")
+        return None
+    await asyncio.to_thread(_gravar_cache, tipo, chave, valor)
+    return valor
+
+async def _buscar_fabricante_async(part_number: str, matcher: FabricanteMatcher) -> str | None:
+    resultados = await get_search_pool().search(f'"{part_number}" manufacturer datasheet', max_results=10)
+    return _fabricante_dos_resultados(resultados, matcher)
+
+async def _buscar_cidade_pais_async(company_name: str) -> str | None:
+    resultados = await get_search_pool().search(f"{company_name} headquarters address", max_results=5)
+    return _localizacao_dos_resultados(resultados)
+
 def find_manufacturer_and_location(part_number: str):
     """
-    Orquestra a busca por fabricante e, em seguida, por sua localização.
+    Versão síncrona de find_manufacturer_and_location_async, para scripts e threads:
+    busca direto no DuckDuckGo, com o mesmo cache e a mesma deduplicação por PN.
+    """
+    return _scraper_flight.do((part_number or "").strip(), _find_manufacturer_and_location, part_number)
+
+def _find_manufacturer_and_location(part_number: str):
+    print(f"Iniciando busca de fabricante para o PN: {part_number}")
+    matcher = get_fabricante_matcher(FABRICANTES_TXT_PATH)
+    if not matcher:
+        return {"fabricante": "Arquivo 'fabricantes.txt' não encontrado", "localizacao": ""}
+
+    fabricante_encontrado = None
+    if part_number:
+        fabricante_encontrado = _buscar_com_cache(
+            CACHE_FABRICANTE, part_number.strip(), lambda: _buscar_fabricante(part_number, matcher)
+        )
+
+    if not fabricante_encontrado:
+        return {"fabricante": "Não identificado", "localizacao": ""}
+
+    localizacao = _buscar_com_cache(
+        CACHE_LOCALIZACAO, fabricante_encontrado, lambda: _buscar_cidade_pais(fabricante_encontrado)
+    )
+
+    return {
+        "fabricante": fabricante_encontrado,
+        "localizacao": localizacao if localizacao else "Não encontrada"
+    }
+
+async def find_manufacturer_and_location_async(part_number: str):
+    """
+    Orquestra a busca por fabricante e, em seguida, por sua localização, usando o
+    pool de buscas. Buscas simultâneas pelo mesmo PN compartilham a mesma execução.
+    Com o circuit breaker aberto o item vai direto para "Não identificado".
     """
+    return await _scraper_flight.do_async((part_number or "").strip(), _find_manufacturer_and_location_async, part_number)
+
+async def _find_manufacturer_and_location_async(part_number: str):
     print(f"Iniciando busca de fabricante para o PN: {part_number}")
-    fabricantes = carregar_fabricantes_com_variacoes(FABRICANTES_TXT_PATH)
-    if not fabricantes:
+    matcher = get_fabricante_matcher(FABRICANTES_TXT_PATH)
+    if not matcher:
         return {"fabricante": "Arquivo 'fabricantes.txt' não encontrado", "localizacao": ""}
 
-    fabricante_encontrado = buscar_fabricante_com_pontuacao(part_number, fabricantes)
-    
+    try:
+        fabricante_encontrado = None
+        if part_number:
+            fabricante_encontrado = await _buscar_com_cache_async(
+                CACHE_FABRICANTE, part_number.strip(), lambda: _buscar_fabricante_async(part_number, matcher)
+            )
+    except CircuitOpenError as e:
+        print(f"[DDGS] {e} PN {part_number} sem fabricante.")
+        return {"fabricante": "Não identificado", "localizacao": ""}
+
     if not fabricante_encontrado:
         return {"fabricante": "Não identificado", "localizacao": ""}
-        
-    localizacao = buscar_cidade_pais_com_ddg(fabricante_encontrado)
+
+    try:
+        localizacao = await _buscar_com_cache_async(
+            CACHE_LOCALIZACAO, fabricante_encontrado, lambda: _buscar_cidade_pais_async(fabricante_encontrado)
+        )
+    except CircuitOpenError:
+        localizacao = None
 
     return {
         "fabricante": fabricante_encontrado,
         "localizacao": localizacao if localizacao else "Não encontrada"
-    }
\ No newline at end of file
+    }
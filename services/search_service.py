@@ -0,0 +1,219 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Protocol
+from ddgs import DDGS
+from app.core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(RuntimeError):
+    """Busca recusada porque o circuit breaker está aberto."""
+
+
+class SearchBackend(Protocol):
+    def text(self, query: str, max_results: int) -> list[dict]: ...
+
+
+class DDGSBackend:
+    """Backend real: DuckDuckGo via ddgs (bloqueante, roda em thread)."""
+
+    def text(self, query: str, max_results: int) -> list[dict]:
+        with DDGS() as ddgs:
+            return list(ddgs.text(query, max_results=max_results))
+
+
+class TokenBucket:
+    """
+    Limita a taxa de buscas: 'rate' fichas por segundo, acumulando até 'burst'.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class CircuitBreaker:
+    """
+    Abre após 'threshold' falhas seguidas e recusa chamadas por 'cooldown' segundos;
+    depois deixa passar uma chamada de teste (half-open) antes de fechar de novo.
+    """
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.state = "closed"
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    def is_open(self) -> bool:
+        return self.state == "open" and time.monotonic() - self._opened_at < self.cooldown
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self._opened_at >= self.cooldown:
+            self.state = "half_open"
+            self._trial_in_flight = False
+        if self.state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.state = "closed"
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or (self.threshold > 0 and self.failures >= self.threshold):
+            if self.state != "open":
+                logger.warning(f"Circuit breaker da busca aberto após {self.failures} falhas.")
+            self.state = "open"
+            self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+class SearchPool:
+    """
+    Pool assíncrono de buscas web: fila + N workers, com limite de taxa,
+    timeout por consulta, retentativas com jitter e circuit breaker.
+    O backend é plugável (ex.: um backend falso local nos testes).
+    """
+
+    def __init__(self, backend: SearchBackend | None = None, workers: int = settings.scrape_concurrency,
+                 rate: float = settings.search_rate_per_second, burst: int = settings.search_burst,
+                 timeout: float = settings.search_timeout_seconds, retries: int = settings.search_retries,
+                 backoff: float = settings.search_backoff_seconds,
+                 breaker_threshold: int = settings.search_breaker_threshold,
+                 breaker_cooldown: float = settings.search_breaker_cooldown_seconds):
+        self.backend = backend or DDGSBackend()
+        self.n_workers = max(1, workers)
+        self.timeout = timeout
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_cooldown)
+        self._rate = rate
+        self._burst = burst
+        self._loop = None
+        self._queue: asyncio.Queue | None = None
+        self._workers: list[asyncio.Task] = []
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._workers:
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._bucket = TokenBucket(self._rate, self._burst)
+        self._workers = [loop.create_task(self._worker()) for _ in range(self.n_workers)]
+
+    async def search(self, query: str, max_results: int) -> list[dict]:
+        if self.breaker.is_open():
+            self.rejected += 1
+            raise CircuitOpenError("Busca web temporariamente desativada (circuit breaker aberto).")
+        self._ensure_started()
+        future = self._loop.create_future()
+        await self._queue.put((query, max_results, future))
+        return await future
+
+    async def _worker(self):
+        while True:
+            query, max_results, future = await self._queue.get()
+            try:
+                result = await self._execute(query, max_results)
+            except Exception as e:
+                self.failed += 1
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                self.completed += 1
+                if not future.done():
+                    future.set_result(result)
+            finally:
+                self._queue.task_done()
+
+    async def _execute(self, query: str, max_results: int) -> list[dict]:
+        last_error: Exception | None = None
+        for attempt in range(self.retries + 1):
+            if not self.breaker.allow():
+                raise CircuitOpenError("Busca web temporariamente desativada (circuit breaker aberto).")
+            await self._bucket.acquire()
+            try:
+                result = await asyncio.wait_for(
+                    asyncio.to_thread(self.backend.text, query, max_results), timeout=self.timeout
+                )
+            except Exception as e:
+                last_error = e
+                self.breaker.record_failure()
+                logger.warning(f"Busca falhou (tentativa {attempt + 1}/{self.retries + 1}): {query!r}: {e!r}")
+                if attempt < self.retries:
+                    await asyncio.sleep(self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5))
+                continue
+            self.breaker.record_success()
+            return result
+        raise last_error
+
+    async def close(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def stats(self) -> dict:
+        return {
+            "breaker": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
+
+
+_pool: SearchPool | None = None
+
+
+def get_search_pool() -> SearchPool:
+    global _pool
+    if _pool is None:
+        _pool = SearchPool()
+    return _pool
+
+
+def set_search_backend(backend: SearchBackend) -> SearchPool:
+    """
+    Troca o backend de busca (ex.: servidor de busca falso local em testes).
+    """
+    global _pool
+    _pool = SearchPool(backend=backend)
+    return _pool
+
+
+async def close_search_pool():
+    if _pool is not None:
+        await _pool.close()
@@ -0,0 +1,94 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import Future
+from typing import Callable, Hashable
+
+
+class SingleFlight:
+    """
+    Deduplica chamadas simultâneas com a mesma chave: a primeira executa a função
+    e as demais esperam pelo mesmo resultado (ou exceção). Nada fica guardado
+    depois que a chamada termina, isso é papel dos caches.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._in_flight: dict[Hashable, Future] = {}
+        self._in_flight_async: dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs):
+        with self._lock:
+            self.calls += 1
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[key] = future
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    async def do_async(self, key: Hashable, coro_fn: Callable, *args, **kwargs):
+        """
+        Versão para corrotinas, dentro do event loop. A chamada compartilhada roda
+        numa task própria: cancelar um chamador (ex.: cliente de um stream que
+        desconectou) não cancela a execução nem os outros que esperam por ela.
+        """
+        with self._lock:
+            self.calls += 1
+            task = self._in_flight_async.get(key)
+            if task is None:
+                task = asyncio.ensure_future(coro_fn(*args, **kwargs))
+                self._in_flight_async[key] = task
+                task.add_done_callback(functools.partial(self._finish_async, key))
+            else:
+                self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _finish_async(self, key: Hashable, task: asyncio.Task):
+        with self._lock:
+            if self._in_flight_async.get(key) is task:
+                del self._in_flight_async[key]
+        if not task.cancelled():
+            task.exception()  # evita o aviso de exceção não lida quando todos os chamadores desistiram
+
+    def stats(self) -> dict:
+        with self._lock:
+            in_flight = len(self._in_flight) + len(self._in_flight_async)
+            return {"calls": self.calls, "coalesced": self.coalesced, "in_flight": in_flight}
+
+
+_groups: dict[str, SingleFlight] = {}
+_groups_lock = threading.Lock()
+
+
+def get_group(name: str) -> SingleFlight:
+    with _groups_lock:
+        group = _groups.get(name)
+        if group is None:
+            group = _groups[name] = SingleFlight(name)
+        return group
+
+
+def all_stats() -> dict:
+    with _groups_lock:
+        groups = list(_groups.values())
+    return {group.name: group.stats() for group in groups}
@@ -0,0 +1,61 @@
+import json
+import os
+from typing import IO
+from fastapi import UploadFile
+from app.core.config import settings
+
+
+class UploadTooLargeError(ValueError):
+    """Upload maior que MAX_UPLOAD_MB."""
+
+
+def max_upload_bytes() -> int:
+    return settings.max_upload_mb * 1024 * 1024
+
+
+def open_upload(file: UploadFile, max_bytes: int | None = None) -> IO[bytes]:
+    """
+    Arquivo do upload, posicionado no início. Ao ler o formulário o Starlette já
+    gravou o corpo em um arquivo temporário (em memória só até 1 MB), então o
+    PDF é lido direto de file.file, sem uma segunda cópia.
+    Levanta UploadTooLargeError acima de MAX_UPLOAD_MB e ValueError se vier vazio.
+    """
+    max_bytes = max_upload_bytes() if max_bytes is None else max_bytes
+    tamanho = file.size
+    if tamanho is None:
+        tamanho = file.file.seek(0, os.SEEK_END)
+    if max_bytes > 0 and tamanho > max_bytes:
+        raise UploadTooLargeError(f"Arquivo maior que o limite de {max_bytes // (1024 * 1024)} MB.")
+    if tamanho == 0:
+        raise ValueError("Arquivo vazio.")
+    file.file.seek(0)
+    return file.file
+
+
+class UploadLimitMiddleware:
+    """
+    Recusa com 413, pelo Content-Length, requisições acima de MAX_UPLOAD_MB antes
+    de o corpo ser lido (o multipart é todo gravado em disco antes da rota rodar).
+    Sem Content-Length (chunked), o limite é conferido depois, em open_upload.
+    """
+
+    def __init__(self, app, max_bytes: int | None = None):
+        self.app = app
+        self.max_bytes = max_upload_bytes() if max_bytes is None else max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and self.max_bytes > 0:
+            tamanho = dict(scope["headers"]).get(b"content-length", b"")
+            if tamanho.isdigit() and int(tamanho) > self.max_bytes:
+                corpo = json.dumps(
+                    {"detail": f"Arquivo maior que o limite de {self.max_bytes // (1024 * 1024)} MB."},
+                    ensure_ascii=False
+                ).encode("utf-8")
+                await send({
+                    "type": "http.response.start",
+                    "status": 413,
+                    "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(corpo)).encode())],
+                })
+                await send({"type": "http.response.body", "body": corpo})
+                return
+        await self.app(scope, receive, send)
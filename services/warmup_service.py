@@ -0,0 +1,60 @@
+import logging
+from datetime import datetime, timezone
+from services.normalize_service import ping_ollama
+from services.rag_service import get_or_create_rag_for_app
+from app.core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+WARMUP_STEPS = ("rag", "encode", "ollama")
+
+
+def new_warmup_state() -> dict:
+    return {
+        "status": "pending" if settings.warmup_enabled else "disabled",
+        "steps": {step: "pending" for step in WARMUP_STEPS},
+        "errors": {},
+        "started_at": None,
+        "finished_at": None,
+    }
+
+
+def is_ready(state: dict) -> bool:
+    if state["status"] == "disabled":
+        return True
+    required = ["rag", "encode"] + (["ollama"] if settings.warmup_require_ollama else [])
+    return all(state["steps"][step] == "done" for step in required)
+
+
+def _run_step(state: dict, step: str, fn):
+    state["steps"][step] = "running"
+    try:
+        fn()
+        state["steps"][step] = "done"
+    except Exception as e:
+        logger.warning(f"Warm-up: etapa '{step}' falhou: {e}")
+        state["steps"][step] = "failed"
+        state["errors"][step] = str(e)
+
+
+def run_warmup(app) -> None:
+    """
+    Carrega o RAGService, faz um encode de teste e carrega o modelo no Ollama,
+    atualizando app.state.warmup a cada etapa. Bloqueante: rodar em thread.
+    """
+    state = app.state.warmup
+    state["status"] = "running"
+    state["started_at"] = datetime.now(timezone.utc).isoformat()
+    logger.info("Warm-up iniciado.")
+
+    _run_step(state, "rag", lambda: get_or_create_rag_for_app(app, settings.ncm_csv_path))
+    if state["steps"]["rag"] == "done":
+        _run_step(state, "encode", lambda: app.state.rag_service.find_top_ncm("capacitor ceramico 100nf", top_k=1))
+    else:
+        state["steps"]["encode"] = "skipped"
+    _run_step(state, "ollama", ping_ollama)
+
+    state["status"] = "ready" if is_ready(state) else "failed"
+    state["finished_at"] = datetime.now(timezone.utc).isoformat()
+    logger.info(f"Warm-up finalizado: {state['status']} {state['steps']}")
@@ -0,0 +1,26 @@
+import importlib
+import os
+import sys
+import pytest
+
+# Configuração mínima para importar app.core.config sem um .env (banco SQLite local).
+os.environ.setdefault("DB_URL", "sqlite:///./test.db")
+os.environ.setdefault("OLLAMA_URL", "http://localhost:11434/api/generate")
+os.environ.setdefault("OLLAMA_MODEL", "qwen3:1.7b")
+os.environ.setdefault("NCM_CSV_PATH", "ncm.csv")
+os.environ.setdefault("TOP_K", "5")
+os.environ.setdefault("SECRET_KEY", "test")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def importar_ou_pular(modulo: str):
+    """
+    Importa um módulo que depende das stopwords do NLTK (normalize_service as
+    carrega ao ser importado). Sem o corpus, pula o arquivo de teste inteiro ou,
+    chamado de uma fixture, só os testes que a usam.
+    """
+    try:
+        return importlib.import_module(modulo)
+    except LookupError:
+        pytest.skip("corpus 'stopwords' do NLTK não instalado", allow_module_level=True)
@@ -0,0 +1,69 @@
+"""
+Implementações anteriores às otimizações, usadas como referência de resultado
+nos testes de equivalência e como linha de base nos benchmarks.
+"""
+import re
+from collections import Counter
+from functools import lru_cache
+import numpy as np
+import unidecode
+
+
+@lru_cache(maxsize=1)
+def _stopwords_pt() -> set:
+    from nltk.corpus import stopwords
+    return set(stopwords.words("portuguese"))
+
+
+def limpar_texto_original(text: str) -> str:
+    """limpar_texto antes do user-010: unidecode + re.sub a cada chamada, sem cache."""
+    text = str(text).lower()
+    text = unidecode.unidecode(text)
+    text = re.sub(r"[^\w\s]", " ", text)
+    tokens = [w for w in text.split() if w not in _stopwords_pt()]
+    return " ".join(tokens).strip()
+
+
+def top_k_original(q_vecs, embeddings, top_k: int):
+    """Busca dos top_k antes do user-005: cosine_similarity do sklearn + argsort completo."""
+    from sklearn.metrics.pairwise import cosine_similarity
+    sims = cosine_similarity(q_vecs, embeddings)
+    return np.argsort(sims, axis=1)[:, -top_k:][:, ::-1]
+
+
+def contar_fabricantes_original(texto: str, fabricantes_map: dict) -> Counter:
+    """Contagem antes do user-011: um re.search com \\b por variação de cada fabricante."""
+    ocorrencias = Counter()
+    for nome_principal, variacoes in fabricantes_map.items():
+        for variacao in variacoes:
+            padrao = r"\b" + re.escape(variacao) + r"\b"
+            if re.search(padrao, texto, re.IGNORECASE):
+                ocorrencias[nome_principal] += 1
+    return ocorrencias
+
+
+def parse_pagina_original(texto: str) -> list:
+    """
+    Itens de uma página antes do user-025: regex de item do layout único por linha
+    e format_many (re.search/re.sub/re.match com o padrão em string a cada item).
+    """
+    descricoes = []
+    for linha in texto.splitlines():
+        match = re.match(r'^\d{2}\s+\d{6,}\s*-\s*(.*?)(?:\s\d{3,4}\s\d{2}/\d{2}/\d{2,4}\s[\d.,]+\s[\d.,]+\s[\d.,]+)?$', linha.strip())
+        if match:
+            descricoes.append(match.group(1).strip())
+    itens = []
+    for item in descricoes:
+        pn = ""
+        desc = item.strip()
+        match_pn = re.search(r'\bPN:\s*([^\s]+)', desc, flags=re.IGNORECASE)
+        if match_pn:
+            pn = match_pn.group(1).strip()
+            desc = re.sub(r'\bPN:\s*[^\s]+', '', desc, flags=re.IGNORECASE).strip()
+        else:
+            match_inicio = re.match(r'^([A-Z0-9\.\-]+)\s+(.*)$', desc, flags=re.IGNORECASE)
+            if match_inicio:
+                pn = match_inicio.group(1).strip()
+                desc = match_inicio.group(2).strip()
+        itens.append({"partnumber": pn, "descricao_raw": desc})
+    return itens
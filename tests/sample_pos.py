@@ -0,0 +1,112 @@
+"""
+Pedidos de compra sintéticos em PDF, para os testes e benchmarks de extração.
+O PDF é montado à mão (fonte Helvetica padrão, sem dependências): cada linha do
+pedido é uma sequência de células em posições x fixas.
+"""
+import random
+from typing import List
+
+_FABRICANTES = ["GRM", "LM", "BC", "IRF", "SN74", "TPS", "MAX", "STM32F"]
+_DESCRICOES = [
+    "CAP CER 10UF 16V X5R 0603", "RES SMD 10K 1% 0402", "DIODO SCHOTTKY 40V 1A",
+    "TRANSISTOR NPN 45V 100MA", "CI REGULADOR 3V3 500MA", "INDUTOR 4U7H 2A 1210",
+    "CONECTOR HEADER 2X5 PINOS", "CRISTAL 16MHZ 20PF SMD",
+]
+
+_FONTE = 7
+_ALTURA_LINHA = 12
+_LARGURA_CHAR = 0.62 * _FONTE  # largura média de maiúsculas e dígitos da Helvetica
+_MARGEM_X, _TOPO = 30, 800
+
+
+def _numero_br(valor: float) -> str:
+    return f"{valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+def linhas_padrao(n_itens: int, seed: int = 0) -> List[List[str]]:
+    """Linhas no layout 'padrao': '01 123456 - <descrição> PN: <pn> <cód> <data> <qtd> <preço> <total>'."""
+    rnd = random.Random(seed)
+    linhas = [["PEDIDO DE COMPRA", "No 4500012345"], ["Fornecedor: ACME COMPONENTES LTDA"]]
+    for i in range(n_itens):
+        qtd = rnd.randint(1, 500)
+        preco = rnd.randint(10, 99999) / 100
+        pn = f"{rnd.choice(_FABRICANTES)}{rnd.randint(100, 99999)}"
+        linhas.append([
+            f"{i % 100:02d}", f"{rnd.randint(100000, 999999)} -", f"{rnd.choice(_DESCRICOES)} PN: {pn}",
+            f"{rnd.randint(100, 9999)}", f"{rnd.randint(1, 28):02d}/{rnd.randint(1, 12):02d}/24",
+            str(qtd), _numero_br(preco), _numero_br(qtd * preco),
+        ])
+    return linhas
+
+
+def linhas_pn_primeiro(n_itens: int, seed: int = 0) -> List[List[str]]:
+    """Linhas no layout 'pn_primeiro': '<item> <PN> <descrição> <qtd> <unid> <preço> <total>'."""
+    rnd = random.Random(seed)
+    linhas = [["ORDEM DE COMPRA 98765"], ["Item", "Part Number", "Descricao", "Qtd", "Un", "Preco", "Total"]]
+    for i in range(n_itens):
+        qtd = rnd.randint(1, 500)
+        preco = rnd.randint(10, 99999) / 100
+        linhas.append([
+            str(i + 1), f"{rnd.choice(_FABRICANTES)}{rnd.randint(100, 99999)}-{rnd.randint(1, 9)}",
+            rnd.choice(_DESCRICOES), str(qtd), "PC", _numero_br(preco), _numero_br(qtd * preco),
+        ])
+    return linhas
+
+
+def _escapar(texto: str) -> str:
+    return texto.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _conteudo_pagina(linhas: List[List[str]], por_coluna: bool) -> bytes:
+    # x de cada célula: depois da célula anterior mais larga da mesma coluna na página
+    n_colunas = max(len(linha) for linha in linhas)
+    larguras = [max((len(l[c]) for l in linhas if c < len(l)), default=0) for c in range(n_colunas)]
+    xs = [_MARGEM_X]
+    for largura in larguras[:-1]:
+        xs.append(xs[-1] + largura * _LARGURA_CHAR + 8)
+
+    celulas = [(c, r) for r, linha in enumerate(linhas) for c in range(len(linha))]
+    if por_coluna:
+        celulas.sort()
+    ops = [f"BT /F1 {_FONTE} Tf"]
+    for c, r in celulas:
+        ops.append(f"1 0 0 1 {xs[c]:.2f} {_TOPO - r * _ALTURA_LINHA} Tm ({_escapar(linhas[r][c])}) Tj")
+    ops.append("ET")
+    return "\n".join(ops).encode("latin-1")
+
+
+def gerar_pdf(linhas: List[List[str]], linhas_por_pagina: int = 50, por_coluna: bool = False) -> bytes:
+    """
+    PDF com as linhas distribuídas em páginas A4. por_coluna=True grava o texto
+    coluna a coluna no content stream (como fazem alguns geradores de relatório):
+    a ordem de leitura deixa de coincidir com a ordem visual das linhas.
+    """
+    paginas = [linhas[i:i + linhas_por_pagina] for i in range(0, len(linhas), linhas_por_pagina)] or [[[""]]]
+    objetos: List[bytes] = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"",  # /Pages, preenchido depois que os ids das páginas são conhecidos
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    ids_paginas = []
+    for pagina in paginas:
+        conteudo = _conteudo_pagina(pagina, por_coluna)
+        objetos.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(conteudo), conteudo))
+        objetos.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> "
+            b"/Contents %d 0 R >>" % (len(objetos))
+        )
+        ids_paginas.append(len(objetos))
+    kids = " ".join(f"{i} 0 R" for i in ids_paginas).encode()
+    objetos[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(ids_paginas))
+
+    saida = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for n, corpo in enumerate(objetos, start=1):
+        offsets.append(len(saida))
+        saida += b"%d 0 obj\n%s\nendobj\n" % (n, corpo)
+    xref = len(saida)
+    saida += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1)
+    for offset in offsets:
+        saida += b"%010d 00000 n \n" % offset
+    saida += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objetos) + 1, xref)
+    return bytes(saida)
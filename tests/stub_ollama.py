@@ -0,0 +1,73 @@
+"""
+Servidor Ollama falso (/api/generate) para testes e benchmarks do cliente e da
+normalização. Responde sem streaming, depois de uma latência que imita o modelo:
+custo fixo por chamada mais um custo por linha gerada.
+"""
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_ENTRADA_LOTE_RE = re.compile(r"^(\d+): (.*)$", re.MULTILINE)
+
+
+class StubOllama:
+    def __init__(self, latencia_fixa: float = 0.05, latencia_por_linha: float = 0.01):
+        self.latencia_fixa = latencia_fixa
+        self.latencia_por_linha = latencia_por_linha
+        self.chamadas = 0
+        self.em_andamento = 0
+        self.max_em_andamento = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}/api/generate"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _responder(self, payload: dict) -> str:
+        prompt = payload.get("prompt", "")
+        if payload.get("format") == "json":
+            linhas = {i: texto for i, texto in _ENTRADA_LOTE_RE.findall(prompt)}
+            time.sleep(self.latencia_fixa + self.latencia_por_linha * len(linhas))
+            return json.dumps({i: f"normalizado {texto.lower()}" for i, texto in linhas.items()})
+        time.sleep(self.latencia_fixa + self.latencia_por_linha)
+        entrada = prompt.split("Input: ", 1)[-1].split("\n", 1)[0]
+        return f"normalizado {entrada.lower()}\n"
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with stub._lock:
+                    stub.chamadas += 1
+                    stub.em_andamento += 1
+                    stub.max_em_andamento = max(stub.max_em_andamento, stub.em_andamento)
+                try:
+                    corpo = json.dumps({"response": stub._responder(payload), "done": True}).encode("utf-8")
+                finally:
+                    with stub._lock:
+                        stub.em_andamento -= 1
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+        return Handler
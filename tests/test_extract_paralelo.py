@@ -0,0 +1,53 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from app.core.config import settings
+from services import extract_service
+from services.extract_service import _page_ranges, iter_items
+from tests.sample_pos import gerar_pdf, linhas_pn_primeiro
+
+
+class PoolRegistrado(ThreadPoolExecutor):
+    """Pool em threads no lugar do de processos, registrando as faixas enviadas."""
+
+    def __init__(self):
+        super().__init__(max_workers=2)
+        self.faixas = []
+
+    def submit(self, fn, *args, **kwargs):
+        self.faixas.append(args[1:3])
+        return super().submit(fn, *args, **kwargs)
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(settings, "pdf_layout", "")
+    monkeypatch.setattr(settings, "pdf_parallel_min_pages", 2)
+    pool = PoolRegistrado()
+    monkeypatch.setattr(extract_service, "_get_pool", lambda: pool)
+    yield pool
+    pool.shutdown()
+
+
+def _itens(pdf: bytes) -> list:
+    return [item for pagina in iter_items(io.BytesIO(pdf), engine="pdfium") for item in pagina]
+
+
+def test_page_ranges():
+    assert _page_ranges(0, 10, 3) == [(0, 4), (4, 8), (8, 10)]
+    assert _page_ranges(1, 5, 8) == [(1, 2), (2, 3), (3, 4), (4, 5)]
+    assert _page_ranges(1, 1, 4) == []
+
+
+def test_paralelo_igual_ao_sequencial_sem_reler_a_primeira_pagina(pool, monkeypatch):
+    pdf = gerar_pdf(linhas_pn_primeiro(230), linhas_por_pagina=50)  # 5 páginas
+
+    monkeypatch.setattr(settings, "pdf_extract_workers", 1)
+    sequencial = _itens(pdf)
+    assert pool.faixas == []
+
+    monkeypatch.setattr(settings, "pdf_extract_workers", 2)
+    paralelo = _itens(pdf)
+    assert paralelo == sequencial
+    assert len(paralelo) == 230
+    assert pool.faixas == [(1, 3), (3, 5)]
@@ -0,0 +1,55 @@
+import random
+from collections import Counter
+from services.scraper_service import FabricanteMatcher, carregar_fabricantes_com_variacoes, FABRICANTES_TXT_PATH
+from tests.referencias import contar_fabricantes_original
+
+_RUIDO = ["datasheet", "pdf", "manufacturer", "of", "the", "rohs", "smd", "inc", "ltd", "-", "/", ",", ".", "(", ")", "&"]
+
+
+def textos_de_busca(fabricantes: dict, n: int, seed: int = 0) -> list:
+    """Textos no formato dos resultados de busca, com variações de fabricantes no meio de ruído."""
+    rnd = random.Random(seed)
+    variacoes = [v for vs in fabricantes.values() for v in vs]
+    textos = []
+    for _ in range(n):
+        partes = []
+        for _ in range(rnd.randint(5, 30)):
+            if rnd.random() < 0.3:
+                v = rnd.choice(variacoes)
+                partes.append(rnd.choice([v, v.upper(), v.lower(), v + "s", "x" + v, v + "-" + rnd.choice(_RUIDO)]))
+            else:
+                partes.append(rnd.choice(_RUIDO))
+        textos.append(rnd.choice([" ", "", ", "]).join(partes))
+    return textos
+
+
+def _comparar(fabricantes: dict, textos: list):
+    matcher = FabricanteMatcher(fabricantes)
+    for texto in textos:
+        esperado = contar_fabricantes_original(texto, fabricantes)
+        obtido = matcher.contar(texto)
+        assert obtido == esperado, texto
+        # o desempate do most_common segue a ordem do arquivo nas duas versões
+        assert obtido.most_common(1) == esperado.most_common(1), texto
+
+
+def test_igual_ao_loop_de_regex_com_fabricantes_txt():
+    fabricantes = carregar_fabricantes_com_variacoes(FABRICANTES_TXT_PATH)
+    _comparar(fabricantes, textos_de_busca(fabricantes, 50))
+
+
+def test_limites_de_palavra_e_sobreposicao():
+    fabricantes = {
+        "TI": ["TI", "Texas Instruments"],
+        "Texas": ["Texas"],
+        "B&K Precision": ["B&K Precision", "B&K"],
+        "80": ["80/20 Inc."],
+        "Akro-Mils": ["Akro-Mils"],
+        "3M": ["3M"],
+    }
+    textos = [
+        "Texas Instruments TI", "TIMER texasinstruments", "B&K B&KPrecision B&K Precision",
+        "80/20 Inc.x 80/20 Inc. ", "Akro-Mils-3M 3Ms 3M_", "ti-texas", "", "TI",
+    ]
+    _comparar(fabricantes, textos)
+    assert FabricanteMatcher(fabricantes).contar("Texas Instruments") == Counter({"TI": 1, "Texas": 1})
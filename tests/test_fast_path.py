@@ -0,0 +1,54 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.core.config import settings
+from models import models
+from services.persistence_service import record_fast_path_counts
+from tests.conftest import importar_ou_pular
+
+
+@pytest.fixture
+def retrieval_is_confident(monkeypatch):
+    """retrieval_is_confident com o fast path ligado (min_score 0.75, margem 0.10)."""
+    pipeline_service = importar_ou_pular("services.pipeline_service")
+    monkeypatch.setattr(settings, "ncm_fast_path_enabled", True)
+    monkeypatch.setattr(settings, "ncm_fast_path_min_score", 0.75)
+    monkeypatch.setattr(settings, "ncm_fast_path_margin", 0.10)
+    return pipeline_service.retrieval_is_confident
+
+
+def test_fast_path_exige_margem_sobre_o_segundo(retrieval_is_confident):
+    assert retrieval_is_confident([{"ncm": "1", "score": 0.9}, {"ncm": "2", "score": 0.7}])
+    assert not retrieval_is_confident([{"ncm": "1", "score": 0.9}, {"ncm": "2", "score": 0.85}])
+    assert not retrieval_is_confident([{"ncm": "1", "score": 0.7}, {"ncm": "2", "score": 0.1}])
+
+
+def test_fast_path_exige_ao_menos_dois_candidatos(retrieval_is_confident):
+    assert not retrieval_is_confident([{"ncm": "1", "score": 0.99}])
+    assert not retrieval_is_confident([])
+
+
+def test_fast_path_ignora_candidatos_sem_score(retrieval_is_confident):
+    assert not retrieval_is_confident([{"ncm": "1", "score": 0.9}, {"ncm": "2"}])
+
+
+def test_contadores_ficam_em_tabela_propria():
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        usuario = models.Usuario(nome="u", email="u@x", senha="x")
+        db.add(usuario)
+        db.flush()
+        transacao = models.Transacao(usuario_id=usuario.id)
+        db.add(transacao)
+        db.commit()
+
+        record_fast_path_counts(db, transacao.id, 3, 1)
+        record_fast_path_counts(db, transacao.id, 2, 4)
+        record_fast_path_counts(db, transacao.id, 0, 0)
+
+        estatistica = db.get(models.TransacaoEstatistica, transacao.id)
+        assert (estatistica.itens_fast_path, estatistica.itens_llm) == (5, 5)
+    finally:
+        db.close()
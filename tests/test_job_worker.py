@@ -0,0 +1,118 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+import pytest
+from tests.conftest import importar_ou_pular
+
+job_service = importar_ou_pular("services.job_service")
+
+
+def _rodar_pool(monkeypatch, rag_provider, run_job, n_jobs=3):
+    fila = list(range(1, n_jobs + 1))
+    falhas = []
+    monkeypatch.setattr(job_service, "_claim", lambda worker_id: fila.pop(0) if fila else None)
+    monkeypatch.setattr(job_service, "_marcar_falha", lambda job_id, worker_id, erro: falhas.append((job_id, erro)))
+    monkeypatch.setattr(job_service, "run_job", run_job)
+
+    async def main():
+        pool = job_service.JobWorkerPool(rag_provider, workers=1, poll_seconds=0.01)
+        pool.start()
+        for _ in range(500):
+            if not fila and not pool.running:
+                break
+            await asyncio.sleep(0.01)
+        await pool.close()
+        return pool
+
+    return asyncio.run(main()), falhas
+
+
+def test_erro_do_rag_provider_marca_o_job_e_o_worker_continua(monkeypatch):
+    chamadas = []
+
+    def rag_provider():
+        if not chamadas:
+            chamadas.append(1)
+            raise RuntimeError("índice NCM indisponível")
+        return object()
+
+    async def run_job(job_id, worker_id, rag_service):
+        pass
+
+    pool, falhas = _rodar_pool(monkeypatch, rag_provider, run_job)
+    assert falhas == [(1, "índice NCM indisponível")]
+    assert pool.completed == 2
+
+
+def test_cancelamento_vindo_do_job_nao_derruba_o_worker(monkeypatch):
+    async def run_job(job_id, worker_id, rag_service):
+        if job_id == 2:
+            raise asyncio.CancelledError()
+
+    pool, falhas = _rodar_pool(monkeypatch, lambda: object(), run_job)
+    assert [job_id for job_id, _ in falhas] == [2]
+    assert pool.completed == 2
+
+
+def test_close_cancela_o_worker_no_meio_de_um_job(monkeypatch):
+    falhas = []
+    iniciado = asyncio.Event()
+    monkeypatch.setattr(job_service, "_claim", lambda worker_id: 1)
+    monkeypatch.setattr(job_service, "_marcar_falha", lambda *args: falhas.append(args))
+
+    async def run_job(job_id, worker_id, rag_service):
+        iniciado.set()
+        await asyncio.sleep(60)
+
+    monkeypatch.setattr(job_service, "run_job", run_job)
+
+    async def main():
+        pool = job_service.JobWorkerPool(lambda: object(), workers=1, poll_seconds=0.01)
+        pool.start()
+        await iniciado.wait()
+        await pool.close()
+        return pool
+
+    pool = asyncio.run(main())
+    assert falhas == []
+    assert pool.stats()["workers"] == 0
+
+
+def test_run_job_sobrevive_a_erro_do_banco_ao_registrar_a_falha(monkeypatch):
+    def banco_fora(*args, **kwargs):
+        raise RuntimeError("banco fora do ar")
+
+    monkeypatch.setattr(job_service.crud, "get_job", banco_fora)
+    monkeypatch.setattr(job_service.crud, "update_job", banco_fora)
+
+    asyncio.run(job_service.run_job(1, "w", rag_service=None))
+
+
+def test_run_job_acessa_o_banco_fora_do_event_loop(monkeypatch):
+    threads = []
+
+    def registrar(retorno):
+        def fn(*args, **kwargs):
+            threads.append(threading.get_ident())
+            return retorno
+        return fn
+
+    async def classificados(itens, rag_service):
+        for pos, (pn, _) in enumerate(itens):
+            yield pos, {"partnumber": pn, "fast_path": True}
+
+    itens = '[{"partnumber": "A1", "descricao_raw": "x"}, {"partnumber": "B2", "descricao_raw": "y"}]'
+    monkeypatch.setattr(job_service.crud, "get_job", registrar(SimpleNamespace(itens=itens, transacao_id=1)))
+    monkeypatch.setattr(job_service.crud, "update_job", registrar(True))
+    monkeypatch.setattr(job_service, "cached_row", registrar(None))
+    monkeypatch.setattr(job_service, "persist_result", registrar({"ncm": "85423190"}))
+    monkeypatch.setattr(job_service, "record_fast_path_counts", registrar(None))
+    monkeypatch.setattr(job_service, "iter_classified_items", classificados)
+
+    async def main():
+        await job_service.run_job(1, "w", rag_service=None)
+        return threading.get_ident()
+
+    thread_do_loop = asyncio.run(main())
+    assert len(threads) == 10
+    assert thread_do_loop not in threads
@@ -0,0 +1,36 @@
+from services.layout_service import LAYOUTS, detect_layout
+from tests.referencias import parse_pagina_original
+from tests.sample_pos import linhas_padrao, linhas_pn_primeiro
+
+
+def texto_de(linhas: list) -> str:
+    """Texto de página como os motores devolvem: células da linha separadas por espaço."""
+    return "\n".join(" ".join(celulas) for celulas in linhas)
+
+
+def test_padrao_igual_ao_original():
+    texto = texto_de(linhas_padrao(300, seed=3))
+    itens = LAYOUTS["padrao"].parse_page(texto)
+    assert [{k: it[k] for k in ("partnumber", "descricao_raw")} for it in itens] == parse_pagina_original(texto)
+    assert len(itens) == 300
+
+
+def test_padrao_extrai_quantidade_e_preco():
+    texto = texto_de(linhas_padrao(20, seed=1))
+    for celulas, item in zip(linhas_padrao(20, seed=1)[2:], LAYOUTS["padrao"].parse_page(texto)):
+        assert item["quantidade"] == float(celulas[5])
+        assert item["preco"] == float(celulas[6].replace(".", "").replace(",", "."))
+
+
+def test_pn_primeiro():
+    linhas = linhas_pn_primeiro(50, seed=2)
+    itens = LAYOUTS["pn_primeiro"].parse_page(texto_de(linhas))
+    assert [(it["partnumber"], it["descricao_raw"], it["quantidade"]) for it in itens] == [
+        (c[1], c[2], float(c[3])) for c in linhas[2:]
+    ]
+
+
+def test_detect_layout():
+    assert detect_layout(texto_de(linhas_padrao(30))).name == "padrao"
+    assert detect_layout(texto_de(linhas_pn_primeiro(30))).name == "pn_primeiro"
+    assert detect_layout("sem itens reconhecíveis").name == "padrao"
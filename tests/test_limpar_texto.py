@@ -0,0 +1,77 @@
+import os
+import random
+import pandas as pd
+import pytest
+from app.core.config import settings
+from tests.referencias import limpar_texto_original
+from tests.conftest import importar_ou_pular
+
+normalize_service = importar_ou_pular("services.normalize_service")
+
+
+DESCRICOES_NCM = [
+    "Cavalos reprodutores de raça pura",
+    "-- Outros",
+    "Ácidos nucléicos e seus sais; outros compostos heterocíclicos",
+    "Capacitores elétricos fixos, variáveis ou ajustáveis (reguláveis).",
+    "- - Com dielétrico de papel ou de plástico",
+    "Resistências elétricas (incluídos os reostatos e os potenciômetros), exceto de aquecimento",
+    "Circuitos integrados eletrônicos: -- Processadores e controladores, mesmo combinados com memórias",
+    "Diodos, transistores e dispositivos semelhantes semicondutores; dispositivos fotossensíveis",
+    "Fios, cabos (incluídos os cabos coaxiais) e outros condutores, isolados para usos elétricos",
+    "De potência de dissipação < 1 W",
+    "Com teor de cobre ≥ 99,85 % em peso",
+    "Tensão ≤ 1.000 V; frequência ≥ 50 Hz",
+]
+
+NAO_ASCII = [
+    "Capacitor cerâmico 10µF ±10% 50V", "Resistor 4,7kΩ ¼W", "Conector Ｍ１２ ８ｐｉｎｏｓ",
+    "Straße ﬁo œuvre Æther", "Температура −40…+85 °C", "電容器 セラミック 10μF",
+    "ٱلْعَرَبِيَّة ١٢٣", "emoji 🔌⚡ cabo", "Ñandú naïve café crème", "x²+y³ ½ ¾ ‰",
+    "tab\tnova\nlinha sep", "é combinado", "", "   ", "__init__ a_b", "123", None, 42, 3.5,
+]
+
+
+def _unicode_aleatorio(n: int, seed: int = 0) -> list:
+    rnd = random.Random(seed)
+    faixas = [(0x20, 0x7E), (0xA0, 0x24F), (0x370, 0x52F), (0x2000, 0x2BFF), (0x3040, 0x30FF), (0x4E00, 0x4FFF)]
+    textos = []
+    for _ in range(n):
+        chars = []
+        for _ in range(rnd.randint(0, 40)):
+            inicio, fim = rnd.choice(faixas)
+            chars.append(chr(rnd.randint(inicio, fim)))
+        textos.append("".join(chars))
+    return textos
+
+
+def _descricoes_do_csv() -> list:
+    if not os.path.exists(settings.ncm_csv_path):
+        pytest.skip(f"CSV NCM não encontrado em {settings.ncm_csv_path}")
+    df = pd.read_csv(settings.ncm_csv_path, encoding="utf-8")
+    df.columns = [c.lower() for c in df.columns]
+    return df["descricao"].astype(str).tolist()
+
+
+@pytest.mark.parametrize("texto", DESCRICOES_NCM + NAO_ASCII)
+def test_igual_a_implementacao_original(texto):
+    assert normalize_service.limpar_texto(texto) == limpar_texto_original(texto)
+
+
+def test_igual_a_original_em_unicode_aleatorio():
+    for texto in _unicode_aleatorio(2000):
+        assert normalize_service.limpar_texto(texto) == limpar_texto_original(texto), repr(texto)
+
+
+def test_igual_a_original_nas_descricoes_do_csv_ncm():
+    descricoes = _descricoes_do_csv()
+    assert normalize_service.limpar_textos(descricoes) == [limpar_texto_original(d) for d in descricoes]
+
+
+def test_lote_e_memoizacao_nao_mudam_o_resultado():
+    textos = (DESCRICOES_NCM + NAO_ASCII) * 3
+    esperado = [limpar_texto_original(t) for t in textos]
+    normalize_service._limpar_texto_cached.cache_clear()
+    assert normalize_service.limpar_textos(textos) == esperado
+    assert normalize_service.limpar_textos(textos) == esperado
+    assert [normalize_service.limpar_texto(t) for t in textos] == esperado
@@ -0,0 +1,60 @@
+import asyncio
+import pytest
+from app.core.config import settings
+from services import ollama_client
+from services.llm_cache import llm_cache
+from services.ollama_client import OllamaClient
+from tests.stub_ollama import StubOllama
+from tests.conftest import importar_ou_pular
+
+normalize_service = importar_ou_pular("services.normalize_service")
+
+TEXTOS = [f"CAP CER {n}UF 16V" for n in range(12)]
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    monkeypatch.setattr(llm_cache, "enabled", False)
+    monkeypatch.setattr(settings, "ollama_stream", False)
+    with StubOllama(latencia_fixa=0.02, latencia_por_linha=0.0) as servidor:
+        monkeypatch.setattr(ollama_client, "_client", OllamaClient(url=servidor.url, max_concurrency=4))
+        yield servidor
+
+
+def _normalizar(textos, chunk_size):
+    async def main():
+        try:
+            return await normalize_service.normalizar_lote_com_ollama_async(textos, chunk_size=chunk_size)
+        finally:
+            await ollama_client.close_ollama_client()
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize("chunk_size", [1, 4])
+def test_lote_devolve_na_ordem(stub, chunk_size):
+    textos = TEXTOS + TEXTOS[:3]
+    assert _normalizar(textos, chunk_size) == [f"normalizado {t.lower()}" for t in textos]
+    assert stub.chamadas == (len(TEXTOS) if chunk_size == 1 else 3)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 4])
+def test_pipeline_sequencial_faz_uma_chamada_por_vez(stub, monkeypatch, chunk_size):
+    monkeypatch.setattr(settings, "pipeline_concurrent", False)
+    _normalizar(TEXTOS, chunk_size)
+    assert stub.max_em_andamento == 1
+
+
+def test_pipeline_concorrente_sobrepoe_chamadas(stub, monkeypatch):
+    monkeypatch.setattr(settings, "pipeline_concurrent", True)
+    _normalizar(TEXTOS, 1)
+    assert stub.max_em_andamento > 1
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_variantes_sincronas(stub, monkeypatch, stream):
+    monkeypatch.setattr(settings, "ollama_stream", stream)
+    monkeypatch.setattr(normalize_service, "OLLAMA_URL", stub.url)
+    assert normalize_service.normalizar_com_ollama("CAP CER 10UF") == "normalizado cap cer 10uf"
+    candidatos = [{"ncm": "85322410", "descricao_longa": "capacitores cerâmicos"}]
+    assert normalize_service.choose_best_ncm("capacitor cerâmico", candidatos) == "85322410"
+    assert stub.chamadas == 2
@@ -0,0 +1,33 @@
+import io
+import pytest
+from app.core.config import settings
+from services.extract_service import iter_items
+from services.pdf_engines import ENGINES
+from tests.sample_pos import gerar_pdf, linhas_padrao, linhas_pn_primeiro
+
+
+def _itens(pdf: bytes, engine: str) -> list:
+    return [item for pagina in iter_items(io.BytesIO(pdf), engine=engine) for item in pagina]
+
+
+@pytest.fixture(autouse=True)
+def sequencial(monkeypatch):
+    monkeypatch.setattr(settings, "pdf_extract_workers", 1)
+    monkeypatch.setattr(settings, "pdf_layout", "")
+
+
+@pytest.mark.parametrize("gerar", [linhas_padrao, linhas_pn_primeiro])
+@pytest.mark.parametrize("por_coluna", [False, True], ids=["ordem_de_linha", "ordem_de_coluna"])
+def test_motores_extraem_os_mesmos_itens(gerar, por_coluna):
+    pdf = gerar_pdf(gerar(120, seed=7), por_coluna=por_coluna)
+    por_motor = {engine: _itens(pdf, engine) for engine in ENGINES}
+    assert len(por_motor["pdfplumber"]) == 120
+    assert por_motor["pdfium"] == por_motor["pdfplumber"]
+
+
+def test_item_extraido_do_layout_padrao():
+    pdf = gerar_pdf([["01", "123456 -", "CAP CER 10UF PN: GRM188", "1234", "01/02/24", "10", "1,50", "15,00"]])
+    for engine in ENGINES:
+        assert _itens(pdf, engine) == [
+            {"partnumber": "GRM188", "descricao_raw": "CAP CER 10UF", "quantidade": 10.0, "preco": 1.5}
+        ]
@@ -0,0 +1,64 @@
+import asyncio
+import pytest
+from app.core.config import settings
+from tests.conftest import importar_ou_pular
+
+pipeline_service = importar_ou_pular("services.pipeline_service")
+
+
+@pytest.fixture
+def etapas(monkeypatch):
+    """Etapas do pipeline falsas, registrando a ordem de execução em `log`."""
+    log = []
+
+    async def collect(itens):
+        log.append(("etapa1", [pn for pn, _ in itens]))
+        await asyncio.sleep(0.01)
+        return [None if pn == "ERRO" else {"desc_norm": desc} for pn, desc in itens]
+
+    async def retrieve(descs, rag_service):
+        return [[{"ncm": desc}] for desc in descs]
+
+    async def finalize(pn, desc_raw, info, top_candidates):
+        return {"partnumber": pn, "ncm": top_candidates[0]["ncm"]}
+
+    monkeypatch.setattr(pipeline_service, "_collect_item_infos", collect)
+    monkeypatch.setattr(pipeline_service, "_retrieve_candidates", retrieve)
+    monkeypatch.setattr(pipeline_service, "_finalize_item", finalize)
+    return log
+
+
+def _consumir(itens, log):
+    resultados = []
+
+    async def main():
+        async for i, resultado in pipeline_service.iter_classified_items(itens, rag_service=None):
+            log.append(("item", i))
+            resultados.append((i, resultado))
+
+    asyncio.run(main())
+    return resultados
+
+
+@pytest.mark.parametrize("concorrente", [True, False])
+def test_itens_passam_em_lotes_e_saem_antes_do_fim_das_buscas(etapas, monkeypatch, concorrente):
+    monkeypatch.setattr(settings, "pipeline_batch_size", 10)
+    monkeypatch.setattr(settings, "pipeline_concurrent", concorrente)
+    itens = [(f"PN{i}", f"desc {i}") for i in range(25)]
+    itens[12] = ("ERRO", "desc 12")
+
+    resultados = _consumir(itens, etapas)
+
+    assert [len(pns) for etapa, pns in etapas if etapa == "etapa1"] == [10, 10, 5]
+    assert sorted(i for i, _ in resultados) == list(range(25))
+    for i, resultado in resultados:
+        assert resultado["partnumber"] == itens[i][0]
+        assert resultado["ncm"] == ("Erro" if i == 12 else f"desc {i}")
+    # o primeiro item sai antes de começarem as buscas do último lote
+    assert etapas.index(("item", 0)) < etapas.index(("etapa1", [pn for pn, _ in itens[20:]]))
+
+
+def test_lote_zero_processa_o_pedido_inteiro(etapas, monkeypatch):
+    monkeypatch.setattr(settings, "pipeline_batch_size", 0)
+    _consumir([(f"PN{i}", "d") for i in range(7)], etapas)
+    assert [len(pns) for etapa, pns in etapas if etapa == "etapa1"] == [7]
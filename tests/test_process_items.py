@@ -0,0 +1,72 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from tests.conftest import importar_ou_pular
+
+pdf_routes = importar_ou_pular("routes.pdf_routes")
+
+
+def test_process_items_persiste_cada_item_ao_terminar(monkeypatch):
+    persistidos = []
+
+    async def classificados(itens, rag_service):
+        yield 0, {"partnumber": itens[0][0], "fast_path": True}
+        raise RuntimeError("conexão com o Ollama perdida")
+
+    monkeypatch.setattr(pdf_routes, "_get_transacao_do_usuario", lambda db, transacao_id, usuario_id: None)
+    monkeypatch.setattr(pdf_routes, "_get_or_create_rag", lambda request, path: None)
+    monkeypatch.setattr(pdf_routes, "cached_row", lambda db, transacao_id, pn: None)
+    monkeypatch.setattr(pdf_routes, "persist_result", lambda db, transacao_id, item: persistidos.append(item["partnumber"]))
+    monkeypatch.setattr(pdf_routes, "iter_classified_items", classificados)
+
+    data = pdf_routes.ProcessRequest(items=[{"partnumber": "A1", "descricao_raw": "x"}, {"partnumber": "B2", "descricao_raw": "y"}])
+    with pytest.raises(RuntimeError):
+        asyncio.run(pdf_routes.process_items(1, data, request=None, db=None, current_user=SimpleNamespace(id=1)))
+    assert persistidos == ["A1"]
+
+
+def test_keepalive_sinaliza_espera_sem_perder_itens():
+    async def lentos():
+        for i in range(3):
+            await asyncio.sleep(0.05)
+            yield i
+
+    async def main():
+        return [valor async for valor in pdf_routes._com_keepalive(lentos(), 0.01)]
+
+    valores = asyncio.run(main())
+    assert [v for v in valores if v is not None] == [0, 1, 2]
+    assert valores.count(None) >= 3
+
+
+def test_keepalive_fecha_o_iterador_ao_ser_interrompido():
+    fechado = []
+
+    async def infinitos():
+        try:
+            while True:
+                await asyncio.sleep(0.05)
+                yield 1
+        finally:
+            fechado.append(True)
+
+    async def main():
+        eventos = pdf_routes._com_keepalive(infinitos(), 0.01)
+        assert await eventos.__anext__() is None
+        await eventos.aclose()
+
+    asyncio.run(main())
+    assert fechado == [True]
+
+
+def test_save_extracted_items_mantem_quantidade_zero(monkeypatch):
+    vinculos = []
+    monkeypatch.setattr(pdf_routes.crud, "upsert_item", lambda db, item_data, fabricante_id: SimpleNamespace(partnumber=item_data["partnumber"]))
+    monkeypatch.setattr(pdf_routes.crud, "link_item_to_transacao", lambda **kw: vinculos.append((kw["item_partnumber"], kw["quantidade"])))
+
+    pdf_routes._save_extracted_items(None, 1, [
+        {"partnumber": "A1", "descricao_raw": "x", "quantidade": 0.0},
+        {"partnumber": "B2", "descricao_raw": "y", "quantidade": None},
+        {"partnumber": "C3", "descricao_raw": "z", "quantidade": 4.0},
+    ])
+    assert vinculos == [("A1", 0.0), ("B2", 1.0), ("C3", 4.0)]
@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+import pytest
+from tests.conftest import importar_ou_pular
+
+rag_service = importar_ou_pular("services.rag_service")
+
+
+def _rag(base: np.ndarray, dtype: str) -> rag_service.RAGService:
+    rag = rag_service.RAGService.__new__(rag_service.RAGService)
+    rag.embedding_dtype = dtype
+    rag.embeddings = base.copy()
+    rag.embedding_scales = None
+    rag.df_ncm = pd.DataFrame({"ncm": np.arange(len(base)).astype(str), "descricao_clean": "x"})
+    rag._quantize()
+    return rag
+
+
+@pytest.mark.parametrize("dtype, bytes_por_valor, recall_minimo", [("float16", 2, 0.99), ("int8", 1, 0.97)])
+def test_recall_com_consultas_fora_da_tabela(dtype, bytes_por_valor, recall_minimo):
+    rng = np.random.default_rng(0)
+    centros = rng.standard_normal((50, 128))
+    base = rag_service._l2_normalize(centros[rng.integers(0, 50, 3000)] + rng.standard_normal((3000, 128)))
+    consultas = rag_service._l2_normalize(centros[rng.integers(0, 50, 200)] + rng.standard_normal((200, 128)))
+
+    rag = _rag(base, dtype)
+    exatos = rag_service._top_k_indices(consultas @ base.T, 5)
+    aproximados = rag_service._top_k_indices(rag._scores(consultas), 5)
+    recall = np.mean([len(set(e) & set(a)) / 5 for e, a in zip(exatos, aproximados)])
+
+    assert recall >= recall_minimo
+    assert rag.quantization_report["embeddings_bytes"] <= base.size * bytes_por_valor + 4 * len(base)
+    assert "descricao_clean" not in rag.df_ncm
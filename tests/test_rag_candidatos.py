@@ -0,0 +1,100 @@
+import zlib
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core.config import settings
+from services.bm25_index import BM25Index
+from services.cache_utils import LRUCache
+from tests.conftest import importar_ou_pular
+
+normalize_service = importar_ou_pular("services.normalize_service")
+rag_service = importar_ou_pular("services.rag_service")
+
+DESCRICOES = [
+    "capacitor ceramico multicamada",
+    "capacitor eletrolitico aluminio",
+    "resistor filme carbono",
+    "resistor fio enrolado",
+    "diodo retificador silicio",
+    "transistor bipolar silicio",
+    "circuito integrado memoria",
+    "indutor nucleo ferrite",
+]
+
+
+class HashEncoder:
+    """Embeddings determinísticos (bag of words com hash), sem baixar modelo."""
+
+    def encode(self, texts, convert_to_numpy=True, normalize_embeddings=True):
+        vecs = np.zeros((len(texts), 64), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for token in text.split():
+                vecs[i, zlib.crc32(token.encode()) % 64] += 1.0
+        vecs[:, 0] += 1e-3  # nenhum vetor nulo
+        return vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+
+
+def _rag(retrieval_mode: str) -> rag_service.RAGService:
+    rag = rag_service.RAGService.__new__(rag_service.RAGService)
+    rag.retrieval_mode = retrieval_mode
+    rag.embedding_dtype = "float32"
+    rag.embedding_scales = None
+    rag._embedding_cache = LRUCache(0)
+    rag._results_cache = LRUCache(0)
+    rag.model = HashEncoder()
+    rag.df_ncm = pd.DataFrame({
+        "ncm": [f"85{i:02d}0000" for i in range(len(DESCRICOES))],
+        "descricao": DESCRICOES,
+        "descricao_longa": DESCRICOES,
+        "descricao_clean": normalize_service.limpar_textos(DESCRICOES),
+    })
+    rag.embeddings = rag._encode(rag.df_ncm["descricao_clean"].tolist())
+    rag.prefilter_chapters = rag.prefilter_headings = 0
+    rag.lexical_candidates = 200
+    rag.lexical_index = BM25Index(rag.df_ncm["descricao_clean"].tolist())
+    return rag
+
+
+def test_hibrido_completa_com_busca_densa_quando_o_bm25_acha_poucos():
+    candidatos = _rag("hybrid").find_top_ncm("indutor toroidal", top_k=3)
+    assert len(candidatos) == 3
+    assert candidatos[0]["descricao"] == "indutor nucleo ferrite"
+    assert all("score" in c for c in candidatos)
+
+
+def test_lexical_sem_termos_em_comum_cai_na_busca_densa():
+    candidatos = _rag("lexical").find_top_ncm("parafuso sextavado", top_k=3)
+    assert len(candidatos) == 3
+    assert all("score" in c and "score_bm25" not in c for c in candidatos)
+
+
+def test_lexical_completa_sem_repetir_os_resultados_do_bm25():
+    candidatos = _rag("lexical").find_top_ncm("memoria", top_k=4)
+    assert len(candidatos) == 4
+    assert candidatos[0]["descricao"] == "circuito integrado memoria"
+    assert "score_bm25" in candidatos[0]
+    assert len({c["ncm"] for c in candidatos}) == 4
+
+
+def test_lexical_com_resultados_suficientes_nao_usa_embeddings():
+    candidatos = _rag("lexical").find_top_ncm("capacitor resistor", top_k=4)
+    assert len(candidatos) == 4
+    assert all("score_bm25" in c for c in candidatos)
+
+
+@pytest.mark.parametrize("posicoes", [0, 2])
+def test_centroides_so_com_prefiltro_ligado(tmp_path, monkeypatch, posicoes):
+    csv = tmp_path / "ncm.csv"
+    pd.DataFrame({
+        "ncm": [f"85{i % 4:02d}{i:04d}" for i in range(len(DESCRICOES))],
+        "descricao": DESCRICOES,
+        "descricao_longa": DESCRICOES,
+    }).to_csv(csv, index=False)
+    monkeypatch.setattr(rag_service, "SentenceTransformer", lambda nome: HashEncoder())
+    monkeypatch.setattr(settings, "ncm_prefilter_headings", posicoes)
+
+    rag = rag_service.RAGService(str(csv), index_dir="")
+
+    assert hasattr(rag, "_heading_centroids") == (posicoes > 0)
+    assert rag.find_top_ncm("resistor fio", top_k=2)[0]["descricao"] == "resistor fio enrolado"
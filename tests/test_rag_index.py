@@ -0,0 +1,38 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from tests.conftest import importar_ou_pular
+
+rag_service = importar_ou_pular("services.rag_service")
+
+CHAVE = "0123456789abcdef"
+
+
+def _criar(diretorio, nome, meta=False):
+    caminho = diretorio / nome
+    caminho.mkdir()
+    if meta:
+        (caminho / "meta.json").write_text("{}")
+    return caminho
+
+
+def test_save_index_remove_so_indices_antigos_e_temporarios_proprios(tmp_path):
+    _criar(tmp_path, "fedcba9876543210", meta=True)          # índice de outra chave
+    _criar(tmp_path, f"aaaaaaaaaaaaaaaa.tmp-{os.getpid()}")  # temporário deste processo
+    mantidos = [
+        _criar(tmp_path, "uploads"),
+        _criar(tmp_path, "bbbbbbbbbbbbbbbb"),                # sem meta.json
+        _criar(tmp_path, f"cccccccccccccccc.tmp-{os.getpid() + 1}"),  # outro processo gravando
+    ]
+    (tmp_path / "notas.txt").write_text("x")
+
+    rag = rag_service.RAGService.__new__(rag_service.RAGService)
+    rag.index_key = CHAVE
+    rag.embeddings = np.ones((2, 4), dtype=np.float32)
+    rag.df_ncm = pd.DataFrame({"ncm": ["85010000", "85020000"]})
+    rag._save_index(str(tmp_path / CHAVE), {"model": "teste"})
+
+    restantes = sorted(os.listdir(tmp_path))
+    assert restantes == sorted([CHAVE, "notas.txt"] + [p.name for p in mantidos])
+    assert rag._load_index(str(tmp_path / CHAVE))
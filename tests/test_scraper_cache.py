@@ -0,0 +1,77 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from services import scraper_service
+from services.scraper_service import FabricanteMatcher
+from services.search_service import SearchPool
+
+FABRICANTES = {"Texas Instruments": ["Texas Instruments"], "Murata": ["Murata"], "Vishay": ["Vishay"]}
+SEDES = {"Texas Instruments": "Dallas, Texas", "Murata": "Kyoto, Japan", "Vishay": "Malvern, Pennsylvania"}
+
+
+class FakeBackend:
+    def __init__(self):
+        self.buscas_localizacao = []
+        self._lock = threading.Lock()
+
+    def text(self, query: str, max_results: int) -> list[dict]:
+        if "headquarters" in query:
+            fabricante = query.replace(" headquarters address", "")
+            with self._lock:
+                self.buscas_localizacao.append(fabricante)
+            return [{"title": fabricante, "body": SEDES[fabricante]}]
+        n = int(query.strip('"').split('"')[0].split("-")[1])
+        fabricante = list(FABRICANTES)[n % 3]
+        return [{"title": f"PN datasheet - {fabricante}", "body": ""}]
+
+
+def test_pedido_com_3_fabricantes_faz_no_maximo_3_buscas_de_localizacao(monkeypatch):
+    backend = FakeBackend()
+    pool = SearchPool(backend=backend, workers=8, rate=1e6, burst=1000, timeout=5, retries=0)
+    cache = {}
+
+    monkeypatch.setattr(scraper_service, "get_search_pool", lambda: pool)
+    monkeypatch.setattr(scraper_service, "get_fabricante_matcher", lambda *a: FabricanteMatcher(FABRICANTES))
+    monkeypatch.setattr(scraper_service, "_ler_cache", lambda tipo, chave: cache.get((tipo, chave)))
+    monkeypatch.setattr(
+        scraper_service, "_gravar_cache", lambda tipo, chave, valor: cache.__setitem__((tipo, chave), SimpleNamespace(valor=valor))
+    )
+
+    async def main():
+        try:
+            return await asyncio.gather(
+                *(scraper_service.find_manufacturer_and_location_async(f"PN-{n}") for n in range(300))
+            )
+        finally:
+            await pool.close()
+
+    resultados = asyncio.run(main())
+
+    assert len(backend.buscas_localizacao) <= 3
+    assert sorted(set(backend.buscas_localizacao)) == sorted(FABRICANTES)
+    for n, resultado in enumerate(resultados):
+        fabricante = list(FABRICANTES)[n % 3]
+        assert resultado == {"fabricante": fabricante, "localizacao": SEDES[fabricante]}
+
+
+def test_versao_sincrona_usa_o_mesmo_cache_e_deduplicacao(monkeypatch):
+    backend = FakeBackend()
+    cache = {}
+
+    monkeypatch.setattr(scraper_service, "_sync_backend", backend)
+    monkeypatch.setattr(scraper_service, "get_fabricante_matcher", lambda *a: FabricanteMatcher(FABRICANTES))
+    monkeypatch.setattr(scraper_service, "_ler_cache", lambda tipo, chave: cache.get((tipo, chave)))
+    monkeypatch.setattr(
+        scraper_service, "_gravar_cache", lambda tipo, chave, valor: cache.__setitem__((tipo, chave), SimpleNamespace(valor=valor))
+    )
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        resultados = list(executor.map(scraper_service.find_manufacturer_and_location, [f"PN-{n}" for n in range(60)]))
+
+    assert sorted(backend.buscas_localizacao) == sorted(FABRICANTES)
+    for n, resultado in enumerate(resultados):
+        fabricante = list(FABRICANTES)[n % 3]
+        assert resultado == {"fabricante": fabricante, "localizacao": SEDES[fabricante]}
+    assert scraper_service.buscar_cidade_pais_com_ddg("Murata") == "Kyoto, Japan"
+    assert scraper_service.buscar_fabricante_com_pontuacao("PN-4", FabricanteMatcher(FABRICANTES)) == "Murata"
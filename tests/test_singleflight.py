@@ -0,0 +1,84 @@
+import asyncio
+import threading
+import time
+import pytest
+from services.singleflight import SingleFlight
+
+
+def test_do_async_coalesces_concurrent_calls():
+    group = SingleFlight("teste")
+    chamadas = 0
+
+    async def trabalho():
+        nonlocal chamadas
+        chamadas += 1
+        await asyncio.sleep(0.01)
+        return "ok"
+
+    async def main():
+        return await asyncio.gather(*(group.do_async("k", trabalho) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["ok"] * 5
+    assert chamadas == 1
+    assert group.stats() == {"calls": 5, "coalesced": 4, "in_flight": 0}
+
+
+def test_leader_cancellation_does_not_cancel_followers():
+    group = SingleFlight("teste")
+
+    async def trabalho():
+        await asyncio.sleep(0.05)
+        return 42
+
+    async def main():
+        leader = asyncio.create_task(group.do_async("k", trabalho))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(group.do_async("k", trabalho))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(main()) == 42
+
+
+def test_exception_reaches_every_caller():
+    group = SingleFlight("teste")
+
+    async def falha():
+        await asyncio.sleep(0.01)
+        raise ValueError("erro")
+
+    async def main():
+        return await asyncio.gather(*(group.do_async("k", falha) for _ in range(3)), return_exceptions=True)
+
+    resultados = asyncio.run(main())
+    assert all(isinstance(r, ValueError) for r in resultados)
+    assert group.stats()["in_flight"] == 0
+
+
+def test_do_sync_coalesces_threads():
+    group = SingleFlight("teste")
+    chamadas = 0
+    barreira = threading.Barrier(4)
+
+    def trabalho():
+        nonlocal chamadas
+        chamadas += 1
+        time.sleep(0.05)
+        return "ok"
+
+    resultados = []
+
+    def chamar():
+        barreira.wait()
+        resultados.append(group.do("k", trabalho))
+
+    threads = [threading.Thread(target=chamar) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert resultados == ["ok"] * 4
+    assert chamadas == 1
@@ -0,0 +1,21 @@
+import numpy as np
+import pytest
+from tests.referencias import top_k_original
+from tests.conftest import importar_ou_pular
+
+rag_service = importar_ou_pular("services.rag_service")
+
+
+@pytest.mark.parametrize("top_k", [1, 5, 50])
+def test_top_k_igual_ao_argsort_com_cosseno_original(top_k):
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((2000, 64)).astype(np.float32)
+    q_vecs = rng.standard_normal((16, 64)).astype(np.float32)
+
+    atual = rag_service._top_k_indices(rag_service._l2_normalize(q_vecs) @ rag_service._l2_normalize(embeddings).T, top_k)
+    np.testing.assert_array_equal(atual, top_k_original(q_vecs, embeddings, top_k))
+
+
+def test_top_k_maior_que_a_tabela():
+    scores = np.array([[0.1, 0.9, 0.5]], dtype=np.float32)
+    np.testing.assert_array_equal(rag_service._top_k_indices(scores, 10), [[1, 2, 0]])
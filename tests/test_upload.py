@@ -0,0 +1,63 @@
+import asyncio
+from fastapi import FastAPI, File, HTTPException, UploadFile
+from fastapi.testclient import TestClient
+from services.upload_service import UploadLimitMiddleware, UploadTooLargeError, open_upload
+
+LIMITE = 1024
+
+
+def _cliente() -> TestClient:
+    app = FastAPI()
+    app.add_middleware(UploadLimitMiddleware, max_bytes=LIMITE)
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        try:
+            pdf_file = open_upload(file, max_bytes=LIMITE)
+        except UploadTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        # sem cópia: a rota lê o próprio arquivo temporário do upload
+        return {"mesmo_arquivo": pdf_file is file.file, "bytes": len(pdf_file.read())}
+
+    return TestClient(app)
+
+
+def test_upload_lido_direto_do_arquivo_do_starlette():
+    resp = _cliente().post("/upload", files={"file": ("a.pdf", b"%PDF" * 10)})
+    assert resp.status_code == 200
+    assert resp.json() == {"mesmo_arquivo": True, "bytes": 40}
+
+
+def test_upload_vazio():
+    resp = _cliente().post("/upload", files={"file": ("a.pdf", b"")})
+    assert resp.status_code == 400
+
+
+def test_content_length_acima_do_limite_recusado_antes_de_ler_o_corpo():
+    chamadas, enviados = [], []
+
+    async def app(scope, receive, send):
+        chamadas.append(scope)
+
+    async def receive():
+        raise AssertionError("o corpo não deveria ser lido")
+
+    async def send(mensagem):
+        enviados.append(mensagem)
+
+    scope = {"type": "http", "headers": [(b"content-length", str(LIMITE * 4).encode())]}
+    asyncio.run(UploadLimitMiddleware(app, max_bytes=LIMITE)(scope, receive, send))
+    assert chamadas == []
+    assert enviados[0]["status"] == 413
+
+
+def test_arquivo_acima_do_limite_sem_content_length():
+    def corpo():
+        yield b"--x\r\nContent-Disposition: form-data; name=\"file\"; filename=\"a.pdf\"\r\n\r\n"
+        yield b"x" * (LIMITE * 2)
+        yield b"\r\n--x--\r\n"
+
+    resp = _cliente().post("/upload", content=corpo(), headers={"content-type": "multipart/form-data; boundary=x"})
+    assert resp.status_code == 413